@@ -0,0 +1,128 @@
+"""Pruebas de rendimiento de los motores de asignación, sin interfaz gráfica.
+
+Uso:
+    python -m benchmarks.asignador [--motor voraz] [--tamaños 100 1000 10000 100000] [--salida resultados.json]
+
+Cada tamaño es el número de filas de participaciones; la mitad ya está asignada como
+historial y se asigna el resto. Los resultados se escriben en JSON para poder comparar
+entre versiones.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import VERSION
+from core import esquema
+from core.asignador import aplicar_asignaciones, filtrar_rango
+from core.cli import MOTORES
+from core.disponibilidad import IndiceAusencias
+from core.indice_historial import IndiceHistorial
+from benchmarks.generador import generar
+
+TAMAÑOS = [100, 1000, 10000, 100000]
+
+class Cronometro:
+    """Mide la duración de cada fase a partir de las llamadas de progreso(etapa, paso, total)."""
+
+    def __init__(self):
+        self.marcas = []
+
+    def marcar(self, etapa, *_):
+        self.marcas.append((etapa, time.perf_counter()))
+
+    def fases(self, fin):
+        """Devuelve {etapa: segundos} cerrando la última etapa en 'fin'."""
+        duraciones = {}
+        for (etapa, t), (_, siguiente) in zip(self.marcas, self.marcas[1:] + [(None, fin)]):
+            duraciones[etapa] = duraciones.get(etapa, 0.0) + siguiente - t
+        return duraciones
+
+def medir(motor, tablas):
+    """Ejecuta una asignación completa y devuelve las duraciones por fase y los huecos cubiertos."""
+    participaciones_df = tablas["participaciones"]
+    cronometro = Cronometro()
+
+    cronometro.marcar("Índice de historial")
+    historial = IndiceHistorial(participaciones_df)
+    cronometro.marcar("Índice de ausencias")
+    ausencias = IndiceAusencias(tablas["ausencias"])
+    cronometro.marcar("Filtrando rango")
+    pendientes = participaciones_df[participaciones_df["Asignado"] == ""]
+    rango_df = filtrar_rango(participaciones_df, pendientes["Fecha"].min(), pendientes["Fecha"].max())
+
+    asignadas_df, _ = MOTORES[motor](rango_df, tablas["participantes"], progreso=cronometro.marcar,
+                                     historial=historial, ausencias=ausencias)
+    cronometro.marcar("Aplicando asignaciones")
+    aplicar_asignaciones(participaciones_df, asignadas_df)
+    fin = time.perf_counter()
+
+    inicio = cronometro.marcas[0][1]
+    return {
+        "total_s": fin - inicio,
+        "fases_s": cronometro.fases(fin),
+        "huecos": len(rango_df),
+        "cubiertos": int((asignadas_df["Asignado"] != "").sum())
+    }
+
+def ejecutar(motor="voraz", tamaños=TAMAÑOS, repeticiones=1, semilla=0, informar=None):
+    """Mide el motor para cada tamaño. Se conserva la repetición más rápida de cada uno."""
+    resultados = []
+    for tamaño in tamaños:
+        # Mismos tipos que las tablas cargadas por la aplicación
+        tablas = {tabla: esquema.aplicar(tabla, df) for tabla, df in generar(tamaño, semilla=semilla).items()}
+        medidas = [medir(motor, tablas) for _ in range(repeticiones)]
+        mejor = min(medidas, key=lambda m: m["total_s"])
+        resultado = {
+            "motor": motor,
+            "filas": tamaño,
+            "participantes": len(tablas["participantes"]),
+            **mejor,
+            "repeticiones_s": [m["total_s"] for m in medidas]
+        }
+        resultados.append(resultado)
+        if informar:
+            informar(resultado)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version": VERSION,
+        "semilla": semilla,
+        "entorno": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__
+        },
+        "resultados": resultados
+    }
+
+def _mostrar_resultado(resultado):
+    print(f"{resultado['motor']:>7} {resultado['filas']:>7} filas: {resultado['total_s']:.3f} s "
+          f"({resultado['cubiertos']}/{resultado['huecos']} cubiertos)", file=sys.stderr)
+    for etapa, segundos in resultado["fases_s"].items():
+        print(f"        {etapa:<45} {segundos:.3f} s", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.asignador",
+                                     description="Mide el rendimiento de la asignación con datos sintéticos.")
+    parser.add_argument("--motor", choices=list(MOTORES), default="voraz", help="Motor de asignación")
+    parser.add_argument("--tamaños", type=int, nargs="+", default=TAMAÑOS, metavar="FILAS",
+                        help="Filas de participaciones a generar")
+    parser.add_argument("--repeticiones", type=int, default=1, help="Ejecuciones por tamaño; se guarda la más rápida")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del generador de datos")
+    parser.add_argument("--salida", default="benchmark_asignador.json", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    informe = ejecutar(args.motor, args.tamaños, args.repeticiones, args.semilla, informar=_mostrar_resultado)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
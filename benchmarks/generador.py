@@ -0,0 +1,89 @@
+"""Generador de datos sintéticos con semilla para pruebas de rendimiento."""
+import numpy as np
+import pandas as pd
+
+TIPOS = ["Lectura", "Primera conversación", "Revisita", "Curso bíblico", "Discurso"]
+SALAS = ["A", "B"]
+GENEROS = ["Hombre", "Mujer"]
+
+# Tipos que solo puede hacer un género (el resto admite a cualquiera)
+GENERO_TIPO = {"Lectura": "Hombre", "Discurso": "Hombre"}
+
+# Cada semana tiene estas partes, duplicadas en ambas salas
+PARTES_SEMANA = ["Lectura", "Primera conversación", "Revisita", "Curso bíblico"]
+
+def generar(filas, participantes=None, semilla=0, inicio="2020-01-06", asignadas=0.5):
+    """Genera tablas con el mismo formato que los CSV de la carpeta de datos.
+
+    'filas' es el número de participaciones. La primera fracción 'asignadas' (por fecha)
+    queda asignada como historial y el resto vacía, lista para asignar. Devuelve un
+    diccionario con 'participantes', 'participaciones', 'opciones_tipos' y 'ausencias'.
+    """
+    rng = np.random.default_rng(semilla)
+    if participantes is None:
+        participantes = max(30, filas // 8)
+    inicio = pd.Timestamp(inicio)
+
+    # === Participantes ===
+    nombres = np.array([f"Participante {i:06d}" for i in range(participantes)], dtype=object)
+    generos = rng.choice(GENEROS, participantes)
+    tipos = []
+    for genero in generos:
+        posibles = [t for t in TIPOS if GENERO_TIPO.get(t, genero) == genero]
+        cuantos = rng.integers(1, len(posibles) + 1)
+        tipos.append(", ".join(rng.choice(posibles, cuantos, replace=False)))
+
+    # Algunos participantes nunca han participado
+    dias_previos = rng.integers(1, 400, participantes)
+    nuevos = rng.random(participantes) < 0.1
+    ultimas = pd.Series(inicio - pd.to_timedelta(dias_previos, unit="D")).dt.strftime("%Y-%m-%d")
+    participantes_df = pd.DataFrame({
+        "Nombre": nombres,
+        "Género": generos,
+        "Tipos": tipos,
+        "Última participación": ultimas.where(~nuevos, ""),
+        "Último tipo": np.where(nuevos, "", [t.split(", ")[0] for t in tipos]),
+        "Última sala": np.where(nuevos, "", rng.choice(SALAS, participantes))
+    })
+
+    # === Participaciones: una reunión semanal con todas las partes en ambas salas ===
+    por_semana = len(PARTES_SEMANA) * len(SALAS)
+    semanas = -(-filas // por_semana)
+    semana = np.repeat(np.arange(semanas), por_semana)[:filas]
+    parte = np.tile(np.repeat(np.arange(len(PARTES_SEMANA)), len(SALAS)), semanas)[:filas]
+    sala = np.tile(SALAS, semanas * len(PARTES_SEMANA))[:filas]
+    tipo = np.array(PARTES_SEMANA, dtype=object)[parte]
+    fechas = pd.Series(inicio + pd.to_timedelta(semana * 7, unit="D")).dt.strftime("%Y-%m-%d")
+    participaciones_df = pd.DataFrame({
+        "Fecha": fechas,
+        "Número": parte + 1,
+        "Tipo": tipo,
+        "Género": [GENERO_TIPO.get(t, "") for t in tipo],
+        "Sala": sala,
+        "Asignado": "",
+        "Notas": ""
+    })
+
+    # Historial: las primeras semanas ya asignadas, con alguna participación no realizada
+    historicas = int(filas * asignadas)
+    participaciones_df.loc[:historicas - 1, "Asignado"] = rng.choice(nombres, historicas)
+    fallidas = np.flatnonzero(rng.random(historicas) < 0.02)
+    participaciones_df.loc[fallidas, "Notas"] = "No realizada"
+
+    # === Ausencias: unos pocos participantes con un intervalo de 1 a 30 días ===
+    ausentes = rng.choice(participantes, max(1, participantes // 20), replace=False)
+    desde = inicio + pd.to_timedelta(rng.integers(0, max(1, semanas * 7), len(ausentes)), unit="D")
+    hasta = desde + pd.to_timedelta(rng.integers(0, 30, len(ausentes)), unit="D")
+    ausencias_df = pd.DataFrame({
+        "Nombre": nombres[ausentes],
+        "Desde": desde.strftime("%Y-%m-%d"),
+        "Hasta": hasta.strftime("%Y-%m-%d"),
+        "Motivo": "Vacaciones"
+    })
+
+    return {
+        "participantes": participantes_df,
+        "participaciones": participaciones_df,
+        "opciones_tipos": pd.DataFrame({"Tipos": TIPOS}),
+        "ausencias": ausencias_df
+    }
@@ -1,2 +1,14 @@
 # config.py
 VERSION = "v0.5"
+
+# Almacenamiento de las tablas: "csv" (por defecto) o "sqlite" (ver core/almacen_sqlite.py)
+ALMACEN = "csv"
+
+# Partición de las participaciones en la carpeta de datos: "año", "mes" o None (un único CSV con diario).
+# Con particiones no hay diario: guardar una fila reescribe su partición entera (unas 400 filas
+# por año con una reunión semanal), que cuesta poco más que anotarla y mantiene los CSV legibles
+PARTICIONES = "año"
+
+# Meses de participaciones que se mantienen activas; las particiones anteriores se archivan
+# comprimidas al arrancar (ver core/particiones.py). None para no archivar
+HORIZONTE_ARCHIVO = 24
@@ -0,0 +1,205 @@
+"""Almacenamiento de las tablas en una base de datos SQLite.
+
+Migración única desde los CSV de la carpeta de datos:
+    python -m core.almacen_sqlite
+"""
+from contextlib import closing, contextmanager
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from core import gestor_datos
+from core.datos_cache import TABLAS
+
+ARCHIVO_BD = "gestion.sqlite3"
+
+# Índices por tabla; solo se crean si la tabla tiene todas las columnas
+INDICES = {
+    "participaciones": [("Fecha",), ("Asignado",), ("Fecha", "Número", "Sala")],
+    "historial": [("Fecha",), ("Asignado",)],
+    "participantes": [("Nombre",)],
+    "ausencias": [("Nombre",)]
+}
+
+def _sql(nombre):
+    """Nombre de tabla o columna entre comillas (hay columnas con espacios y tildes)."""
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+def _filas(df):
+    """Filas de 'df' como tuplas (id, valores...) con tipos nativos y None para los vacíos."""
+    df = df.copy()
+    for columna in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[columna]):
+            df[columna] = df[columna].dt.strftime("%Y-%m-%d")
+    valores = df.astype(object).where(df.notna(), None)
+    ids = [int(i) for i in df.index]
+    return [(i, *(v.item() if isinstance(v, np.generic) else v for v in fila))
+            for i, fila in zip(ids, valores.itertuples(index=False, name=None))]
+
+class AlmacenSQLite:
+    """Tablas en SQLite con una fila por registro. La clave 'id' es el índice del DataFrame."""
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or gestor_datos.ruta_datos_local(ARCHIVO_BD)
+
+    @contextmanager
+    def _conexion(self):
+        # Una conexión por operación: se puede usar desde cualquier hilo
+        with closing(sqlite3.connect(self.ruta)) as con:
+            with con:
+                yield con
+
+    def _columnas(self, con, tabla):
+        return [fila[1] for fila in con.execute(f"PRAGMA table_info({_sql(tabla)})") if fila[1] != "id"]
+
+    def _crear(self, con, tabla, columnas):
+        definicion = ", ".join(["id INTEGER PRIMARY KEY"] + [_sql(c) for c in columnas])
+        con.execute(f"CREATE TABLE IF NOT EXISTS {_sql(tabla)} ({definicion})")
+        for indice in INDICES.get(tabla, []):
+            if all(c in columnas for c in indice):
+                nombre = _sql("idx_" + tabla + "_" + "_".join(indice))
+                con.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {_sql(tabla)} ({', '.join(map(_sql, indice))})")
+
+    def _añadir_columnas(self, con, tabla, columnas):
+        existentes = self._columnas(con, tabla)
+        for columna in columnas:
+            if columna not in existentes:
+                con.execute(f"ALTER TABLE {_sql(tabla)} ADD COLUMN {_sql(columna)}")
+        self._crear(con, tabla, self._columnas(con, tabla))
+
+    # === Tablas completas ===
+    def existe(self, tabla):
+        with self._conexion() as con:
+            return con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla,)).fetchone() is not None
+
+    def cargar(self, tabla):
+        """Devuelve la tabla como DataFrame indexado por 'id'. Vacío si no existe."""
+        if not self.existe(tabla):
+            return pd.DataFrame()
+        return self.consultar(tabla)
+
+    def guardar(self, tabla, df):
+        """Sustituye la tabla completa por 'df'."""
+        with self._conexion() as con:
+            con.execute(f"DROP TABLE IF EXISTS {_sql(tabla)}")
+            self._crear(con, tabla, list(df.columns))
+            self._insertar(con, tabla, df)
+
+    def asegurar(self, tabla, columnas):
+        """Crea la tabla vacía si no existe. Devuelve True si se ha creado."""
+        if self.existe(tabla):
+            return False
+        with self._conexion() as con:
+            self._crear(con, tabla, columnas)
+        return True
+
+    # === Operaciones por fila ===
+    def _insertar(self, con, tabla, df):
+        marcas = ", ".join(["?"] * (len(df.columns) + 1))
+        columnas = ", ".join(["id"] + [_sql(c) for c in df.columns])
+        con.executemany(f"INSERT OR REPLACE INTO {_sql(tabla)} ({columnas}) VALUES ({marcas})", _filas(df))
+
+    def insertar(self, tabla, filas_df):
+        """Añade filas; su índice se usa como 'id'."""
+        with self._conexion() as con:
+            self._añadir_columnas(con, tabla, filas_df.columns)
+            self._insertar(con, tabla, filas_df)
+
+    def modificar(self, tabla, filas_df):
+        """Actualiza las columnas de 'filas_df' en las filas con el mismo índice."""
+        with self._conexion() as con:
+            self._añadir_columnas(con, tabla, filas_df.columns)
+            asignaciones = ", ".join(f"{_sql(c)} = ?" for c in filas_df.columns)
+            con.executemany(f"UPDATE {_sql(tabla)} SET {asignaciones} WHERE id = ?",
+                            [(*valores, i) for i, *valores in _filas(filas_df)])
+
+    def guardar_filas(self, tabla, df, filas):
+        """Guarda solo las filas 'filas' de la tabla completa 'df' (las ausentes se eliminan)."""
+        presentes = df.index.intersection(filas)
+        with self._conexion() as con:
+            self._añadir_columnas(con, tabla, df.columns)
+            self._insertar(con, tabla, df.loc[presentes])
+            con.executemany(f"DELETE FROM {_sql(tabla)} WHERE id = ?",
+                            [(int(i),) for i in pd.Index(filas).difference(presentes)])
+
+    def eliminar(self, tabla, indices):
+        """Borra las filas con esos índices."""
+        with self._conexion() as con:
+            con.executemany(f"DELETE FROM {_sql(tabla)} WHERE id = ?", [(int(i),) for i in indices])
+
+    def siguiente_indice(self, tabla):
+        """Primer 'id' libre después del mayor de la tabla."""
+        if not self.existe(tabla):
+            return 0
+        with self._conexion() as con:
+            ultimo = con.execute(f"SELECT MAX(id) FROM {_sql(tabla)}").fetchone()[0]
+        return 0 if ultimo is None else ultimo + 1
+
+    # === Consultas ===
+    def consultar(self, tabla, desde=None, hasta=None, filtros=None, archivadas=True):
+        """Filas con 'Fecha' entre 'desde' y 'hasta' y columnas iguales a 'filtros' ({columna: valor}).
+
+        Las fechas se guardan como texto YYYY-MM-DD, así que el orden de texto es el cronológico
+        y la consulta usa el índice de 'Fecha'. Sin archivo, 'archivadas' no cambia nada.
+        """
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append('"Fecha" >= ?')
+            parametros.append(pd.Timestamp(desde).strftime("%Y-%m-%d"))
+        if hasta is not None:
+            # Incluye las fechas con hora del último día
+            condiciones.append('"Fecha" < ?')
+            parametros.append((pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+        for columna, valor in (filtros or {}).items():
+            condiciones.append(f"{_sql(columna)} = ?")
+            parametros.append(valor)
+        consulta = f"SELECT * FROM {_sql(tabla)}"
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        with self._conexion() as con:
+            df = pd.read_sql_query(consulta + " ORDER BY id", con, params=parametros, index_col="id")
+        df.index.name = None
+        return df
+
+    # === Archivo ===
+    # La base de datos es un único archivo para todas las tablas: no se vigila por tabla
+    def archivos(self, tabla):
+        return []
+
+    # Sin archivo: las consultas por fecha ya usan el índice de 'Fecha' y la tabla se carga entera
+    def archivar(self, tabla, meses):
+        return []
+
+    def consultar_archivo(self, tabla, desde=None, hasta=None):
+        return pd.DataFrame()
+
+    def resumen_archivo(self, tabla):
+        return []
+
+    # === Migración ===
+    def migrar_desde_csv(self, tablas):
+        """Copia cada tabla de 'tablas' desde los CSV (con sus particiones, archivo o diario) a la base de datos.
+
+        Devuelve las filas copiadas por tabla.
+        """
+        copiadas = {}
+        csv = gestor_datos.AlmacenCSV()
+        for tabla in tablas:
+            if not csv.existe(tabla):
+                continue
+            df = csv.consultar(tabla)  # sin rango: también las filas archivadas
+            self.guardar(tabla, df)
+            copiadas[tabla] = len(df)
+        return copiadas
+
+def main():
+    almacen = AlmacenSQLite()
+    for tabla, filas in almacen.migrar_desde_csv(TABLAS).items():
+        print(f"{tabla}: {filas} filas", file=sys.stderr)
+    print(f"Datos migrados a {almacen.ruta}. Para usarlos, pon ALMACEN = \"sqlite\" en config.py.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
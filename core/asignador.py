@@ -1,153 +1,320 @@
+from collections import defaultdict
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import tkinter as tk
-from tkinter import ttk
-
-from core.datos_cache import actualizar, guardar_todos
-
-# === Barra de progreso visual para el proceso de asignación ===
-def mostrar_barra_carga(master, pasos):
-    """Muestra una ventana emergente con barra de progreso centrada en pantalla."""
-    ventana = tk.Toplevel(master)
-    ventana.title("Asignando participantes")
-    ventana.geometry("420x150")
-    ventana.resizable(False, False)
-    ventana.configure(bg="#f0f2f5")
-    ventana.transient(master)
-    ventana.grab_set()
-
-    # Centrar ventana en pantalla
-    ventana.update_idletasks()
-    ancho = 420
-    alto = 150
-    x = (ventana.winfo_screenwidth() // 2) - (ancho // 2)
-    y = (ventana.winfo_screenheight() // 2) - (alto // 2)
-    ventana.geometry(f"{ancho}x{alto}+{x}+{y}")
-
-    contenedor = tk.Frame(ventana, bg="#f0f2f5", padx=15, pady=15)
-    contenedor.pack(fill=tk.BOTH, expand=True)
-
-    label = tk.Label(contenedor, text="Inicializando...", font=("Segoe UI", 11), bg="#f0f2f5")
-    label.pack(pady=(10, 5))
-
-    progress = ttk.Progressbar(contenedor, orient=tk.HORIZONTAL, length=350, mode="determinate")
-    progress.pack(fill=tk.X, expand=True, pady=(5, 15))
-    progress["maximum"] = len(pasos)
-
-    def avanzar(etapa, i):
-        label.config(text=etapa)
-        label.update_idletasks()
-        progress["value"] = i + 1
-        progress.update_idletasks()
-        ventana.update()
-        ventana.after(1000)
-
-    return ventana, avanzar
 
-# === Algoritmo de asignación automática ===
-def asignar_participantes(participaciones_df, participantes_df, master=None):
-    """Asigna automáticamente participantes a las participaciones según criterios definidos."""
-    pasos = [
-        "Comprobando requisitos",
-        "Leyendo participantes",
-        "Comprobando últimas participaciones",
-        "Comprobando última sala",
-        "Comprobando participaciones no realizadas",
-        "Asignando"
-    ]
-
-    ventana, avanzar = (None, lambda *_: None)
-    if master:
-        ventana, avanzar = mostrar_barra_carga(master, pasos)
-
-    # Asegurar que las columnas requeridas existen
-    if "Asignado" not in participaciones_df.columns:
-        participaciones_df["Asignado"] = ""
-    else:
-        participaciones_df["Asignado"] = participaciones_df["Asignado"].fillna("").astype(str)
-
-    if "Notas" not in participaciones_df.columns:
-        participaciones_df["Notas"] = ""
-
-    avanzar(pasos[0], 0)
-
-    # Conversión de fechas
-    participantes_df["Última participación"] = pd.to_datetime(participantes_df["Última participación"], errors="coerce")
-    participaciones_df["Fecha"] = pd.to_datetime(participaciones_df["Fecha"], errors="coerce")
-
-    avanzar(pasos[1], 1)
-
-    # Ordenar participaciones por fecha
-    participaciones_df = participaciones_df.sort_values(by="Fecha").copy()
-
-    avanzar(pasos[2], 2)
-    avanzar(pasos[3], 3)
-
-    # Detectar penalizados por no asistir
-    historial_fallos = participaciones_df[participaciones_df["Notas"].astype(str).str.contains("No realizada", na=False)]
-    penalizados = historial_fallos["Asignado"].dropna().unique().tolist()
-
-    avanzar(pasos[4], 4)
-
-    asignadas = []
-
-    for i, participacion in participaciones_df.iterrows():
-        tipo_req = participacion["Tipo"]
-        sala_objetivo = participacion["Sala"]
-        fecha_participacion = participacion["Fecha"]
-
-        candidatos = []
+from core.indice_prioridad import IndicePrioridad
+from core.reglas import Disponible, reglas_por_defecto, compilar_reglas, evaluar_reglas
+
+PASOS = [
+    "Comprobando requisitos",
+    "Leyendo participantes",
+    "Comprobando participaciones no realizadas",
+    "Asignando",
+    "Guardando resultados"
+]
+
+# === Matrices de elegibilidad ===
+def _separar_tipos(participantes_df):
+    """Devuelve una Serie con un tipo por fila, indexada por la posición del participante."""
+    tipos = participantes_df["Tipos"].fillna("").astype(str).reset_index(drop=True)
+    tipos = tipos.str.split(",").explode().str.strip()
+    return tipos[tipos != ""]
+
+def matriz_tipos(participantes_df, tipos):
+    """Construye una máscara booleana participantes × tipos con los tipos que puede hacer cada uno."""
+    codigos = {t: k for k, t in enumerate(tipos)}
+    mascara = np.zeros((len(participantes_df), len(tipos)), dtype=bool)
+    separados = _separar_tipos(participantes_df)
+    columnas = separados.map(codigos)
+    validos = columnas.notna()
+    mascara[separados.index[validos].to_numpy(), columnas[validos].astype(int).to_numpy()] = True
+    return mascara
+
+class AsignacionCancelada(Exception):
+    """Se lanza cuando se cancela una asignación en curso."""
+
+def comprobar_cancelacion(cancelar):
+    """Lanza AsignacionCancelada si el evento 'cancelar' (threading.Event o similar) está activo."""
+    if cancelar is not None and cancelar.is_set():
+        raise AsignacionCancelada()
+
+# === Datos comunes a los motores de asignación ===
+class DatosAsignacion:
+    """Copias de trabajo y arrays por participante que comparten los motores de asignación."""
+
+    def __init__(self, participaciones_df, participantes_df, al_asignar=None, historial=None):
+        self.al_asignar = al_asignar
+        self.historial = historial
+        participaciones = participaciones_df.copy()
+        if "Asignado" not in participaciones.columns:
+            participaciones["Asignado"] = ""
+        participaciones["Asignado"] = participaciones["Asignado"].fillna("").astype(str)
+        if "Notas" not in participaciones.columns:
+            participaciones["Notas"] = ""
+
+        # Ordenar participaciones por fecha sin alterar el formato de la columna original
+        fechas = pd.to_datetime(participaciones["Fecha"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        orden = np.argsort(fechas, kind="stable")
+        self.participaciones = participaciones.iloc[orden]
+        self.fechas = fechas[orden]
+        self.tipos_slot = self.participaciones["Tipo"].to_numpy(dtype=object)
+        self.salas_slot = self.participaciones["Sala"].to_numpy(dtype=object)
+        self.resultado = self.participaciones["Asignado"].to_numpy(dtype=object).copy()
+
+        # Arrays por participante: se construyen una sola vez por ejecución
+        self.participantes = participantes_df.copy()
+        self.nombres = self.participantes["Nombre"].to_numpy(dtype=object)
+        self.tipos = self.participaciones["Tipo"].dropna().unique().tolist()
+        self.columna_tipo = {t: k for k, t in enumerate(self.tipos)}
+        self.elegibles = matriz_tipos(self.participantes, self.tipos)
+        self.ultimas = pd.to_datetime(
+            self.participantes["Última participación"], errors="coerce"
+        ).to_numpy(dtype="datetime64[ns]").copy()
+        self.ultima_sala = self.participantes["Última sala"].to_numpy(dtype=object).copy()
+        self.ultimo_tipo = self.participantes["Último tipo"].to_numpy(dtype=object).copy()
+        self.asignados = np.zeros(len(self.nombres), dtype=bool)
+
+        # Completar con el historial completo lo que falte en la tabla de participantes
+        if historial is not None:
+            sin_fecha = np.isnat(self.ultimas)
+            self.ultimas[sin_fecha] = historial.ultimas(self.nombres[sin_fecha])
+            sin_sala = pd.isna(self.ultima_sala) | (self.ultima_sala == "")
+            self.ultima_sala[sin_sala] = historial.ultimas_salas(self.nombres[sin_sala])
+
+        # Salas codificadas como enteros para comparar en bloque (-1 sin sala, -2 hueco sin sala)
+        codigos = {sala: c for c, sala in enumerate(pd.unique(np.concatenate([self.salas_slot, self.ultima_sala])))
+                   if not pd.isna(sala) and sala != ""}
+        self.salas_slot_cod = np.array([codigos.get(sala, -2) for sala in self.salas_slot], dtype=np.int64)
+        self.ultima_sala_cod = np.array([codigos.get(sala, -1) for sala in self.ultima_sala], dtype=np.int64)
+
+        # Última participación por participante y tipo (participantes × tipos)
+        self.ultimas_tipo = np.full(self.elegibles.shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+        for j, tipo in enumerate(self.ultimo_tipo):
+            if tipo in self.columna_tipo:
+                self.ultimas_tipo[j, self.columna_tipo[tipo]] = self.ultimas[j]
+        if historial is not None:
+            for tipo, k in self.columna_tipo.items():
+                del_historial = pd.DatetimeIndex([historial.ultima(n, tipo) for n in self.nombres])
+                self.ultimas_tipo[:, k] = np.fmax(self.ultimas_tipo[:, k], del_historial.to_numpy(dtype="datetime64[ns]"))
+
+        # Participantes ya ocupados en cada día: una participación por día
+        self.ocupados_dia = defaultdict(set)
+
+    def penalizados(self):
+        """Máscara de participantes con alguna participación marcada como no realizada.
+
+        Con índice de historial se consulta todo el historial; sin él, solo el rango recibido.
+        """
+        if self.historial is not None:
+            return self.historial.penalizados(self.nombres)
+        notas = self.participaciones["Notas"].astype(str)
+        fallos = self.participaciones.loc[notas.str.contains("No realizada", na=False), "Asignado"]
+        if "Cancelado" in self.participaciones.columns:
+            fallos = pd.concat([fallos, self.participaciones["Cancelado"]])
+        return np.isin(self.nombres, fallos.dropna().unique())
+
+    def huecos(self):
+        """Posiciones de las participaciones con tipo conocido y fecha válida."""
+        return [i for i in range(len(self.participaciones))
+                if self.tipos_slot[i] in self.columna_tipo and not np.isnat(self.fechas[i])]
+
+    def por_dia(self, huecos):
+        """Agrupa posiciones de huecos (ya ordenadas por fecha) en listas del mismo día."""
+        grupos = []
+        for i in huecos:
+            dia = self.fechas[i].astype("datetime64[D]")
+            if grupos and grupos[-1][0] == dia:
+                grupos[-1][1].append(i)
+            else:
+                grupos.append((dia, [i]))
+        return grupos
+
+    def ocupar_existentes(self, excepto=()):
+        """Marca como ocupado ese día a cada participante ya asignado fuera de 'excepto'."""
+        posicion = {nombre: j for j, nombre in enumerate(self.nombres)}
+        excepto = self.participaciones.index.isin(list(excepto))
+        for nombre, fecha, excluido in zip(self.resultado, self.fechas, excepto):
+            if not excluido and nombre in posicion and not np.isnat(fecha):
+                self.ocupados_dia[fecha.astype("datetime64[D]")].add(posicion[nombre])
+
+    def registrar(self, i, j):
+        """Asigna el participante j al hueco i y actualiza su última participación si es posterior."""
+        self.resultado[i] = self.nombres[j]
+        if not self.asignados[j] or self.fechas[i] >= self.ultimas[j]:
+            self.ultimas[j] = self.fechas[i]
+            self.ultimo_tipo[j] = self.tipos_slot[i]
+            self.ultima_sala[j] = self.salas_slot[i]
+            self.ultima_sala_cod[j] = self.salas_slot_cod[i]
+        self.asignados[j] = True
+        k = self.columna_tipo[self.tipos_slot[i]]
+        self.ultimas_tipo[j, k] = np.fmax(self.ultimas_tipo[j, k], self.fechas[i])
+        self.ocupados_dia[self.fechas[i].astype("datetime64[D]")].add(j)
+        if self.al_asignar:
+            self.al_asignar(self.participaciones.index[i], self.nombres[j])
+
+    def resultados(self):
+        """Devuelve las participaciones asignadas y los participantes actualizados."""
+        participaciones = self.participaciones.copy()
+        participaciones["Asignado"] = self.resultado
+
+        participantes = self.participantes.copy()
+        filas = participantes.index[self.asignados]
+        fechas = self.ultimas[self.asignados]
+        if pd.api.types.is_datetime64_any_dtype(participantes["Última participación"]):
+            participantes["Última participación"] = participantes["Última participación"].astype("datetime64[ns]")
+        else:
+            fechas = pd.Series(fechas).dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+            participantes["Última participación"] = participantes["Última participación"].astype(object)
+        participantes.loc[filas, "Última participación"] = fechas
+        for columna, valores in (("Último tipo", self.ultimo_tipo[self.asignados]),
+                                 ("Última sala", self.ultima_sala[self.asignados])):
+            participantes[columna] = participantes[columna].astype(object)
+            participantes.loc[filas, columna] = valores
+        return participaciones, participantes
+
+# === Utilidades para vistas y scripts ===
+def filtrar_rango(participaciones_df, inicio, fin):
+    """Devuelve las participaciones cuya fecha está entre 'inicio' y 'fin' (ambas incluidas)."""
+    fechas = pd.to_datetime(participaciones_df["Fecha"], errors="coerce")
+    return participaciones_df[(fechas >= pd.to_datetime(inicio)) & (fechas <= pd.to_datetime(fin))].copy()
+
+def aplicar_asignaciones(participaciones_df, asignadas_df, columnas=("Asignado",)):
+    """Copia las columnas indicadas de un rango ya asignado sobre la tabla completa, por índice."""
+    participaciones_df = participaciones_df.copy()
+    for columna in columnas:
+        if columna not in participaciones_df.columns:
+            participaciones_df[columna] = ""
+        participaciones_df[columna] = participaciones_df[columna].astype(object)
+        participaciones_df.loc[asignadas_df.index, columna] = asignadas_df[columna]
+    return participaciones_df
+
+def huecos_afectados(participaciones_df, participantes_df, fijos=(), hoy=None, ausencias=None):
+    """Índices de las participaciones cuya asignación ha dejado de ser válida.
+
+    Lo son las que no tienen asignado, las asignadas a alguien que ya no existe, que ya no
+    puede hacer ese tipo o que está ausente ese día, las marcadas como no realizadas que aún
+    no se han celebrado (cancelaciones) y las que repiten participante en el mismo día.
+    Solo cuentan las de 'hoy' en adelante: las pasadas son historial y no se reescriben. Las
+    de 'fijos' no se tocan.
+    """
+    hoy = pd.Timestamp(hoy) if hoy is not None else pd.Timestamp.today().normalize()
+    asignado = participaciones_df.get("Asignado", pd.Series("", index=participaciones_df.index)).fillna("").astype(str)
+    notas = participaciones_df.get("Notas", pd.Series("", index=participaciones_df.index)).astype(str)
+    fechas = pd.to_datetime(participaciones_df["Fecha"], errors="coerce").dt.normalize()
+
+    tipos = participaciones_df["Tipo"].dropna().unique().tolist()
+    elegibles = matriz_tipos(participantes_df, tipos)
+    posicion = asignado.map({nombre: j for j, nombre in enumerate(participantes_df["Nombre"])})
+    columna = participaciones_df["Tipo"].astype(object).map({t: k for k, t in enumerate(tipos)})
+    conocidos = (posicion.notna() & columna.notna()).to_numpy()
+    valido = np.zeros(len(participaciones_df), dtype=bool)
+    valido[conocidos] = elegibles[posicion[conocidos].astype(int), columna[conocidos].astype(int)]
+
+    cancelada = notas.str.contains("No realizada", na=False)
+    repetida = (asignado != "") & pd.DataFrame({"Fecha": fechas, "Asignado": asignado}).duplicated()
+    afectados = ((asignado == "") | ~valido | cancelada | repetida).to_numpy().copy()
+    if ausencias is not None:
+        for fecha in fechas[fechas >= hoy].unique():
+            del_dia = (fechas == fecha).to_numpy()
+            afectados[del_dia] |= ~ausencias.disponibles(asignado[del_dia].to_numpy(dtype=object), fecha)
+    afectados &= (fechas >= hoy).to_numpy() & ~participaciones_df.index.isin(list(fijos))
+    return participaciones_df.index[afectados]
+
+def reasignar_afectados(participaciones_df, participantes_df, fijos=(), historial=None, hoy=None, ausencias=None):
+    """Vuelve a resolver solo las participaciones afectadas por un cambio.
+
+    Devuelve las filas reasignadas (con 'Asignado', 'Notas' y 'Cancelado') y los participantes
+    actualizados. El resto de asignaciones, incluidas las manuales de 'fijos', se mantiene.
+    """
+    afectados = huecos_afectados(participaciones_df, participantes_df, fijos, hoy, ausencias)
+    participaciones_df = participaciones_df.copy()
+    for columna in ("Asignado", "Notas", "Cancelado"):
+        if columna not in participaciones_df.columns:
+            participaciones_df[columna] = ""
+    if afectados.empty:
+        return participaciones_df.loc[afectados], participantes_df.copy()
+
+    # Solo hacen falta los huecos afectados y el resto de participaciones de esos mismos días
+    fechas = pd.to_datetime(participaciones_df["Fecha"], errors="coerce").dt.normalize()
+    mismos_dias = participaciones_df[fechas.isin(fechas.loc[afectados])]
+    anteriores = participaciones_df.loc[afectados, "Asignado"].fillna("").astype(str)
+    canceladas = anteriores[participaciones_df.loc[afectados, "Notas"].astype(str).str.contains("No realizada", na=False)]
+
+    resultado, participantes = asignar_participantes(
+        mismos_dias, participantes_df, historial=historial, solo=afectados, excluir=canceladas.to_dict(),
+        ausencias=ausencias
+    )
+    resultado = resultado.loc[afectados].copy()
+
+    # Las cancelaciones cubiertas guardan quién canceló para no perder su penalización
+    sustituidas = canceladas.index[resultado.loc[canceladas.index, "Asignado"] != canceladas]
+    resultado["Cancelado"] = resultado["Cancelado"].astype(object)
+    resultado["Notas"] = resultado["Notas"].astype(object)
+    resultado.loc[sustituidas, "Cancelado"] = canceladas[sustituidas]
+    resultado.loc[sustituidas, "Notas"] = ""
+
+    # Una reasignación no puede retrasar una última participación posterior ya registrada
+    previas = pd.to_datetime(participantes_df["Última participación"], errors="coerce")
+    nuevas = pd.to_datetime(participantes["Última participación"], errors="coerce")
+    retrasadas = previas > nuevas
+    columnas = ["Última participación", "Último tipo", "Última sala"]
+    participantes.loc[retrasadas, columnas] = participantes_df.loc[retrasadas, columnas]
+    return resultado, participantes
 
-        for _, p in participantes_df.iterrows():
-            tipos = [t.strip() for t in str(p["Tipos"]).split(",") if t.strip()]
-            if tipo_req not in tipos:
-                continue
-
-            ya_asignado_ese_dia = any(
-                (asignado["Fecha"].date() == fecha_participacion.date() and
-                 asignado["Participante"] == p["Nombre"])
-                for asignado in asignadas
-            )
-            if ya_asignado_ese_dia:
-                continue
-
-            if p["Última sala"] == sala_objetivo:
+# === Algoritmo de asignación automática ===
+def asignar_participantes(participaciones_df, participantes_df, progreso=None, al_asignar=None, cancelar=None,
+                          historial=None, solo=None, excluir=None, reglas=None, ausencias=None):
+    """Asigna automáticamente participantes a las participaciones según criterios definidos.
+
+    'progreso', si se indica, se llama como progreso(etapa, paso, total) al empezar cada etapa,
+    y 'al_asignar(indice, nombre)' cada vez que se cubre un hueco. Si el evento 'cancelar' se
+    activa, se lanza AsignacionCancelada. 'historial' es un IndiceHistorial opcional con
+    todo el historial. Con 'solo' únicamente se resuelven esos índices y el resto de
+    asignaciones se respeta; 'excluir' indica, por índice, un nombre que no debe elegirse.
+    'reglas' sustituye a reglas.reglas_por_defecto(); este motor solo aplica las duras.
+    Con 'ausencias' (un IndiceAusencias) se descarta a quien no esté disponible ese día.
+    No modifica los DataFrames recibidos: devuelve copias.
+    """
+    avanzar = progreso or (lambda *_: None)
+
+    avanzar(PASOS[0], 0, len(PASOS))
+    datos = DatosAsignacion(participaciones_df, participantes_df, al_asignar, historial)
+
+    avanzar(PASOS[1], 1, len(PASOS))
+    penalizados = datos.penalizados()
+
+    avanzar(PASOS[2], 2, len(PASOS))
+    indice = IndicePrioridad(datos.elegibles, datos.ultimas, penalizados)
+    reglas = [r for r in (reglas if reglas is not None else reglas_por_defecto()) if r.dura]
+    if ausencias is not None:
+        reglas.append(Disponible(ausencias))
+    compilar_reglas(reglas, datos)
+
+    huecos = datos.huecos()
+    if solo is not None:
+        solo = set(solo)
+        datos.ocupar_existentes(excepto=solo)
+        huecos = [i for i in huecos if datos.participaciones.index[i] in solo]
+    posicion = {nombre: j for j, nombre in enumerate(datos.nombres)}
+    excluir = excluir or {}
+
+    avanzar(PASOS[3], 3, len(PASOS))
+    for dia, grupo in datos.por_dia(huecos):
+        comprobar_cancelacion(cancelar)
+        # Todas las reglas se evalúan de una vez para los huecos del día; dentro del día
+        # solo cambia quién queda ocupado, y eso se comprueba al elegir
+        mascara, _ = evaluar_reglas(reglas, datos, grupo)
+        ocupados = datos.ocupados_dia[dia]
+        for r, i in enumerate(grupo):
+            fila = mascara[r]
+            excluido = posicion.get(excluir.get(datos.participaciones.index[i]))
+            j = indice.seleccionar(datos.columna_tipo[datos.tipos_slot[i]], datos.fechas[i],
+                                   lambda j: fila[j] and j not in ocupados and j != excluido)
+            if j is None:
                 continue
 
-            candidatos.append(p)
-
-        if not candidatos:
-            continue
-
-        def prioridad(p):
-            nombre = p["Nombre"]
-            ultima_fecha = p["Última participación"]
-            dias = (fecha_participacion - ultima_fecha).days if pd.notna(ultima_fecha) else 9999
-            if nombre in penalizados:
-                dias /= 2
-            return -dias
-
-        candidatos.sort(key=prioridad)
-        seleccionado = candidatos[0]
-        nombre = seleccionado["Nombre"]
-        participaciones_df.loc[i, "Asignado"] = nombre
-
-        participantes_df.loc[participantes_df["Nombre"] == nombre, "Última participación"] = fecha_participacion.strftime("%Y-%m-%d")
-        participantes_df.loc[participantes_df["Nombre"] == nombre, "Último tipo"] = tipo_req
-        participantes_df.loc[participantes_df["Nombre"] == nombre, "Última sala"] = sala_objetivo
-
-        asignadas.append({
-            "Fecha": fecha_participacion,
-            "Participante": nombre
-        })
-
-    avanzar(pasos[5], 5)
-
-    if master and ventana:
-        ventana.destroy()
-
-    actualizar("participaciones", participaciones_df)
-    actualizar("participantes", participantes_df)
-    guardar_todos()
+            datos.registrar(i, j)
+            indice.actualizar(j, datos.fechas[i])
 
-    return participaciones_df.copy(), participantes_df.copy()
+    avanzar(PASOS[4], 4, len(PASOS))
+    return datos.resultados()
@@ -0,0 +1,194 @@
+import heapq
+import numpy as np
+
+from core.asignador import DatosAsignacion, comprobar_cancelacion
+from core.indice_prioridad import dias_desde
+from core.reglas import Disponible, SalaAlterna, compilar_reglas, evaluar_reglas
+
+# Pesos de la función de coste, expresados en días equivalentes
+TOPE_DIAS = 365         # más días sin participar ya no dan más prioridad
+COSTE_ROTACION = 365    # coste de cada participación adicional de la misma persona en el rango
+COSTE_MISMA_SALA = 180  # coste de repetir la última sala
+
+# Días naturales que se resuelven juntos en una misma red
+VENTANA_DIAS = 7
+
+PASOS = [
+    "Comprobando requisitos",
+    "Agrupando huecos por semanas",
+    "Resolviendo asignación óptima",
+    "Guardando resultados"
+]
+
+# === Red de flujo de coste mínimo ===
+class RedFlujo:
+    """Red residual dispersa resuelta por caminos mínimos sucesivos (Dijkstra con potenciales)."""
+
+    def __init__(self, nodos):
+        self.destino = []
+        self.capacidad = []
+        self.coste = []
+        self.salientes = [[] for _ in range(nodos)]
+
+    def añadir_arista(self, origen, destino, capacidad, coste):
+        """Añade una arista y su inversa residual. Devuelve el identificador de la arista."""
+        e = len(self.destino)
+        self.destino += [destino, origen]
+        self.capacidad += [capacidad, 0]
+        self.coste += [coste, -coste]
+        self.salientes[origen].append(e)
+        self.salientes[destino].append(e + 1)
+        return e
+
+    def _camino_minimo(self, fuente, sumidero, potencial):
+        """Dijkstra sobre costes reducidos; se detiene al fijar el sumidero."""
+        infinito = float("inf")
+        distancia = [infinito] * len(self.salientes)
+        previa = [-1] * len(self.salientes)
+        distancia[fuente] = 0
+        pendientes = [(0, fuente)]
+        while pendientes:
+            d, v = heapq.heappop(pendientes)
+            if d > distancia[v]:
+                continue
+            if v == sumidero:
+                break
+            base = d + potencial[v]
+            for e in self.salientes[v]:
+                if self.capacidad[e] <= 0:
+                    continue
+                w = self.destino[e]
+                nueva = base + self.coste[e] - potencial[w]
+                if nueva < distancia[w]:
+                    distancia[w] = nueva
+                    previa[w] = e
+                    heapq.heappush(pendientes, (nueva, w))
+        return distancia, previa
+
+    def flujo_coste_minimo(self, fuente, sumidero, cancelar=None):
+        """Envía el máximo flujo posible con coste mínimo. Devuelve el flujo enviado."""
+        potencial = [0] * len(self.salientes)  # válido porque todos los costes iniciales son >= 0
+        flujo = 0
+        while True:
+            comprobar_cancelacion(cancelar)
+            distancia, previa = self._camino_minimo(fuente, sumidero, potencial)
+            tope = distancia[sumidero]
+            if tope == float("inf"):
+                return flujo
+            for v, d in enumerate(distancia):
+                potencial[v] += d if d < tope else tope
+
+            v = sumidero
+            while v != fuente:
+                e = previa[v]
+                self.capacidad[e] -= 1
+                self.capacidad[e ^ 1] += 1
+                v = self.destino[e ^ 1]
+            flujo += 1
+
+# === Asignación óptima por ventanas de días ===
+def _resolver_ventana(datos, dias, reglas, factor, candidatos_tipo, usos, cancelar):
+    """Resuelve como flujo de coste mínimo los huecos de 'dias' (lista de (día, huecos)).
+
+    Las reglas y la recencia se evalúan con el estado que dejaron las ventanas anteriores.
+    'usos' son las participaciones de cada persona en las ventanas ya resueltas: la rotación
+    sigue contándolas y se actualiza con las de esta ventana.
+    """
+    validos = [i for _, grupo in dias for i in grupo]
+    # Con más candidatos que huecos, alguno de los len(validos) + 1 más baratos queda
+    # libre y siempre es al menos igual de bueno: el resto de aristas no hace falta
+    maximo = len(validos) + 1
+    arista_slot, arista_part, arista_coste, arista_dia = [], [], [], []
+    for d, (_, grupo) in enumerate(dias):
+        mascara, extra = evaluar_reglas(reglas, datos, grupo)
+        for r, i in enumerate(grupo):
+            cand = candidatos_tipo[datos.columna_tipo[datos.tipos_slot[i]]]
+            cand = cand[mascara[r, cand]]
+            recencia = np.minimum(dias_desde(datos.ultimas[cand], datos.fechas[i]) * factor[cand], TOPE_DIAS)
+            coste = TOPE_DIAS - recencia + extra[r, cand]
+            if len(cand) > maximo:
+                # Se elige con el coste de su siguiente participación, rotación incluida
+                mejores = np.argpartition(coste + usos[cand] * COSTE_ROTACION, maximo)[:maximo]
+                cand, coste = cand[mejores], coste[mejores]
+            arista_slot.append(np.full(len(cand), i))
+            arista_part.append(cand)
+            arista_coste.append(np.rint(coste).astype(np.int64))
+            arista_dia.append(np.full(len(cand), d))
+    if not arista_slot:
+        return
+    arista_slot = np.concatenate(arista_slot)
+    arista_part = np.concatenate(arista_part)
+    arista_coste = np.concatenate(arista_coste)
+    arista_dia = np.concatenate(arista_dia)
+
+    # Nodos: fuente, huecos, (participante, día), participantes, sumidero
+    slots, nodo_slot = np.unique(arista_slot, return_inverse=True)
+    claves_dia, nodo_dia = np.unique(arista_part * len(dias) + arista_dia, return_inverse=True)
+    part_usados, nodo_part = np.unique(claves_dia // len(dias), return_inverse=True)
+
+    fuente = 0
+    base_dia = 1 + len(slots)
+    base_part = base_dia + len(claves_dia)
+    sumidero = base_part + len(part_usados)
+    red = RedFlujo(sumidero + 1)
+
+    for s in range(len(slots)):
+        red.añadir_arista(fuente, 1 + s, 1, 0)
+    ids = [red.añadir_arista(1 + int(s), base_dia + int(d), 1, int(c))
+           for s, d, c in zip(nodo_slot, nodo_dia, arista_coste)]
+    # Cada (participante, día) admite un solo hueco: una participación por día
+    for d, p in enumerate(nodo_part):
+        red.añadir_arista(base_dia + d, base_part + int(p), 1, 0)
+    # La k-ésima participación de una persona en el rango cuesta k veces la rotación
+    for p, aristas in enumerate(np.bincount(nodo_part, minlength=len(part_usados))):
+        previos = int(usos[part_usados[p]])
+        for k in range(aristas):
+            red.añadir_arista(base_part + p, sumidero, 1, (previos + k) * COSTE_ROTACION)
+
+    red.flujo_coste_minimo(fuente, sumidero, cancelar)
+
+    usadas = np.array([red.capacidad[e] == 0 for e in ids], dtype=bool)
+    for i, j in zip(arista_slot[usadas], arista_part[usadas]):
+        datos.registrar(int(i), int(j))
+        usos[j] += 1
+
+def asignar_participantes_optimo(participaciones_df, participantes_df, progreso=None, al_asignar=None, cancelar=None,
+                                 historial=None, reglas=None, ausencias=None):
+    """Asigna el rango como problemas de flujo de coste mínimo de VENTANA_DIAS días cada uno.
+
+    Mismo contrato que asignador.asignar_participantes. Resolver todo el rango de una vez
+    crece mucho más deprisa que el número de huecos; por ventanas, cada una parte de las
+    asignaciones de las anteriores (recencia, última sala y participaciones en el rango, que
+    siguen contando para la rotación) y el coste total es lineal en el rango. Cada ventana es
+    óptima dada la anterior, no el rango completo. Los huecos de cada ventana se notifican
+    por 'al_asignar' al resolverla. Las reglas duras quitan aristas y las blandas suman coste.
+    """
+    avanzar = progreso or (lambda *_: None)
+
+    avanzar(PASOS[0], 0, len(PASOS))
+    datos = DatosAsignacion(participaciones_df, participantes_df, al_asignar, historial)
+    factor = np.where(datos.penalizados(), 0.5, 1.0)
+    if reglas is None:
+        reglas = [SalaAlterna(dura=False, peso=COSTE_MISMA_SALA)]
+    if ausencias is not None:
+        reglas = reglas + [Disponible(ausencias)]
+    compilar_reglas(reglas, datos)
+
+    avanzar(PASOS[1], 1, len(PASOS))
+    candidatos_tipo = {k: np.flatnonzero(datos.elegibles[:, k]) for k in range(len(datos.tipos))}
+    dias = datos.por_dia(datos.huecos())
+
+    # Ventanas de VENTANA_DIAS días naturales a partir del primer día del rango
+    ventanas = []
+    for dia, grupo in dias:
+        if not ventanas or dia - ventanas[-1][0][0] >= np.timedelta64(VENTANA_DIAS, "D"):
+            ventanas.append([])
+        ventanas[-1].append((dia, grupo))
+
+    avanzar(PASOS[2], 2, len(PASOS))
+    usos = np.zeros(datos.elegibles.shape[0], dtype=np.int64)
+    for ventana in ventanas:
+        _resolver_ventana(datos, ventana, reglas, factor, candidatos_tipo, usos, cancelar)
+
+    avanzar(PASOS[3], 3, len(PASOS))
+    return datos.resultados()
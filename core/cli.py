@@ -0,0 +1,78 @@
+"""Asignación de participantes sin interfaz gráfica.
+
+Uso:
+    python -m core.cli --desde 2025-01-01 --hasta 2025-03-31 [--motor optimo] [--salida rango.csv] [--no-guardar]
+"""
+import argparse
+import sys
+
+from core import concurrencia, esquema, gestor_datos
+from core.asignador import asignar_participantes, filtrar_rango
+from core.asignador_optimo import asignar_participantes_optimo
+from core.indice_historial import IndiceHistorial
+from core.disponibilidad import IndiceAusencias
+from core.reglas import HuecoMinimoTipo, reglas_por_defecto
+
+MOTORES = {
+    "voraz": asignar_participantes,
+    "optimo": asignar_participantes_optimo
+}
+
+def _mostrar_progreso(etapa, paso, total):
+    print(f"[{paso + 1}/{total}] {etapa}", file=sys.stderr)
+
+def ejecutar(desde, hasta, motor="voraz", salida=None, guardar=True, progreso=_mostrar_progreso, reglas=None):
+    """Asigna el rango indicado con las tablas de la carpeta de datos. Devuelve el rango asignado."""
+    participaciones_df = gestor_datos.cargar_tabla("participaciones")
+    participantes_df = gestor_datos.cargar_tabla("participantes")
+    ausencias = IndiceAusencias(gestor_datos.cargar_tabla("ausencias"))
+
+    rango_df = filtrar_rango(participaciones_df, desde, hasta) if not participaciones_df.empty else participaciones_df
+    if rango_df.empty:
+        print("No hay participaciones en el rango seleccionado.", file=sys.stderr)
+        return rango_df
+
+    # Las participaciones archivadas cuentan por su resumen
+    historial = IndiceHistorial(participaciones_df, gestor_datos.resumen_archivo("participaciones"))
+    asignadas_df, participantes_df = MOTORES[motor](
+        rango_df, participantes_df, progreso=progreso, historial=historial, reglas=reglas,
+        ausencias=ausencias
+    )
+
+    if salida:
+        esquema.a_texto(asignadas_df).to_csv(salida, index=False, encoding="utf-8")
+    if guardar:
+        # Con el cerrojo de cada tabla y subiendo su sello: las instancias abiertas lo detectan al guardar
+        with concurrencia.escritura("participaciones"):
+            gestor_datos.modificar_filas("participaciones", asignadas_df[["Asignado"]])
+        with concurrencia.escritura("participantes"):
+            gestor_datos.guardar_tabla("participantes", participantes_df)
+    return asignadas_df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.cli", description="Asigna participantes a un rango de fechas.")
+    parser.add_argument("--desde", required=True, help="Fecha inicial (YYYY-MM-DD)")
+    parser.add_argument("--hasta", required=True, help="Fecha final (YYYY-MM-DD)")
+    parser.add_argument("--motor", choices=list(MOTORES), default="voraz", help="Motor de asignación")
+    parser.add_argument("--salida", help="CSV donde escribir solo el rango asignado")
+    parser.add_argument("--no-guardar", action="store_true", help="No escribir los cambios en la carpeta de datos")
+    parser.add_argument("--hueco-minimo", type=int, metavar="DIAS",
+                        help="Días mínimos entre dos participaciones del mismo tipo")
+    parser.add_argument("--genero", action="store_true",
+                        help="Solo asignar participaciones con Género a participantes de ese género")
+    args = parser.parse_args(argv)
+
+    reglas = None
+    if args.hueco_minimo or args.genero:
+        reglas = reglas_por_defecto(args.genero)
+        if args.hueco_minimo:
+            reglas.append(HuecoMinimoTipo(args.hueco_minimo))
+
+    asignadas_df = ejecutar(args.desde, args.hasta, args.motor, args.salida, not args.no_guardar, reglas=reglas)
+    huecos = len(asignadas_df)
+    cubiertos = int((asignadas_df["Asignado"] != "").sum()) if huecos else 0
+    print(f"Asignadas {cubiertos} de {huecos} participaciones.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
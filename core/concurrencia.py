@@ -0,0 +1,368 @@
+"""Uso simultáneo de la carpeta de datos desde varios equipos.
+
+Cada tabla tiene un sello de versión en 'data/.versiones/<tabla>.json' que sube en cada
+guardado. Los guardados se hacen con el cerrojo '<tabla>.bloqueo' de esa misma carpeta,
+que solo se mantiene mientras se escribe. Si al guardar el sello no es el que había al
+cargar la tabla, otra instancia la ha guardado entretanto: se carga su versión, se
+combinan los cambios por fila y se escribe el resultado. Si las dos han cambiado la misma
+fila se conserva la versión ya guardada y se informa del conflicto.
+
+Lo mismo ocurre si la tabla se ha modificado fuera de la aplicación (ver core/vigilante.py),
+aunque el sello no haya cambiado; recargar() incorpora esos cambios sin esperar a guardar.
+
+Los cambios de la otra instancia se dejan en cola y datos_cache los aplica en memoria
+(datos_cache.recibir_cambios()).
+"""
+from contextlib import contextmanager
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from core import esquema, gestor_datos, vigilante
+
+CARPETA = ".versiones"
+ESPERA_BLOQUEO = 10  # segundos esperando a que otro equipo suelte el cerrojo
+CADUCIDAD_BLOQUEO = 30  # un cerrojo más antiguo es de una instancia que se cerró mal
+
+EQUIPO = f"{socket.gethostname()}:{os.getpid()}"
+
+# Atributo de los DataFrame con la secuencia del último cambio de otra instancia que incluyen
+ATRIBUTO = "cambios_aplicados"
+# Cambios ya aplicados en todas las tablas que se conservan para las copias de las vistas
+CAMBIOS_RETENIDOS = 50
+
+_cerrojo = threading.Lock()
+_bases = {}    # tabla -> (sello, huellas por celda) de lo último cargado o guardado
+_cambios = []  # cambios de otras instancias incorporados al guardar, por orden
+_secuencia = 0
+
+def _ruta(tabla, extension):
+    return gestor_datos.ruta_archivo(os.path.join(CARPETA, tabla + extension))
+
+# === Sellos de versión ===
+def sello(tabla):
+    """Versión guardada de la tabla (0 si nunca se ha guardado con sello)."""
+    try:
+        with open(_ruta(tabla, ".json"), encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+def _escribir_sello(tabla, version):
+    ruta = _ruta(tabla, ".json")
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": version, "equipo": EQUIPO, "fecha": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta + ".tmp", ruta)
+
+# === Cerrojo ===
+def _dueño(ruta):
+    """Marca de la instancia que tiene el cerrojo en 'ruta' (None si no existe o no se lee)."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f).get("marca")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _apartar(ruta, comprobar):
+    """Quita el cerrojo 'ruta' si 'comprobar(apartado)' lo confirma; si no, lo deja como estaba.
+
+    El cerrojo se renombra primero a un nombre propio: el renombrado es atómico, así que solo
+    una instancia se lo lleva y ninguna borra uno que otra acabe de crear.
+    """
+    apartado = f"{ruta}.{uuid.uuid4().hex}.apartado"
+    try:
+        os.rename(ruta, apartado)
+    except FileNotFoundError:
+        return
+    try:
+        if not comprobar(apartado):
+            # No era el que se quería quitar: se devuelve a su sitio si sigue libre
+            try:
+                os.link(apartado, ruta)
+            except OSError:
+                pass  # ya hay otro cerrojo (o el sistema de archivos no admite enlaces)
+    finally:
+        os.remove(apartado)
+
+@contextmanager
+def bloqueo(tabla, espera=ESPERA_BLOQUEO):
+    """Cerrojo consultivo entre instancias: un archivo que solo puede crear una a la vez.
+
+    El archivo lleva una marca única de quien lo tiene: al soltarlo solo se borra si sigue
+    siendo el nuestro. Mientras se tiene, su fecha se renueva para que otra instancia no lo
+    tome por uno abandonado (CADUCIDAD_BLOQUEO) en una escritura larga.
+    """
+    ruta = _ruta(tabla, ".bloqueo")
+    marca = uuid.uuid4().hex
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(ruta) > CADUCIDAD_BLOQUEO:
+                    _apartar(ruta, lambda apartado: time.time() - os.path.getmtime(apartado) > CADUCIDAD_BLOQUEO)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TimeoutError(f"La tabla {tabla} está bloqueada por otro equipo.")
+            time.sleep(0.05)
+    parar = threading.Event()
+
+    def renovar():
+        while not parar.wait(CADUCIDAD_BLOQUEO / 3):
+            try:
+                if _dueño(ruta) == marca:
+                    os.utime(ruta)
+            except OSError:
+                pass
+
+    renovacion = threading.Thread(target=renovar, name=f"bloqueo-{tabla}", daemon=True)
+    try:
+        os.write(descriptor, json.dumps({"equipo": EQUIPO, "marca": marca, "fecha": time.time()}).encode("utf-8"))
+        os.close(descriptor)
+        renovacion.start()
+        yield
+    finally:
+        parar.set()
+        if renovacion.is_alive():
+            renovacion.join()
+        _apartar(ruta, lambda apartado: _dueño(apartado) == marca)
+
+@contextmanager
+def escritura(tabla):
+    """Escritura directa de una tabla (sin datos_cache): toma el cerrojo y sube el sello al terminar."""
+    with bloqueo(tabla):
+        yield
+        _escribir_sello(tabla, sello(tabla) + 1)
+
+# === Identidad de las filas ===
+# Los CSV de estas tablas no guardan el índice: al releerlos, borrar o reordenar filas cambia
+# los índices de las siguientes. Sus filas se identifican por estas columnas. El resto de
+# tablas (participaciones) conservan el índice al guardar y se identifican por él.
+CLAVES = {
+    "participantes": ["Nombre"],
+    "opciones_tipos": ["Tipos"],
+    "ausencias": ["Nombre", "Desde", "Hasta"],
+    "plantillas": ["Plantilla", "Día", "Número", "Sala"]
+}
+
+def _texto(df):
+    texto = esquema.a_texto(df).astype(object)
+    return texto.where(texto.notna(), "").astype(str)
+
+def _claves(tabla, df):
+    """Identificador de cada fila de 'df' que se mantiene entre instancias."""
+    columnas = CLAVES.get(tabla)
+    if not columnas or df.empty or not all(c in df.columns for c in columnas):
+        return df.index
+    clave = _texto(df[columnas]).agg("\x1f".join, axis=1)
+    # Filas con la misma clave: se distinguen por su orden
+    return pd.Index(clave + "\x1e" + clave.groupby(clave).cumcount().astype(str))
+
+# === Huellas de filas ===
+def huellas(tabla, df):
+    """Hash de cada celda de 'df' por columnas, independiente del tipo con que se haya leído."""
+    texto = _texto(df)
+    return pd.DataFrame({c: pd.util.hash_array(texto[c].to_numpy()) for c in df.columns},
+                        index=_claves(tabla, df))
+
+def _por_fila(huellas_df, columnas):
+    """Hash de cada fila a partir de los de sus celdas en 'columnas'."""
+    if huellas_df.empty or not columnas:
+        return pd.Series(0, dtype="uint64", index=huellas_df.index)
+    return pd.util.hash_pandas_object(huellas_df[columnas], index=False)
+
+def recordar(tabla, df, version):
+    """Guarda las huellas de la tabla tal como se ha cargado, con su sello, para combinar al guardar."""
+    with _cerrojo:
+        _bases[tabla] = (version, huellas(tabla, df))
+
+def _cambiadas(base, actual):
+    """Filas añadidas, modificadas o eliminadas en 'actual' respecto a 'base' (huellas por fila)."""
+    comunes = actual.index.intersection(base.index)
+    distintas = comunes[actual[comunes].to_numpy() != base[comunes].to_numpy()]
+    return set(distintas) | set(actual.index.difference(base.index)) | set(base.index.difference(actual.index))
+
+# === Guardado ===
+def _al_dia(tabla, df):
+    """'df' con los cambios de otras instancias recibidos después de copiarlo de la memoria."""
+    pendientes = cambios(df.attrs.get(ATRIBUTO, 0), tabla)
+    if pendientes:
+        df = df.copy()
+        for cambio in pendientes:
+            aplicar(df, cambio)
+    return df
+
+def guardar(tabla, df, filas=None):
+    """Guarda 'df' (solo 'filas' si se indican) combinándolo con lo que otra instancia haya guardado.
+
+    Lo llama el escritor en segundo plano. Devuelve la lista de filas en conflicto.
+    """
+    with _cerrojo:
+        base = _bases.get(tabla)
+    conflictos = []
+    df = _al_dia(tabla, df)
+    with bloqueo(tabla):
+        actual = sello(tabla)
+        if base is not None and (actual != base[0] or vigilante.cambiada(tabla)):
+            df, filas, conflictos = _combinar(tabla, df, filas, base, gestor_datos.cargar_tabla(tabla))
+        if filas is None:
+            gestor_datos.guardar_tabla(tabla, df)
+        else:
+            gestor_datos.guardar_filas(tabla, df, sorted(filas))
+        _escribir_sello(tabla, actual + 1)
+        vigilante.anotar(tabla)
+    recordar(tabla, df, actual + 1)
+    return conflictos
+
+def recargar(tabla, df, filas=None, espera=ESPERA_BLOQUEO):
+    """Incorpora los cambios de la tabla en disco hechos fuera de esta instancia, sin guardar.
+
+    'df' es una copia de la tabla en memoria y 'filas' sus filas cambiadas sin guardar. Los
+    cambios se dejan en cola como los de guardar(). Devuelve False si al final no había nada
+    que incorporar. Si el cerrojo no se consigue en 'espera' segundos, lanza TimeoutError.
+    """
+    with _cerrojo:
+        base = _bases.get(tabla)
+    if base is None:
+        return False
+    with bloqueo(tabla, espera):
+        # Con el cerrojo: si era un guardado nuestro a medias, ya se ha anotado
+        if not vigilante.cambiada(tabla):
+            return False
+        version, firma = sello(tabla), vigilante.firma(tabla)
+        disco = gestor_datos.cargar_tabla(tabla)
+        _combinar(tabla, _al_dia(tabla, df), filas, base, disco)
+        vigilante.anotar(tabla, firma)
+    # La nueva base es la tabla en disco; lo que falte por guardar se compara con ella
+    recordar(tabla, disco, version)
+    return True
+
+def _combinar(tabla, df, filas, base, disco):
+    """Combina por filas nuestros cambios ('df') con la tabla guardada en disco ('disco').
+
+    Devuelve (tabla combinada, filas a escribir o None, conflictos) y deja en cola los
+    cambios de disco para aplicarlos en memoria.
+    """
+    global _secuencia
+    por_indice = tabla not in CLAVES
+    nuestra = df.set_axis(_claves(tabla, df))
+    suya = disco.set_axis(_claves(tabla, disco))
+    # Solo se comparan las columnas que tienen las tres versiones; los cambios en columnas
+    # nuevas ya vienen en 'filas'
+    columnas = [c for c in base[1].columns if c in df.columns and c in disco.columns]
+    huellas_base = _por_fila(base[1], columnas)
+    nuestras_h, suyas_h = _por_fila(huellas(tabla, df), columnas), _por_fila(huellas(tabla, disco), columnas)
+    nuestras = _cambiadas(huellas_base, nuestras_h)
+    if filas:
+        nuestras |= set(nuestra.index[df.index.isin(list(filas))])
+    suyas = _cambiadas(huellas_base, suyas_h)
+
+    iguales = {i for i in nuestras & suyas if (i in nuestra.index) == (i in suya.index)
+               and (i not in nuestra.index or nuestras_h[i] == suyas_h[i])}
+    # Filas nuevas en las dos instancias con el mismo índice: las nuestras pasan a un índice libre
+    nuevas_ambas = set()
+    if por_indice:
+        nuevas_ambas = {i for i in (nuestras & suyas) - iguales
+                        if i not in huellas_base.index and i in nuestra.index and i in suya.index}
+    siguiente = int(max(df.index.max() if len(df) else -1, disco.index.max() if len(disco) else -1)) + 1
+    renombradas = {i: siguiente + k for k, i in enumerate(sorted(nuevas_ambas))}
+    en_conflicto = sorted((nuestras & suyas) - iguales - nuevas_ambas)
+    # Para avisar: la clave legible de cada fila en conflicto
+    conflictos = [str(i).split("\x1e")[0].replace("\x1f", " ") for i in en_conflicto]
+
+    aplicar_nuestras = nuestras - suyas
+    poner = [i for i in nuestra.index if i in aplicar_nuestras or i in renombradas]
+    borrar = {i for i in aplicar_nuestras if i not in nuestra.index and i in suya.index}
+    sustituir = [i for i in poner if i in suya.index and i not in renombradas]
+    combinada = pd.concat([suya.drop(index=sustituir + list(borrar)), nuestra.loc[poner].rename(index=renombradas)])
+    orden = [i for i in suya.index if i not in borrar] + [i for i in combinada.index if i not in suya.index]
+    combinada = esquema.aplicar(tabla, combinada.loc[orden])
+
+    # Lo que cambia en nuestra memoria: las filas de la otra instancia y las renombradas
+    de_ellos = sorted((suyas - iguales - nuevas_ambas) | set(renombradas))
+    if de_ellos or conflictos:
+        cambio = {
+            "tabla": tabla,
+            "renombradas": renombradas,
+            "filas": suya.loc[[i for i in de_ellos if i in suya.index]],
+            "eliminadas": [i for i in de_ellos if i not in suya.index],
+            "conflictos": conflictos
+        }
+        with _cerrojo:
+            _secuencia += 1
+            cambio["secuencia"] = _secuencia
+            _cambios.append(cambio)
+    if not por_indice:
+        # Sin índice guardado, la tabla se reescribe entera
+        return combinada.reset_index(drop=True), None, conflictos
+    return combinada, set(poner) - set(renombradas) | set(renombradas.values()) | borrar, conflictos
+
+# === Cambios de otras instancias ===
+def ultima_secuencia():
+    with _cerrojo:
+        return _secuencia
+
+def descartar(aplicados):
+    """Quita de la cola los cambios ya aplicados, salvo los CAMBIOS_RETENIDOS más recientes.
+
+    'aplicados' es {tabla: secuencia del último cambio aplicado} de las tablas en memoria; los
+    cambios de las tablas que no están cargadas no se necesitan (al cargarlas ya los incluyen).
+    """
+    with _cerrojo:
+        pendientes = [c for c in _cambios if c["secuencia"] > aplicados.get(c["tabla"], c["secuencia"])]
+        primera = min((c["secuencia"] for c in pendientes), default=_secuencia + 1)
+        aplicados_todos = [c for c in _cambios if c["secuencia"] < primera]
+        del _cambios[:max(len(aplicados_todos) - CAMBIOS_RETENIDOS, 0)]
+
+def cambios(desde=0, tabla=None):
+    """Cambios en cola con secuencia posterior a 'desde' (de 'tabla' si se indica)."""
+    with _cerrojo:
+        return [c for c in _cambios if c["secuencia"] > desde and (tabla is None or c["tabla"] == tabla)]
+
+def aplicar(df, cambio):
+    """Aplica sobre 'df', en el mismo objeto, un cambio recibido de otra instancia.
+
+    Devuelve (índices de las filas modificadas o añadidas, índices de las eliminadas) en 'df'.
+    """
+    df.attrs[ATRIBUTO] = cambio["secuencia"]
+    renombradas = cambio["renombradas"]
+    if renombradas:
+        df.rename(index=renombradas, inplace=True)
+    # Índice de 'df' de cada fila, por su identificador entre instancias
+    indices = pd.Series(df.index, index=_claves(cambio["tabla"], df))
+    eliminadas = list(indices[indices.index.intersection(cambio["eliminadas"])])
+    df.drop(index=eliminadas, inplace=True)
+    cambiadas = list(renombradas.values())
+    filas = cambio["filas"]
+    if filas.empty:
+        return cambiadas, eliminadas
+    existentes = filas.index.intersection(indices.index)
+    for columna in filas.columns:
+        if columna not in df.columns:
+            df[columna] = None
+        valores = filas[columna]
+        if isinstance(df[columna].dtype, pd.CategoricalDtype):
+            nuevas = set(valores.dropna()) - set(df[columna].cat.categories)
+            if nuevas:
+                df[columna] = df[columna].cat.add_categories(sorted(nuevas))
+        valores = valores.astype(object).where(valores.notna(), None)
+        if len(existentes):
+            df.loc[indices[existentes].to_numpy(), columna] = valores[existentes].to_numpy()
+    cambiadas += list(indices[existentes])
+    siguiente = int(df.index.max()) + 1 if len(df) else 0
+    for k, clave in enumerate(filas.index.difference(indices.index, sort=False)):
+        indice = clave if cambio["tabla"] not in CLAVES else siguiente + k
+        df.loc[indice] = [filas.at[clave, c] if c in filas.columns else None for c in df.columns]
+        cambiadas.append(indice)
+    return cambiadas, eliminadas
@@ -1,35 +1,329 @@
-from core import gestor_datos
+import threading
+
+import pandas as pd
+
+from core import gestor_datos, escritor, esquema, concurrencia, vigilante
+from core.indice_historial import IndiceHistorial
+from core.disponibilidad import IndiceAusencias
+from core.indice_claves import IndiceClaves
 
 # Diccionario para mantener los datos cargados en memoria
 datos = {}
 
+# Versión de cada tabla en memoria y versión guardada en disco: si difieren, hay cambios sin guardar
+versiones = {}
+_versiones_guardadas = {}
+
+# Índices de las filas cambiadas desde el último guardado; None si hay que guardar la tabla completa
+_filas_pendientes = {}
+
+# Índices derivados; se construyen bajo demanda
+_indice_historial = None
+_indice_ausencias = None
+_indice_claves = None
+
+# Funciones a las que se avisa de los cambios recibidos: funcion(tabla, cambiadas, eliminadas, secuencia)
+_suscriptores = []
+
+# Una tabla solo se carga una vez aunque la pidan a la vez la interfaz y la precarga
+_cerrojos = {}
+_cerrojo_cerrojos = threading.Lock()
+
+# Hilo que relee las tablas modificadas fuera de la aplicación (ver vigilar())
+_relectura = None
+
 # Archivos requeridos y sus claves internas
 TABLAS = {
     "participantes": "participantes.csv",
     "participaciones": "participaciones.csv",
     "historial": "historial.csv",
-    "opciones_tipos": "opciones_tipos.csv"
+    "opciones_tipos": "opciones_tipos.csv",
+    "ausencias": "ausencias.csv",
+    "plantillas": "plantillas.csv"
 }
 
-def cargar_datos_en_memoria():
-    """Carga todos los CSV definidos en TABLAS y los guarda en el diccionario 'datos'."""
-    for clave, archivo in TABLAS.items():
-        datos[clave] = gestor_datos.cargar_csv(archivo)
+# Tablas que la precarga lee en segundo plano tras mostrar la ventana, por orden. Las
+# participaciones no: mientras no se carguen enteras, consultar() lee solo las particiones
+# del rango (o la consulta por fechas de SQLite)
+PRECARGA = ["opciones_tipos", "participantes", "ausencias"]
+
+def cargar_datos_en_memoria(tablas=None):
+    """Carga ya las tablas indicadas (por defecto todas), descartando las que hubiera en memoria.
+
+    La interfaz no la necesita: obtener() carga cada tabla en su primer acceso.
+    """
+    global _indice_historial, _indice_ausencias, _indice_claves
+    for clave in tablas or TABLAS:
+        with _cerrojo(clave):
+            datos.pop(clave, None)
+        _cargar(clave)
+    _indice_historial = None
+    _indice_ausencias = None
+    _indice_claves = None
+
+
+def _cerrojo(nombre):
+    with _cerrojo_cerrojos:
+        return _cerrojos.setdefault(nombre, threading.Lock())
+
+
+def _cargar(nombre):
+    """Carga 'nombre' desde el almacenamiento si aún no está en memoria."""
+    with _cerrojo(nombre):
+        if nombre not in datos:
+            # El sello se lee antes que la tabla: si otra instancia guarda entretanto, se combinará
+            sello, firma = concurrencia.sello(nombre), vigilante.firma(nombre)
+            aplicados = concurrencia.ultima_secuencia()
+            df = gestor_datos.cargar_tabla(nombre)
+            concurrencia.recordar(nombre, df, sello)
+            vigilante.anotar(nombre, firma)
+            df.attrs[concurrencia.ATRIBUTO] = aplicados
+            versiones[nombre] = _versiones_guardadas[nombre] = 0
+            _filas_pendientes[nombre] = set()
+            datos[nombre] = df
+    return datos[nombre]
+
+
+def precargar(tablas=None):
+    """Carga en segundo plano las tablas indicadas (por defecto PRECARGA) y vuelve enseguida."""
+    def trabajar():
+        for nombre in tablas or PRECARGA:
+            try:
+                _cargar(nombre)
+            except Exception as e:
+                # Si falla, obtener() lo volverá a intentar y mostrará el error
+                print(f"[AVISO] No se pudo precargar {nombre}: {e}")
+    threading.Thread(target=trabajar, name="precarga-datos", daemon=True).start()
 
 
 def guardar_todos():
-    """Guarda todos los DataFrames en memoria de nuevo en sus respectivos archivos CSV."""
-    for clave, archivo in TABLAS.items():
+    """Guarda en el almacenamiento configurado (CSV o SQLite) solo las tablas modificadas.
+
+    Si se conocen las filas cambiadas, solo se guardan esas (diario de cambios o SQLite).
+    La escritura se hace en segundo plano; escritor.volcar() espera a que termine. Si otra
+    instancia ha guardado la misma tabla entretanto, se combinan los cambios por fila (ver
+    core/concurrencia.py).
+    """
+    recibir_cambios()
+    for clave in TABLAS:
         df = datos.get(clave)
-        if df is not None:
-            gestor_datos.guardar_csv(archivo, df)
+        if df is not None and hay_cambios(clave):
+            escritor.programar(clave, df, _filas_pendientes.get(clave))
+            _versiones_guardadas[clave] = versiones.get(clave, 0)
+            _filas_pendientes[clave] = set()
+
+
+def vigilar():
+    """Busca en disco cambios de las tablas en memoria hechos fuera de esta instancia.
+
+    Solo consulta la fecha y el tamaño de los archivos; si alguno ha cambiado, relee esa tabla
+    en segundo plano y deja en cola sus diferencias con la memoria, que se aplican con
+    recibir_cambios(). Vuelve enseguida; si la relectura anterior no ha terminado, no hace nada.
+    """
+    global _relectura
+    if _relectura is not None and _relectura.is_alive():
+        return
+    # Copias: la interfaz puede seguir modificando las tablas mientras se releen
+    cambiadas = {}
+    for nombre, df in list(datos.items()):
+        if vigilante.cambiada(nombre):
+            filas = _filas_pendientes.get(nombre)
+            cambiadas[nombre] = (df.copy(), set(filas) if filas is not None else None)
+    if cambiadas:
+        _relectura = threading.Thread(target=_releer, args=(cambiadas,), name="relectura-datos", daemon=True)
+        _relectura.start()
+
+
+def _releer(cambiadas):
+    for nombre, (df, filas) in cambiadas.items():
+        try:
+            # Sin esperar al cerrojo: si se está guardando, se vuelve a mirar en la próxima revisión
+            concurrencia.recargar(nombre, df, filas, espera=0)
+        except TimeoutError:
+            pass
+        except Exception as e:
+            print(f"[AVISO] No se pudieron incorporar los cambios externos de {nombre}: {e}")
+
+
+def recibir_cambios():
+    """Aplica en memoria los cambios de otras instancias o de fuera de la aplicación.
+
+    Las tablas se modifican en el mismo objeto, así que las vistas que las tienen abiertas
+    ven los cambios; a las suscritas se les avisa con las filas afectadas para que solo
+    redibujen esas. Devuelve [(tabla, filas en conflicto)] por cada cambio aplicado.
+    """
+    global _indice_historial, _indice_ausencias
+    recibidos = []
+    for cambio in concurrencia.cambios():
+        nombre = cambio["tabla"]
+        if nombre not in datos or cambio["secuencia"] <= datos[nombre].attrs.get(concurrencia.ATRIBUTO, 0):
+            continue
+        cambiadas, eliminadas = concurrencia.aplicar(datos[nombre], cambio)
+        if cambio["renombradas"] and _filas_pendientes.get(nombre) is not None:
+            # Filas nuestras sin guardar que han pasado a otro índice
+            _filas_pendientes[nombre] |= set(cambio["renombradas"].values())
+        recibidos.append((nombre, cambio["conflictos"]))
+        if nombre == "participaciones":
+            _indice_historial = None
+            if _indice_claves is not None:
+                _indice_claves.actualizar(datos[nombre], cambiadas + eliminadas)
+        elif nombre == "ausencias":
+            _indice_ausencias = None
+        for funcion in list(_suscriptores):
+            funcion(nombre, cambiadas, eliminadas, cambio["secuencia"])
+    if not escritor.hay_pendientes():
+        # Los guardados en cola son copias que pueden necesitar cambios ya aplicados aquí
+        concurrencia.descartar({n: df.attrs.get(concurrencia.ATRIBUTO, 0) for n, df in list(datos.items())})
+    return recibidos
+
+
+def suscribir(funcion):
+    """Avisa a 'funcion' de los cambios recibidos: funcion(tabla, cambiadas, eliminadas, secuencia).
+
+    'cambiadas' y 'eliminadas' son índices de la tabla en memoria.
+    """
+    _suscriptores.append(funcion)
+
+
+def desuscribir(funcion):
+    if funcion in _suscriptores:
+        _suscriptores.remove(funcion)
+
+
+def incorporar(nombre, df, desde=None):
+    """Aplica a 'df', una copia de la tabla hecha por una vista, los cambios recibidos que le faltan.
+
+    Se aplican los posteriores al último que ya tiene (o a 'desde' si la copia no lo indica, o
+    a los de la tabla en memoria). Devuelve (índices cambiados, índices eliminados) en 'df'.
+    """
+    actual = datos.get(nombre)
+    if desde is None:
+        desde = actual.attrs.get(concurrencia.ATRIBUTO, 0) if actual is not None else 0
+    cambiadas, eliminadas = [], []
+    for cambio in concurrencia.cambios(df.attrs.get(concurrencia.ATRIBUTO, desde), nombre):
+        nuevas, quitadas = concurrencia.aplicar(df, cambio)
+        cambiadas += nuevas
+        eliminadas += quitadas
+    return cambiadas, eliminadas
+
+
+def hay_cambios(nombre=None):
+    """Indica si una tabla (o cualquiera, sin 'nombre') tiene cambios sin guardar.
+
+    También los tiene si su último guardado falló en el escritor: guardar_todos() la vuelve a
+    programar con las filas de aquel guardado.
+    """
+    if nombre is not None:
+        return versiones.get(nombre, 0) != _versiones_guardadas.get(nombre, 0) or escritor.fallida(nombre)
+    return any(hay_cambios(clave) for clave in versiones)
 
 
 def obtener(nombre):
-    """Devuelve el DataFrame correspondiente al nombre dado."""
-    return datos.get(nombre)
+    """Devuelve el DataFrame correspondiente al nombre dado, cargándolo en el primer acceso."""
+    if nombre in datos:
+        return datos[nombre]
+    if nombre not in TABLAS:
+        return None
+    return _cargar(nombre)
+
+
+def consultar(nombre, desde=None, hasta=None, incluir_archivo=False):
+    """Filas de 'nombre' con 'Fecha' entre 'desde' y 'hasta' (incluidas).
+
+    Si la tabla ya está en memoria se filtra ahí; si no, se leen del almacenamiento solo las
+    particiones del rango, sin cargar la tabla completa. Con 'incluir_archivo', si el rango
+    llega a particiones archivadas, sus filas se leen del archivo y se añaden: son solo de
+    consulta, porque no están en la tabla de obtener() y no se pueden pasar a actualizar().
+    """
+    df = datos.get(nombre)
+    if df is None:
+        return gestor_datos.consultar(nombre, desde, hasta, archivadas=incluir_archivo)
+    if not df.empty:
+        fechas = df["Fecha"].dt.normalize()
+        seleccion = fechas.notna()
+        if desde is not None:
+            seleccion &= fechas >= pd.Timestamp(desde).normalize()
+        if hasta is not None:
+            seleccion &= fechas <= pd.Timestamp(hasta).normalize()
+        df = df[seleccion]
+    if not incluir_archivo:
+        return df
+    archivadas = gestor_datos.consultar_archivo(nombre, desde, hasta)
+    if archivadas.empty:
+        return df
+    return esquema.aplicar(nombre, pd.concat([archivadas, df]).sort_index(kind="stable"))
+
+
+def indices_nuevos(nombre, cuantos):
+    """Índices para 'cuantos' filas nuevas de 'nombre'.
+
+    Siguen al mayor de la tabla en memoria y al mayor que haya dado el almacenamiento, que
+    cuenta las filas archivadas: el índice de una fila archivada no se vuelve a usar.
+    """
+    df = obtener(nombre)
+    inicio = max(int(df.index.max()) + 1 if not df.empty else 0, gestor_datos.siguiente_indice(nombre))
+    return range(inicio, inicio + cuantos)
+
+
+def actualizar(nombre, nuevo_df, cambios_historial=None, filas=None):
+    """Actualiza el DataFrame en memoria para una clave específica y la marca como modificada.
+
+    El DataFrame se guarda con los tipos de core.esquema; obtener() devuelve la versión tipada.
+
+    Al cambiar 'participaciones', 'cambios_historial' puede ser una función que aplique el
+    cambio al índice de historial de forma incremental; si no se indica o devuelve False, el
+    índice se reconstruirá en el próximo acceso.
+
+    'filas' son los índices de las filas modificadas, añadidas o eliminadas; si se indican,
+    al guardar solo se escriben esas filas en lugar de la tabla completa.
+    """
+    global _indice_historial, _indice_ausencias, _indice_claves
+    actual = datos.get(nombre)
+    recibidas = []
+    if actual is not None and nuevo_df is not actual:
+        # La vista puede traer una copia anterior a los últimos cambios de otra instancia
+        cambiadas, eliminadas = incorporar(nombre, nuevo_df)
+        recibidas = cambiadas + eliminadas
+        nuevo_df.attrs[concurrencia.ATRIBUTO] = actual.attrs.get(concurrencia.ATRIBUTO, 0)
+    datos[nombre] = esquema.aplicar(nombre, nuevo_df)
+    versiones[nombre] = versiones.get(nombre, 0) + 1
+    pendientes = _filas_pendientes.get(nombre, set())
+    _filas_pendientes[nombre] = None if filas is None or pendientes is None else pendientes | set(filas)
+    if nombre == "ausencias":
+        _indice_ausencias = None
+    if nombre == "participaciones" and _indice_claves is not None:
+        if filas is None:
+            _indice_claves = None
+        else:
+            _indice_claves.actualizar(datos[nombre], list(filas) + recibidas)
+    if nombre == "participaciones" and _indice_historial is not None:
+        if cambios_historial is None or cambios_historial(_indice_historial) is False:
+            _indice_historial = None
+
+
+def indice_historial():
+    """Devuelve el índice de historial de participaciones, construyéndolo si hace falta."""
+    global _indice_historial
+    if _indice_historial is None:
+        # Las participaciones archivadas cuentan por su resumen
+        _indice_historial = IndiceHistorial(obtener("participaciones"), gestor_datos.resumen_archivo("participaciones"))
+    return _indice_historial
+
+
+def indice_ausencias():
+    """Devuelve el índice de ausencias de los participantes, construyéndolo si hace falta."""
+    global _indice_ausencias
+    if _indice_ausencias is None:
+        _indice_ausencias = IndiceAusencias(obtener("ausencias"))
+    return _indice_ausencias
+
 
+def indice_claves():
+    """Devuelve el índice de participaciones por (Fecha, Número, Sala), construyéndolo si hace falta.
 
-def actualizar(nombre, nuevo_df):
-    """Actualiza el DataFrame en memoria para una clave específica."""
-    datos[nombre] = nuevo_df
\ No newline at end of file
+    actualizar() lo mantiene con las filas que se le indican; sin 'filas' se reconstruye.
+    """
+    global _indice_claves
+    if _indice_claves is None:
+        _indice_claves = IndiceClaves(obtener("participaciones"))
+    return _indice_claves
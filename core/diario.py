@@ -0,0 +1,185 @@
+"""Diario de cambios por fila para las tablas CSV grandes.
+
+Junto a 'participaciones.csv' se escribe 'participaciones.diario.jsonl', con una línea JSON
+por cambio. La primera línea es la cabecera: tamaño del CSV base al que corresponde y, si no
+son 0..n-1, los índices de sus filas. El resto son filas guardadas ({"i": índice, "fila": {...}})
+o eliminadas ({"i": índice, "eliminar": true}). Al cargar se reproduce sobre el CSV base;
+cuando el diario supera TAMAÑO_COMPACTAR se reescribe el CSV en segundo plano.
+
+Solo se usa con config.PARTICIONES = None: con particiones, guardar filas reescribe solo
+las particiones afectadas (ver core/particiones.py).
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core import gestor_datos
+
+# Tablas que se guardan con diario en lugar de reescribir el CSV completo
+TABLAS_DIARIO = {"participaciones"}
+
+TAMAÑO_COMPACTAR = 1024 * 1024  # bytes
+
+# Protege el diario y el CSV base frente a la compactación en segundo plano
+_cerrojo = threading.RLock()
+_generacion = {}
+_compactando = set()
+
+def ruta_base(tabla):
+    return gestor_datos.ruta_archivo(tabla + ".csv")
+
+def ruta_diario(tabla):
+    return gestor_datos.ruta_archivo(tabla + ".diario.jsonl")
+
+def _valor(v):
+    """Convierte un valor de pandas/numpy en uno serializable a JSON."""
+    if isinstance(v, pd.Timestamp):
+        return v.strftime("%Y-%m-%d")
+    if isinstance(v, np.generic):
+        v = v.item()
+    if v is None or pd.isna(v):
+        return None
+    return v
+
+def _cabecera(df, tamaño_base):
+    cabecera = {"base": tamaño_base}
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        cabecera["indices"] = [int(i) for i in df.index]
+    return json.dumps(cabecera) + "\n"
+
+def _lineas(df, filas):
+    """Líneas del diario para las filas 'filas' de 'df' (las que ya no están, como eliminadas)."""
+    presentes = df.index.intersection(filas)
+    lineas = []
+    for i, fila in zip(presentes, df.loc[presentes].itertuples(index=False, name=None)):
+        lineas.append(json.dumps({"i": int(i), "fila": dict(zip(df.columns, map(_valor, fila)))}, ensure_ascii=False))
+    for i in pd.Index(filas).difference(presentes):
+        lineas.append(json.dumps({"i": int(i), "eliminar": True}))
+    return "".join(linea + "\n" for linea in lineas)
+
+# === Escritura ===
+def _escribir_base(tabla, df, generacion=None):
+    """Escribe el CSV base y un diario vacío de forma que un corte no deje ambos desparejados.
+
+    Si se indica 'generacion' (compactación) y entretanto ha habido una escritura completa,
+    se descarta. Los cambios anotados mientras se escribía el CSV pasan al diario nuevo.
+    El CSV se escribe fuera del cerrojo en un temporal propio de cada llamada: la compactación
+    y un guardado completo pueden coincidir sin pisarse el archivo.
+    """
+    carpeta, nombre = os.path.split(ruta_base(tabla))
+    descriptor, temporal = tempfile.mkstemp(prefix=nombre + ".", suffix=".tmp", dir=carpeta)
+    os.close(descriptor)
+    try:
+        if os.path.exists(ruta_base(tabla)):
+            shutil.copymode(ruta_base(tabla), temporal)  # mkstemp lo crea solo para su dueño
+        gestor_datos.escribir_csv_sincronizado(temporal, df)
+        with _cerrojo:
+            if generacion is not None and generacion != _generacion.get(tabla, 0):
+                return
+            _generacion[tabla] = _generacion.get(tabla, 0) + 1
+            pendientes = ""
+            if generacion is not None and os.path.exists(ruta_diario(tabla)):
+                with open(ruta_diario(tabla), "rb") as f:
+                    f.seek(df.attrs.get("posicion_diario", 0))
+                    pendientes = f.read().decode("utf-8")
+            diario_temporal = ruta_diario(tabla) + ".tmp"
+            with open(diario_temporal, "w", encoding="utf-8") as f:
+                f.write(_cabecera(df, os.path.getsize(temporal)) + pendientes)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, ruta_base(tabla))
+            os.replace(diario_temporal, ruta_diario(tabla))
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def guardar(tabla, df):
+    """Reescribe la tabla completa y empieza un diario vacío."""
+    _escribir_base(tabla, df)
+
+def anotar(tabla, df, filas):
+    """Añade al diario las filas modificadas, insertadas o eliminadas y compacta si hace falta."""
+    if not os.path.exists(ruta_diario(tabla)):
+        # Sin diario todavía no hay cabecera con la que reproducirlo: se escribe la base
+        _escribir_base(tabla, df)
+        return
+    with _cerrojo:
+        with open(ruta_diario(tabla), "a", encoding="utf-8") as f:
+            f.write(_lineas(df, filas))
+            f.flush()
+            os.fsync(f.fileno())
+        posicion = os.path.getsize(ruta_diario(tabla))
+        if posicion < TAMAÑO_COMPACTAR or tabla in _compactando:
+            return
+        _compactando.add(tabla)
+        copia = df.copy()
+        copia.attrs["posicion_diario"] = posicion
+        generacion = _generacion.get(tabla, 0)
+    threading.Thread(target=_compactar, args=(tabla, copia, generacion), daemon=True).start()
+
+def _compactar(tabla, df, generacion):
+    try:
+        _escribir_base(tabla, df, generacion)
+    except OSError as e:
+        print(f"[AVISO] No se pudo compactar el diario de {tabla}: {e}")
+    finally:
+        with _cerrojo:
+            _compactando.discard(tabla)
+
+# === Lectura ===
+def reproducir(tabla, base_df):
+    """Aplica el diario de 'tabla' sobre el CSV base ya cargado y devuelve la tabla actual."""
+    with _cerrojo:
+        diario_temporal = ruta_diario(tabla) + ".tmp"
+        if os.path.exists(diario_temporal):
+            # Corte durante una escritura de la base: el diario nuevo solo vale si el CSV ya se sustituyó
+            with open(diario_temporal, encoding="utf-8") as f:
+                cabecera = json.loads(f.readline() or "{}")
+            if cabecera.get("base") == os.path.getsize(ruta_base(tabla)):
+                os.replace(diario_temporal, ruta_diario(tabla))
+            else:
+                os.remove(diario_temporal)
+        if not os.path.exists(ruta_diario(tabla)):
+            return base_df
+        with open(ruta_diario(tabla), encoding="utf-8") as f:
+            lineas = f.read().splitlines()
+
+    cabecera = json.loads(lineas[0]) if lineas else {}
+    if cabecera.get("base") != os.path.getsize(ruta_base(tabla)):
+        # El CSV se ha modificado fuera de la aplicación: el diario ya no se puede aplicar
+        print(f"[AVISO] El diario de {tabla} no corresponde a {tabla}.csv y se descarta.")
+        with _cerrojo:
+            os.replace(ruta_diario(tabla), ruta_diario(tabla) + ".descartado")
+        return base_df
+    df = base_df.copy()
+    if "indices" in cabecera and len(cabecera["indices"]) == len(df):
+        df.index = pd.Index(cabecera["indices"])
+
+    # Solo cuenta el último cambio de cada fila, en el orden en que se anotaron
+    ultimos = {}
+    for linea in lineas[1:]:
+        if linea.strip():
+            cambio = json.loads(linea)
+            ultimos.pop(cambio["i"], None)
+            ultimos[cambio["i"]] = cambio
+    eliminadas = [i for i, c in ultimos.items() if c.get("eliminar")]
+    filas = {i: c["fila"] for i, c in ultimos.items() if not c.get("eliminar")}
+    df = df.drop(index=df.index.intersection(eliminadas))
+    if filas:
+        cambios = pd.DataFrame.from_dict(filas, orient="index")
+        existentes = cambios.index.intersection(df.index)
+        nuevas = cambios.index.difference(df.index, sort=False)
+        for columna in cambios.columns:
+            if columna not in df.columns:
+                df[columna] = None
+            if len(existentes):
+                df[columna] = df[columna].astype(object)
+                df.loc[existentes, columna] = cambios.loc[existentes, columna]
+        if len(nuevas):
+            df = pd.concat([df, cambios.loc[nuevas]])
+    return df.infer_objects()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+COLUMNAS_AUSENCIAS = ["Nombre", "Desde", "Hasta", "Motivo"]
+
+class IndiceAusencias:
+    """Índice de intervalos de ausencia agrupados por participante.
+
+    Los intervalos de cada participante se ordenan por inicio y se guarda el máximo acumulado
+    de sus fines: está ausente en D si, entre los que empiezan hasta D, ese máximo llega a D.
+    Con las claves (participante, inicio) en un único array ordenado, una consulta es una
+    búsqueda binaria por participante, sin que una ausencia muy larga alargue la búsqueda.
+    """
+
+    def __init__(self, ausencias_df=None):
+        if ausencias_df is None or ausencias_df.empty:
+            ausencias_df = pd.DataFrame(columns=COLUMNAS_AUSENCIAS)
+        desde = pd.to_datetime(ausencias_df["Desde"], errors="coerce").to_numpy(dtype="datetime64[D]")
+        hasta = pd.to_datetime(ausencias_df["Hasta"], errors="coerce").to_numpy(dtype="datetime64[D]")
+        nombres = ausencias_df["Nombre"].fillna("").astype(str).to_numpy(dtype=object)
+
+        # Un intervalo sin fin se limita a su día de inicio; los que no tienen inicio se descartan
+        hasta = np.where(np.isnat(hasta), desde, hasta)
+        validos = ~np.isnat(desde) & (hasta >= desde) & (nombres != "")
+        codigos, self.nombres = pd.factorize(nombres[validos])
+        desde = desde[validos].astype(np.int64)
+        hasta = hasta[validos].astype(np.int64)
+
+        orden = np.lexsort((desde, codigos))
+        codigos, desde, hasta = codigos[orden], desde[orden], hasta[orden]
+        # Clave única ordenada: participante en la parte alta, día de inicio en la baja
+        self._base = int(desde.max() - desde.min()) + 1 if len(desde) else 1
+        self._minimo = int(desde.min()) if len(desde) else 0
+        self.claves = codigos.astype(np.int64) * self._base + (desde - self._minimo)
+        self.primera = np.searchsorted(codigos, np.arange(len(self.nombres)))
+        self.fin_maximo = pd.Series(hasta).groupby(codigos).cummax().to_numpy(dtype=np.int64) if len(hasta) else hasta
+
+    def ausentes(self, fecha):
+        """Nombres de los participantes ausentes en 'fecha'."""
+        if not len(self.nombres):
+            return set()
+        dia = int(np.datetime64(pd.Timestamp(fecha).date(), "D").astype(np.int64))
+        # Último intervalo de cada participante que empieza como tarde en 'dia'
+        desplazamiento = min(max(dia - self._minimo, -1), self._base - 1)
+        ultimo = np.searchsorted(self.claves, np.arange(len(self.nombres)) * self._base + desplazamiento, side="right") - 1
+        empezado = ultimo >= self.primera
+        ausente = np.zeros(len(self.nombres), dtype=bool)
+        ausente[empezado] = self.fin_maximo[ultimo[empezado]] >= dia
+        return set(self.nombres[ausente])
+
+    def disponibles(self, nombres, fecha):
+        """Máscara booleana: True para los nombres disponibles en 'fecha'."""
+        ausentes = self.ausentes(fecha)
+        if not ausentes:
+            return np.ones(len(nombres), dtype=bool)
+        return ~np.isin(np.asarray(nombres, dtype=object), list(ausentes))
@@ -0,0 +1,87 @@
+"""Escritura de tablas en segundo plano.
+
+datos_cache programa los guardados aquí y la interfaz no espera al disco. Los guardados
+pendientes de una misma tabla se agrupan: solo se escribe la última versión, con la unión
+de las filas cambiadas. volcar() espera a que todo esté escrito (se llama al cerrar).
+"""
+import threading
+
+from core import concurrencia
+
+_condicion = threading.Condition()
+_pendientes = {}   # tabla -> (DataFrame, filas cambiadas o None para la tabla completa)
+_fallidas = {}     # guardados que dieron error; se reintentan con el siguiente
+_escribiendo = False
+_hilo = None
+
+def _combinar(anterior, dataframe, filas):
+    """Agrupa un guardado nuevo con el pendiente de la misma tabla."""
+    if anterior is None:
+        return dataframe, filas
+    if filas is None or anterior[1] is None:
+        return dataframe, None
+    return dataframe, anterior[1] | filas
+
+def programar(tabla, dataframe, filas=None):
+    """Programa el guardado de 'tabla' (solo 'filas' si se indican) y vuelve enseguida."""
+    global _hilo
+    # Se guarda una copia para que la vista pueda seguir modificando su DataFrame
+    # (con pandas >= 3 la copia es perezosa, copy-on-write; antes es una copia completa)
+    filas = set(filas) if filas is not None else None
+    with _condicion:
+        guardado = _combinar(_fallidas.pop(tabla, None), dataframe.copy(), filas)
+        _pendientes[tabla] = _combinar(_pendientes.get(tabla), *guardado)
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_trabajar, name="escritor-datos", daemon=True)
+            _hilo.start()
+        _condicion.notify_all()
+
+def _trabajar():
+    global _escribiendo
+    while True:
+        with _condicion:
+            while not _pendientes:
+                _condicion.wait()
+            tabla = next(iter(_pendientes))
+            dataframe, filas = _pendientes.pop(tabla)
+            _escribiendo = True
+        try:
+            # Con el cerrojo de la tabla y combinando con lo que haya guardado otra instancia
+            concurrencia.guardar(tabla, dataframe, filas)
+            with _condicion:
+                _fallidas.pop(tabla, None)
+        except Exception as e:
+            print(f"[AVISO] No se pudo guardar {tabla}: {e}")
+            with _condicion:
+                if tabla in _pendientes:
+                    # Ya hay una versión más reciente en cola: solo se le añaden las filas que faltan
+                    _pendientes[tabla] = _combinar((dataframe, filas), *_pendientes[tabla])
+                else:
+                    _fallidas[tabla] = _combinar(_fallidas.get(tabla), dataframe, filas)
+        finally:
+            with _condicion:
+                _escribiendo = False
+                _condicion.notify_all()
+
+def volcar(timeout=None):
+    """Espera a que se escriban los guardados pendientes, reintentando una vez los fallidos.
+
+    Devuelve True si todo se ha escrito.
+    """
+    with _condicion:
+        for tabla, guardado in list(_fallidas.items()):
+            del _fallidas[tabla]
+            _pendientes[tabla] = _combinar(guardado, *_pendientes.get(tabla, guardado))
+        _condicion.notify_all()
+        _condicion.wait_for(lambda: not _pendientes and not _escribiendo, timeout)
+        return not _pendientes and not _escribiendo and not _fallidas
+
+def fallida(tabla):
+    """Indica si el último guardado de 'tabla' dio error y todavía no se ha escrito."""
+    with _condicion:
+        return tabla in _fallidas
+
+def hay_pendientes():
+    """Indica si queda algún guardado por escribir."""
+    with _condicion:
+        return bool(_pendientes or _escribiendo or _fallidas)
@@ -0,0 +1,106 @@
+"""Tipos de las columnas de cada tabla.
+
+Las tablas se tipan una vez al cargarlas: las fechas pasan a datetime64 y las columnas con
+pocos valores distintos (tipo, sala, género) a categóricas. Al guardar, las fechas vuelven
+a escribirse como texto YYYY-MM-DD. Las columnas de texto libre se dejan como se leen.
+"""
+import pandas as pd
+
+FECHA = "fecha"
+CATEGORIA = "categoria"
+ENTERO = "entero"
+TEXTO = "texto"
+
+ESQUEMA = {
+    "participantes": {
+        "Nombre": TEXTO,
+        "Género": CATEGORIA,
+        "Tipos": TEXTO,
+        "Última participación": FECHA,
+        "Último tipo": CATEGORIA,
+        "Última sala": CATEGORIA
+    },
+    "participaciones": {
+        "Fecha": FECHA,
+        "Número": ENTERO,
+        "Tipo": CATEGORIA,
+        "Género": CATEGORIA,
+        "Sala": CATEGORIA,
+        "Asignado": TEXTO,
+        "Notas": TEXTO,
+        "Cancelado": TEXTO
+    },
+    "opciones_tipos": {
+        "Tipos": TEXTO
+    },
+    "ausencias": {
+        "Nombre": TEXTO,
+        "Desde": FECHA,
+        "Hasta": FECHA,
+        "Motivo": TEXTO
+    },
+    "plantillas": {
+        "Plantilla": TEXTO,
+        "Día": TEXTO,
+        "Número": ENTERO,
+        "Tipo": CATEGORIA,
+        "Sala": CATEGORIA,
+        "Género": CATEGORIA
+    }
+}
+
+FORMATO_FECHA = "%Y-%m-%d"
+
+def _convertir(serie, tipo):
+    """Convierte una columna a su tipo; devuelve None si ya lo tiene."""
+    if tipo == FECHA and not pd.api.types.is_datetime64_any_dtype(serie):
+        return pd.to_datetime(serie, errors="coerce")
+    if tipo == CATEGORIA and not isinstance(serie.dtype, pd.CategoricalDtype):
+        # Los vacíos quedan como NaN, no como la categoría ""
+        return serie.where(serie.astype(str).str.strip() != "").astype("category")
+    if tipo == ENTERO and serie.dtype != "Int64":
+        return pd.to_numeric(serie, errors="coerce").round().astype("Int64")
+    return None
+
+def aplicar(tabla, df):
+    """Devuelve 'df' con los tipos del esquema de 'tabla'. Si ya los tiene, devuelve el mismo objeto."""
+    columnas = ESQUEMA.get(tabla)
+    if df is None or not columnas:
+        return df
+    convertidas = {}
+    for columna, tipo in columnas.items():
+        if columna in df.columns:
+            serie = _convertir(df[columna], tipo)
+            if serie is not None:
+                convertidas[columna] = serie
+    return df.assign(**convertidas) if convertidas else df
+
+def a_texto(df):
+    """Copia de 'df' con las fechas como texto YYYY-MM-DD, para escribirla en CSV."""
+    fechas = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    if not fechas:
+        return df
+    return df.assign(**{c: df[c].dt.strftime(FORMATO_FECHA) for c in fechas})
+
+def texto(valor):
+    """Valor listo para mostrar en una tabla de la interfaz: fechas como YYYY-MM-DD y vacíos como ""."""
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime(FORMATO_FECHA)
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    return valor
+
+def admitir(df, valores):
+    """Prepara {columna: valor} para asignarlo en 'df'.
+
+    Añade a las columnas categóricas las categorías que aún no tienen y cambia los
+    valores vacíos por None. Devuelve los valores a asignar.
+    """
+    admitidos = dict(valores)
+    for columna, valor in valores.items():
+        if columna in df.columns and isinstance(df[columna].dtype, pd.CategoricalDtype):
+            if valor is None or valor == "" or pd.isna(valor):
+                admitidos[columna] = None
+            elif valor not in df[columna].cat.categories:
+                df[columna] = df[columna].cat.add_categories([valor])
+    return admitidos
@@ -0,0 +1,147 @@
+"""Exportación de participaciones a CSV, XLSX u ODS directamente desde las tablas en memoria.
+
+Las filas se escriben por bloques a medida que se recorren, sin construir antes el archivo
+completo: el CSV se va añadiendo al archivo y el XLSX usa el libro de solo escritura de
+openpyxl. Un rango de fechas se puede exportar en un solo libro con una hoja por fecha o por
+sala (agrupar=POR_FECHA / POR_SALA), en una única pasada sobre las filas ordenadas.
+Se llama desde un hilo de trabajo; 'progreso' y 'cancelar' siguen el convenio del asignador.
+"""
+import csv
+import os
+import re
+
+import pandas as pd
+
+from core import datos_cache, esquema
+
+COLUMNAS = ["Fecha", "Número", "Sala", "Tipo", "Asignado"]
+
+TAMAÑO_BLOQUE = 5000
+
+# Agrupaciones en hojas: columna por la que se separan
+POR_FECHA = "fecha"
+POR_SALA = "sala"
+AGRUPACIONES = {POR_FECHA: "Fecha", POR_SALA: "Sala"}
+
+FORMATOS = (".csv", ".xlsx", ".ods")
+
+class ExportacionCancelada(Exception):
+    """El usuario canceló la exportación."""
+
+def participaciones(desde=None, hasta=None, columnas=COLUMNAS):
+    """Participaciones entre 'desde' y 'hasta' (incluidas) con las columnas a exportar."""
+    df = datos_cache.consultar("participaciones", desde, hasta, incluir_archivo=True)
+    if df.empty:
+        return pd.DataFrame(columns=columnas)
+    fechas = df["Fecha"].dt.normalize()
+    seleccion = fechas.notna()
+    if desde is not None:
+        seleccion &= fechas >= pd.Timestamp(desde).normalize()
+    if hasta is not None:
+        seleccion &= fechas <= pd.Timestamp(hasta).normalize()
+    return df.loc[seleccion, [c for c in columnas if c in df.columns]]
+
+# === Preparación de las filas ===
+def _ordenar(df, agrupar):
+    """Filas ordenadas por fecha y número; si se agrupa, primero por la columna de la hoja."""
+    orden = [c for c in ("Fecha", "Número", "Sala") if c in df.columns]
+    if agrupar:
+        columna = AGRUPACIONES[agrupar]
+        orden = [columna] + [c for c in orden if c != columna]
+    return df.sort_values(orden, kind="stable", na_position="last") if orden else df
+
+def _bloques(df, cancelar):
+    """Bloques de filas como texto listo para escribir (fechas YYYY-MM-DD, vacíos como None)."""
+    for inicio in range(0, len(df), TAMAÑO_BLOQUE):
+        if cancelar is not None and cancelar.is_set():
+            raise ExportacionCancelada()
+        bloque = esquema.a_texto(df.iloc[inicio:inicio + TAMAÑO_BLOQUE]).astype(object)
+        yield inicio, bloque.where(bloque.notna(), None)
+
+def _nombre_hoja(valor, usados):
+    """Nombre de hoja válido (31 caracteres, sin []:*?/\\) y distinto de los ya usados."""
+    nombre = re.sub(r"[\[\]:*?/\\]", "-", esquema.texto(valor) or "Sin valor")[:31]
+    base, n = nombre, 2
+    while nombre in usados:
+        sufijo = f" ({n})"
+        nombre, n = base[:31 - len(sufijo)] + sufijo, n + 1
+    usados.add(nombre)
+    return nombre
+
+# === Escritores ===
+def _escribir_csv(ruta, df, agrupar, avanzar, cancelar):
+    # Un CSV no tiene hojas: las filas se agrupan por orden
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(df.columns)
+        for inicio, bloque in _bloques(df, cancelar):
+            escritor.writerows(bloque.itertuples(index=False, name=None))
+            avanzar(inicio + len(bloque))
+
+def _escribir_xlsx(ruta, df, agrupar, avanzar, cancelar):
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)
+    columna = df.columns.get_loc(AGRUPACIONES[agrupar]) if agrupar else None
+    hoja, actual, usados = None, object(), set()
+    for inicio, bloque in _bloques(df, cancelar):
+        for fila in bloque.itertuples(index=False, name=None):
+            clave = fila[columna] if columna is not None else None
+            if hoja is None or clave != actual:
+                hoja = libro.create_sheet(_nombre_hoja(clave, usados) if agrupar else "Participaciones")
+                hoja.append(list(df.columns))
+                actual = clave
+            hoja.append(fila)
+        avanzar(inicio + len(bloque))
+    if hoja is None:
+        libro.create_sheet("Participaciones").append(list(df.columns))
+    libro.save(ruta)
+
+def _escribir_ods(ruta, df, agrupar, avanzar, cancelar):
+    # odfpy compone el documento en memoria: se escribe hoja a hoja al final
+    usados = set()
+    with pd.ExcelWriter(ruta, engine="odf") as libro:
+        if not agrupar or df.empty:
+            grupos = [("Participaciones", df)]
+        else:
+            grupos = ((_nombre_hoja(v, usados), g) for v, g in df.groupby(AGRUPACIONES[agrupar], sort=False, observed=True, dropna=False))
+        escritas = 0
+        for nombre, grupo in grupos:
+            partes = [bloque for _, bloque in _bloques(grupo, cancelar)]
+            texto = pd.concat(partes) if partes else grupo
+            texto.to_excel(libro, sheet_name=nombre, index=False)
+            escritas += len(grupo)
+            avanzar(escritas)
+
+ESCRITORES = {
+    ".csv": _escribir_csv,
+    ".xlsx": _escribir_xlsx,
+    ".ods": _escribir_ods
+}
+
+def exportar(ruta, df, agrupar=None, progreso=None, cancelar=None):
+    """Escribe 'df' en 'ruta' según su extensión (.csv, .xlsx u .ods).
+
+    Con 'agrupar' (POR_FECHA o POR_SALA), los libros tienen una hoja por valor de esa columna.
+    Se escribe en un temporal que sustituye al archivo al terminar: si falla o se cancela,
+    el archivo anterior queda intacto. Devuelve el número de filas exportadas.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in ESCRITORES:
+        raise ValueError("Formato de archivo no compatible.")
+    if agrupar is not None and agrupar not in AGRUPACIONES:
+        raise ValueError(f"Agrupación desconocida: {agrupar}")
+    df = _ordenar(df, agrupar)
+    total = max(len(df), 1)
+
+    def avanzar(escritas):
+        if progreso:
+            progreso(f"Exportadas {escritas} de {len(df)} filas", escritas - 1, total)
+
+    temporal = ruta + ".tmp" + extension
+    try:
+        ESCRITORES[extension](temporal, df, agrupar, avanzar, cancelar)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return len(df)
@@ -1,7 +1,12 @@
 import os
+import shutil
 import sys
+import tempfile
 import pandas as pd
 
+import config
+from core import diario, esquema, instantaneas, particiones
+
 # Función para ruta válida de archivos de datos
 def ruta_datos_local(relativa=""):
     """Devuelve una ruta válida de escritura para datos, incluso empaquetado con PyInstaller."""
@@ -18,21 +23,55 @@ def ruta_archivo(nombre_archivo):
     """Construye la ruta completa a un archivo dentro de la carpeta de datos."""
     return ruta_datos_local(nombre_archivo)
 
-def cargar_csv(nombre_archivo):
-    """Carga un archivo CSV como DataFrame. Devuelve DataFrame vacío si no existe o está malformado."""
+def cargar_csv(nombre_archivo, tabla=None):
+    """Carga un archivo CSV como DataFrame. Devuelve DataFrame vacío si no existe o está malformado.
+
+    Las tablas conocidas se devuelven con los tipos de core.esquema ('tabla' indica cuál si no
+    coincide con el nombre del archivo, como en las particiones). Si el CSV no ha cambiado
+    desde la última lectura se usa su instantánea binaria, ya tipada.
+    """
     ruta = ruta_archivo(nombre_archivo)
     if not os.path.exists(ruta):
         return pd.DataFrame()
+    df = instantaneas.cargar(ruta)
+    if df is not None:
+        return df
     try:
-        return pd.read_csv(ruta)
+        df = pd.read_csv(ruta)
     except pd.errors.EmptyDataError:
         print(f"[AVISO] Archivo CSV vacío: {nombre_archivo}. Se devolverá DataFrame vacío.")
         return pd.DataFrame()
+    df = esquema.aplicar(tabla or os.path.splitext(nombre_archivo)[0], df)
+    instantaneas.guardar(ruta, df)
+    return df
+
+def escribir_csv_sincronizado(ruta, dataframe):
+    """Escribe el CSV (fechas como YYYY-MM-DD) y no vuelve hasta que el sistema operativo lo ha pasado a disco."""
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        esquema.a_texto(dataframe).to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
 
 def guardar_csv(nombre_archivo, dataframe):
-    """Guarda un DataFrame en un archivo CSV."""
+    """Guarda un DataFrame en un archivo CSV de forma atómica.
+
+    Se escribe en un temporal que luego sustituye al original: un corte a mitad de la
+    escritura deja el archivo anterior intacto. Cada llamada usa su propio temporal, así
+    que dos escrituras a la vez (el escritor en segundo plano, la línea de comandos) no se
+    pisan el archivo.
+    """
     ruta = ruta_archivo(nombre_archivo)
-    dataframe.to_csv(ruta, index=False, encoding="utf-8")
+    carpeta, nombre = os.path.split(ruta)
+    descriptor, temporal = tempfile.mkstemp(prefix=nombre + ".", suffix=".tmp", dir=carpeta)
+    os.close(descriptor)
+    try:
+        if os.path.exists(ruta):
+            shutil.copymode(ruta, temporal)  # mkstemp lo crea solo para su dueño
+        escribir_csv_sincronizado(temporal, dataframe)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
 
 def asegurarse_archivo(nombre_archivo, columnas):
     """Crea un archivo CSV vacío con columnas dadas si no existe."""
@@ -47,3 +86,190 @@ def listar_csv():
     if not os.path.exists(base):
         os.makedirs(base)
     return [f for f in os.listdir(base) if f.endswith(".csv")]
+
+# === Almacenamiento intercambiable ===
+class AlmacenCSV:
+    """Una tabla por archivo CSV. Las tablas de particiones.TABLAS_PARTICIONADAS se reparten en un
+    CSV por año o mes (ver core/particiones.py). Las de diario.TABLAS_DIARIO guardan los cambios
+    por fila en un diario junto al CSV; en el resto, las operaciones por fila reescriben el archivo."""
+
+    def _archivo(self, tabla):
+        return tabla + ".csv"
+
+    def existe(self, tabla):
+        if particiones.particionada(tabla):
+            return particiones.existe(tabla)
+        return os.path.exists(ruta_archivo(self._archivo(tabla)))
+
+    def cargar(self, tabla):
+        if particiones.particionada(tabla):
+            return particiones.cargar(tabla)
+        df = cargar_csv(self._archivo(tabla))
+        if tabla in diario.TABLAS_DIARIO and self.existe(tabla):
+            df = diario.reproducir(tabla, df)
+        return df
+
+    def guardar(self, tabla, df):
+        if particiones.particionada(tabla):
+            particiones.guardar(tabla, df)
+        elif tabla in diario.TABLAS_DIARIO:
+            diario.guardar(tabla, df)
+        else:
+            guardar_csv(self._archivo(tabla), df)
+
+    def guardar_filas(self, tabla, df, filas):
+        """Guarda solo las filas 'filas' de la tabla completa 'df' (las ausentes se eliminan)."""
+        if particiones.particionada(tabla):
+            particiones.guardar_filas(tabla, df, filas)
+        elif tabla in diario.TABLAS_DIARIO:
+            diario.anotar(tabla, df, filas)
+        else:
+            self.guardar(tabla, df)
+
+    def archivos(self, tabla):
+        if particiones.particionada(tabla):
+            return particiones.archivos(tabla)
+        if tabla in diario.TABLAS_DIARIO:
+            return [diario.ruta_base(tabla), diario.ruta_diario(tabla)]
+        return [ruta_archivo(self._archivo(tabla))]
+
+    def asegurar(self, tabla, columnas):
+        if particiones.particionada(tabla):
+            return particiones.asegurar(tabla, columnas)
+        if self.existe(tabla):
+            return False
+        asegurarse_archivo(self._archivo(tabla), columnas)
+        return True
+
+    def insertar(self, tabla, filas_df):
+        self.guardar(tabla, pd.concat([self.cargar(tabla), filas_df], ignore_index=True))
+
+    def modificar(self, tabla, filas_df):
+        df = self.cargar(tabla)
+        for columna in filas_df.columns:
+            if columna not in df.columns:
+                df[columna] = ""
+            df[columna] = df[columna].astype(object)
+            df.loc[filas_df.index, columna] = filas_df[columna]
+        self.guardar_filas(tabla, df, filas_df.index)
+
+    def eliminar(self, tabla, indices):
+        self.guardar_filas(tabla, self.cargar(tabla).drop(index=list(indices)), list(indices))
+
+    def consultar(self, tabla, desde=None, hasta=None, filtros=None, archivadas=True):
+        if particiones.particionada(tabla):
+            # Solo se leen las particiones del rango, archivadas incluidas si se piden
+            df = particiones.consultar(tabla, desde, hasta, archivadas)
+        else:
+            df = self.cargar(tabla)
+        return self._filtrar(df, desde, hasta, filtros)
+
+    def _filtrar(self, df, desde, hasta, filtros):
+        if df.empty:
+            return df
+        seleccion = pd.Series(True, index=df.index)
+        if desde is not None or hasta is not None:
+            fechas = pd.to_datetime(df["Fecha"], errors="coerce").dt.normalize()
+            if desde is not None:
+                seleccion &= fechas >= pd.Timestamp(desde).normalize()
+            if hasta is not None:
+                seleccion &= fechas <= pd.Timestamp(hasta).normalize()
+        for columna, valor in (filtros or {}).items():
+            seleccion &= df[columna] == valor
+        return df[seleccion]
+
+    def siguiente_indice(self, tabla):
+        if particiones.particionada(tabla):
+            return particiones.siguiente_id(tabla)
+        # El CSV no guarda el índice: basta con el de la tabla en memoria
+        return 0
+
+    # === Archivo de particiones antiguas ===
+    def archivar(self, tabla, meses):
+        if not particiones.particionada(tabla):
+            return []
+        return particiones.archivar(tabla, meses)
+
+    def consultar_archivo(self, tabla, desde=None, hasta=None):
+        if not particiones.particionada(tabla):
+            return pd.DataFrame()
+        return self._filtrar(particiones.consultar_archivo(tabla, desde, hasta), desde, hasta, None)
+
+    def resumen_archivo(self, tabla):
+        if not particiones.particionada(tabla):
+            return []
+        return particiones.resumenes(tabla)
+
+_almacen = None
+
+def almacen():
+    """Devuelve el almacenamiento configurado en config.ALMACEN ("csv" por defecto o "sqlite")."""
+    global _almacen
+    if _almacen is None:
+        if getattr(config, "ALMACEN", "csv") == "sqlite":
+            from core.almacen_sqlite import AlmacenSQLite
+            _almacen = AlmacenSQLite()
+        else:
+            _almacen = AlmacenCSV()
+    return _almacen
+
+def cargar_tabla(tabla):
+    """Carga una tabla lógica ('participantes', 'participaciones', ...) del almacenamiento configurado."""
+    return esquema.aplicar(tabla, almacen().cargar(tabla))
+
+def guardar_tabla(tabla, dataframe):
+    """Sustituye una tabla completa en el almacenamiento configurado."""
+    almacen().guardar(tabla, dataframe)
+
+def archivos_tabla(tabla):
+    """Archivos en los que está guardada la tabla (vacío si el almacenamiento no es por archivos)."""
+    return almacen().archivos(tabla)
+
+def asegurarse_tabla(tabla, columnas):
+    """Crea la tabla vacía con esas columnas si no existe. Devuelve True si se ha creado."""
+    return almacen().asegurar(tabla, columnas)
+
+def guardar_filas(tabla, dataframe, filas):
+    """Guarda solo las filas con índice en 'filas' de la tabla 'dataframe'; las que ya no están se borran."""
+    almacen().guardar_filas(tabla, dataframe, filas)
+
+def insertar_filas(tabla, filas_df):
+    """Añade filas a una tabla; con SQLite su índice se conserva como identificador."""
+    almacen().insertar(tabla, filas_df)
+
+def modificar_filas(tabla, filas_df):
+    """Actualiza, por índice, las columnas de 'filas_df' en la tabla."""
+    almacen().modificar(tabla, filas_df)
+
+def eliminar_filas(tabla, indices):
+    """Borra las filas con esos índices."""
+    almacen().eliminar(tabla, indices)
+
+def consultar(tabla, desde=None, hasta=None, filtros=None, archivadas=True):
+    """Filas con 'Fecha' entre 'desde' y 'hasta' (incluidas) y columnas iguales a 'filtros'.
+
+    A diferencia de cargar_tabla(), incluye las filas archivadas salvo con archivadas=False.
+    """
+    return esquema.aplicar(tabla, almacen().consultar(tabla, desde, hasta, filtros, archivadas))
+
+def siguiente_indice(tabla):
+    """Primer índice que el almacenamiento no ha dado nunca a una fila de la tabla, archivadas incluidas."""
+    return almacen().siguiente_indice(tabla)
+
+def archivar(tabla, meses=None):
+    """Archiva las filas anteriores a hoy menos 'meses' (config.HORIZONTE_ARCHIVO por defecto).
+
+    Devuelve las particiones archivadas; con HORIZONTE_ARCHIVO = None no se archiva nada.
+    """
+    meses = meses if meses is not None else getattr(config, "HORIZONTE_ARCHIVO", None)
+    if meses is None:
+        return []
+    return almacen().archivar(tabla, meses)
+
+def consultar_archivo(tabla, desde=None, hasta=None):
+    """Como consultar(), pero solo entre las filas archivadas. Vacío si no hay archivo."""
+    return esquema.aplicar(tabla, almacen().consultar_archivo(tabla, desde, hasta))
+
+def resumen_archivo(tabla):
+    """Resúmenes por participante de las filas archivadas, para IndiceHistorial(..., archivo=...)."""
+    return almacen().resumen_archivo(tabla)
@@ -0,0 +1,143 @@
+"""Importación de participantes desde CSV, XLSX u ODS en segundo plano.
+
+El archivo se lee por bloques de TAMAÑO_BLOQUE filas y cada bloque se valida por separado:
+columnas requeridas, nombres vacíos o repetidos (se queda el primero) y fechas no válidas.
+leer() se ejecuta en un hilo de trabajo y devuelve la tabla limpia con un informe; fusionar()
+la combina con la tabla actual y se llama en el hilo de la interfaz, justo antes de pasarla a
+datos_cache de una vez.
+"""
+import os
+
+import pandas as pd
+
+from core import esquema
+
+COLUMNAS = ["Nombre", "Género", "Tipos", "Última participación", "Último tipo", "Última sala"]
+
+TAMAÑO_BLOQUE = 5000
+
+# Modos de fusionar()
+REEMPLAZAR = "reemplazar"  # la tabla pasa a ser la del archivo
+COMBINAR = "combinar"      # se actualizan por nombre los que ya están y se añaden los nuevos
+
+class ImportacionCancelada(Exception):
+    """El usuario canceló la importación."""
+
+# === Lectura por bloques ===
+def _bloques_csv(ruta):
+    """Bloques del CSV con la fracción del archivo leída tras cada uno."""
+    tamaño = os.path.getsize(ruta) or 1
+    with open(ruta, "rb") as f:
+        for bloque in pd.read_csv(f, chunksize=TAMAÑO_BLOQUE, dtype=str, keep_default_na=False):
+            yield bloque, min(f.tell() / tamaño, 1)
+
+def _bloques_xlsx(ruta):
+    """Bloques de la primera hoja leída fila a fila, sin cargar el libro completo."""
+    from openpyxl import load_workbook
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        total = max((hoja.max_row or 1) - 1, 1)
+        filas = hoja.iter_rows(values_only=True)
+        cabecera = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+        bloque, leidas = [], 0
+        for fila in filas:
+            bloque.append(fila[:len(cabecera)])
+            if len(bloque) == TAMAÑO_BLOQUE:
+                leidas += len(bloque)
+                yield pd.DataFrame(bloque, columns=cabecera), min(leidas / total, 1)
+                bloque = []
+        if bloque or not leidas:
+            yield pd.DataFrame(bloque, columns=cabecera), 1
+    finally:
+        libro.close()
+
+def _bloques_ods(ruta):
+    """Bloques de un ODS. odfpy no lee por partes: el archivo se lee entero (en el hilo de trabajo)."""
+    df = pd.read_excel(ruta, engine="odf", dtype=str)
+    for inicio in range(0, max(len(df), 1), TAMAÑO_BLOQUE):
+        yield df.iloc[inicio:inicio + TAMAÑO_BLOQUE], min((inicio + TAMAÑO_BLOQUE) / max(len(df), 1), 1)
+
+LECTORES = {
+    ".csv": _bloques_csv,
+    ".xlsx": _bloques_xlsx,
+    ".ods": _bloques_ods
+}
+
+# === Validación ===
+def _validar(bloque, vistos, informe):
+    """Limpia un bloque: columnas requeridas como texto, sin nombres vacíos ni repetidos.
+
+    'vistos' es el conjunto de nombres de los bloques anteriores; se amplía con los de este.
+    """
+    faltan = [c for c in COLUMNAS if c not in bloque.columns]
+    if faltan:
+        raise ValueError(f"El archivo no contiene las columnas requeridas: {', '.join(faltan)}")
+    bloque = bloque[COLUMNAS].astype(object)
+    bloque = bloque.where(bloque.notna(), "").astype(str).apply(lambda c: c.str.strip())
+    informe["filas"] += len(bloque)
+
+    nombres = bloque["Nombre"]
+    vacios = nombres == ""
+    repetidos = ~vacios & (nombres.duplicated() | nombres.isin(vistos))
+    informe["sin_nombre"] += int(vacios.sum())
+    informe["repetidos"] += int(repetidos.sum())
+    bloque = bloque[~vacios & ~repetidos]
+    vistos.update(bloque["Nombre"])
+
+    fechas = pd.to_datetime(bloque["Última participación"], errors="coerce", format="mixed")
+    informe["fechas_no_validas"] += int((fechas.isna() & (bloque["Última participación"] != "")).sum())
+    return bloque.replace("", None).assign(**{"Última participación": fechas})
+
+def leer(ruta, progreso=None, cancelar=None):
+    """Lee y valida el archivo por bloques. Devuelve (participantes, informe).
+
+    'progreso(etapa, paso, total)' se llama tras cada bloque (compatible con la barra de
+    carga); si el evento 'cancelar' se activa, se lanza ImportacionCancelada.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in LECTORES:
+        raise ValueError("Formato no soportado")
+    informe = {"filas": 0, "sin_nombre": 0, "repetidos": 0, "fechas_no_validas": 0}
+    vistos = set()
+    partes = []
+    for bloque, leido in LECTORES[extension](ruta):
+        if cancelar is not None and cancelar.is_set():
+            raise ImportacionCancelada()
+        partes.append(_validar(bloque, vistos, informe))
+        if progreso:
+            progreso(f"Leídas {informe['filas']} filas", int(leido * 100) - 1, 100)
+    participantes = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS)
+    return esquema.aplicar("participantes", participantes), informe
+
+# === Fusión con la tabla actual ===
+def fusionar(actual, importados, modo=REEMPLAZAR):
+    """Tabla de participantes resultante de importar 'importados' sobre 'actual'.
+
+    Con COMBINAR, los que ya existen (por nombre) toman los valores no vacíos del archivo y
+    los nuevos se añaden al final. Devuelve (tabla, añadidos, actualizados).
+    """
+    if modo == REEMPLAZAR or actual is None or actual.empty:
+        return importados, len(importados), 0
+    existentes = importados["Nombre"].isin(actual["Nombre"])
+    resultado = actual.copy()
+    posiciones = pd.Series(resultado.index, index=resultado["Nombre"])
+    posiciones = posiciones[~posiciones.index.duplicated()]
+    nuevos_valores = importados[existentes].set_index("Nombre")
+    filas = posiciones[nuevos_valores.index].to_numpy()
+    for columna in nuevos_valores.columns:
+        valores = nuevos_valores[columna]
+        if columna not in resultado.columns:
+            resultado[columna] = None
+        con_valor = valores.notna().to_numpy()
+        if con_valor.any():
+            if isinstance(resultado[columna].dtype, pd.CategoricalDtype):
+                faltan = set(valores.dropna()) - set(resultado[columna].cat.categories)
+                if faltan:
+                    resultado[columna] = resultado[columna].cat.add_categories(sorted(faltan))
+            resultado.loc[filas[con_valor], columna] = valores[con_valor].to_numpy()
+    inicio = int(resultado.index.max()) + 1 if len(resultado) else 0
+    añadidos = importados[~existentes]
+    añadidos = añadidos.set_axis(range(inicio, inicio + len(añadidos)))
+    resultado = pd.concat([resultado, añadidos])
+    return esquema.aplicar("participantes", resultado), len(añadidos), int(existentes.sum())
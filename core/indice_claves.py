@@ -0,0 +1,62 @@
+import pandas as pd
+
+COLUMNAS_CLAVE = ["Fecha", "Número", "Sala"]
+
+def clave(fecha, numero, sala):
+    """Clave natural de una participación a partir de sus valores (texto o ya tipados)."""
+    fecha = pd.to_datetime(fecha, errors="coerce")
+    numero = pd.to_numeric(numero, errors="coerce")
+    return (
+        None if pd.isna(fecha) else fecha.normalize(),
+        None if pd.isna(numero) else int(numero),
+        "" if sala is None or pd.isna(sala) else str(sala)
+    )
+
+def _claves(df):
+    """Claves de todas las filas de 'df', en su orden."""
+    fechas = pd.to_datetime(df["Fecha"], errors="coerce").dt.normalize().astype(object)
+    numeros = pd.to_numeric(df["Número"], errors="coerce").astype("Int64").astype(object)
+    salas = df["Sala"].astype(object).where(df["Sala"].notna(), "").astype(str)
+    return zip(
+        (None if pd.isna(f) else f for f in fechas),
+        (None if pd.isna(n) else int(n) for n in numeros),
+        salas
+    )
+
+class IndiceClaves:
+    """Índice hash de las participaciones por su clave natural (Fecha, Número, Sala).
+
+    Devuelve el índice de la fila en la tabla, que no cambia al insertar o borrar otras.
+    Se construye una vez y después se mantiene con actualizar() por las filas cambiadas,
+    así que localizar N filas cuesta O(N) en lugar de recorrer la tabla por cada una.
+    """
+
+    def __init__(self, participaciones_df=None):
+        self.filas = {}   # clave -> índice de la fila
+        self.claves = {}  # índice de la fila -> clave, para quitar la anterior al cambiarla
+        if participaciones_df is not None and not participaciones_df.empty:
+            # Si una clave se repite se queda la primera fila
+            for indice, c in zip(participaciones_df.index[::-1], list(_claves(participaciones_df))[::-1]):
+                self.filas[c] = indice
+                self.claves[indice] = c
+
+    def buscar(self, fecha, numero, sala):
+        """Índice de la participación con esa clave, o None si no existe."""
+        return self.filas.get(clave(fecha, numero, sala))
+
+    def actualizar(self, participaciones_df, indices):
+        """Vuelve a indexar las filas 'indices' (añadidas, modificadas o eliminadas) de la tabla."""
+        indices = list(indices)
+        for indice in indices:
+            anterior = self.claves.pop(indice, None)
+            if anterior is not None and self.filas.get(anterior) == indice:
+                del self.filas[anterior]
+        presentes = participaciones_df.index.intersection(indices)
+        if presentes.empty:
+            return
+        for indice, c in zip(presentes, _claves(participaciones_df.loc[presentes])):
+            self.filas.setdefault(c, indice)
+            self.claves[indice] = c
+
+    def __len__(self):
+        return len(self.filas)
@@ -0,0 +1,204 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+class IndiceHistorial:
+    """Resumen por participante de todo el historial de participaciones.
+
+    Guarda las fechas de participación ordenadas, la última fecha por tipo, la última sala
+    y el número de participaciones no realizadas. De las participaciones archivadas solo
+    se guarda su resumen (total y última fecha). Se construye una vez desde la tabla
+    completa y después se actualiza de forma incremental con registrar(), quitar() y
+    registrar_no_realizada().
+    """
+
+    def __init__(self, participaciones_df=None, archivo=()):
+        self.reconstruir(participaciones_df, archivo)
+
+    def reconstruir(self, participaciones_df, archivo=()):
+        """Vuelve a calcular el índice desde la tabla completa de participaciones.
+
+        'archivo' son los resúmenes de las participaciones archivadas (ver resumen()), que
+        cuentan para las últimas fechas, la última sala y las no realizadas.
+        """
+        self.fechas = {}
+        self.detalle = {}       # nombre -> [(fecha, tipo, sala)] de la tabla, para poder quitar
+        self.ultima_tipo = {}
+        self.sala = {}
+        self.fallos = Counter()
+        self.archivadas = {}
+        self.archivo_tipo = {}  # nombre -> {tipo: fecha} y (fecha, sala) según los archivos
+        self.archivo_sala = {}
+        if participaciones_df is not None and not participaciones_df.empty and "Asignado" in participaciones_df.columns:
+            self._resumir_tabla(participaciones_df)
+        for resumen in archivo:
+            self.añadir_archivo(resumen)
+
+    def _resumir_tabla(self, participaciones_df):
+        asignado = participaciones_df["Asignado"].fillna("").astype(str).str.strip()
+        fechas = pd.to_datetime(participaciones_df["Fecha"], errors="coerce")
+        validas = (asignado != "") & fechas.notna()
+        tabla = pd.DataFrame({
+            "Nombre": asignado[validas],
+            "Fecha": fechas[validas],
+            "Tipo": participaciones_df.loc[validas, "Tipo"],
+            "Sala": participaciones_df.loc[validas, "Sala"]
+        }).sort_values("Fecha", kind="stable")
+
+        self.fechas = tabla.groupby("Nombre")["Fecha"].agg(list).to_dict()
+        for nombre, fecha, tipo, sala in zip(tabla["Nombre"], tabla["Fecha"], tabla["Tipo"], tabla["Sala"]):
+            self.detalle.setdefault(nombre, []).append((fecha, tipo, sala))
+        for (nombre, tipo), fecha in tabla.groupby(["Nombre", "Tipo"], observed=True)["Fecha"].max().items():
+            self.ultima_tipo.setdefault(nombre, {})[tipo] = fecha
+        ultimas = tabla.drop_duplicates("Nombre", keep="last")
+        self.sala = dict(zip(ultimas["Nombre"], zip(ultimas["Fecha"], ultimas["Sala"])))
+
+        if "Notas" in participaciones_df.columns:
+            no_realizadas = participaciones_df["Notas"].astype(str).str.contains("No realizada", na=False)
+            self.fallos.update(asignado[no_realizadas & (asignado != "")].value_counts().to_dict())
+        # Cancelaciones ya sustituidas por otro participante
+        if "Cancelado" in participaciones_df.columns:
+            cancelado = participaciones_df["Cancelado"].fillna("").astype(str).str.strip()
+            self.fallos.update(cancelado[cancelado != ""].value_counts().to_dict())
+
+    # === Participaciones archivadas ===
+    def resumen(self):
+        """Resumen por participante, serializable a JSON, para guardarlo junto a un archivo.
+
+        {nombre: {"participaciones", "ultima", "sala", "no_realizadas", "tipos": {tipo: fecha}}}
+        """
+        def fecha(valor):
+            return None if pd.isna(valor) else pd.Timestamp(valor).strftime("%Y-%m-%d")
+
+        nombres = set(self.fechas) | set(self.archivadas) | {n for n, v in self.fallos.items() if v}
+        resumen = {}
+        for nombre in sorted(nombres):
+            sala = self.ultima_sala(nombre)
+            resumen[nombre] = {
+                "participaciones": self.recuento(nombre),
+                "ultima": fecha(self.ultima(nombre)),
+                "sala": sala if isinstance(sala, str) else None,
+                "no_realizadas": int(self.no_realizadas(nombre)),
+                "tipos": {str(tipo): fecha(f) for tipo, f in self.ultima_tipo.get(nombre, {}).items()}
+            }
+        return resumen
+
+    def añadir_archivo(self, resumen):
+        """Suma al índice el resumen de unas participaciones archivadas (ver resumen())."""
+        for nombre, datos in resumen.items():
+            ultima = pd.Timestamp(datos["ultima"]) if datos.get("ultima") else pd.NaT
+            total, anterior = self.archivadas.get(nombre, (0, pd.NaT))
+            self.archivadas[nombre] = (total + datos.get("participaciones", 0),
+                                       ultima if pd.isna(anterior) or ultima > anterior else anterior)
+            por_tipo = self.ultima_tipo.setdefault(nombre, {})
+            archivo_tipo = self.archivo_tipo.setdefault(nombre, {})
+            for tipo, fecha in datos.get("tipos", {}).items():
+                fecha = pd.Timestamp(fecha)
+                if tipo not in por_tipo or fecha > por_tipo[tipo]:
+                    por_tipo[tipo] = fecha
+                if tipo not in archivo_tipo or fecha > archivo_tipo[tipo]:
+                    archivo_tipo[tipo] = fecha
+            if not pd.isna(ultima):
+                if nombre not in self.sala or ultima > self.sala[nombre][0]:
+                    self.sala[nombre] = (ultima, datos.get("sala"))
+                if nombre not in self.archivo_sala or ultima > self.archivo_sala[nombre][0]:
+                    self.archivo_sala[nombre] = (ultima, datos.get("sala"))
+            if datos.get("no_realizadas"):
+                self.fallos[nombre] += datos["no_realizadas"]
+
+    # === Actualización incremental ===
+    def registrar(self, nombre, fecha, tipo, sala):
+        """Añade una participación nueva de 'nombre'."""
+        fecha = pd.Timestamp(fecha)
+        insort(self.fechas.setdefault(nombre, []), fecha)
+        self.detalle.setdefault(nombre, []).append((fecha, tipo, sala))
+        por_tipo = self.ultima_tipo.setdefault(nombre, {})
+        if tipo not in por_tipo or fecha > por_tipo[tipo]:
+            por_tipo[tipo] = fecha
+        if nombre not in self.sala or fecha >= self.sala[nombre][0]:
+            self.sala[nombre] = (fecha, sala)
+
+    def quitar(self, nombre, fecha, tipo):
+        """Quita una participación de 'nombre' (por ejemplo, al reasignarla a otro).
+
+        Si era su última de ese tipo o la de su última sala, se recalculan con el resto de
+        sus participaciones. Devuelve False si no estaba registrada.
+        """
+        fecha = pd.Timestamp(fecha)
+        fechas = self.fechas.get(nombre, [])
+        i = bisect_left(fechas, fecha)
+        if i == len(fechas) or fechas[i] != fecha:
+            return False
+        del fechas[i]
+        detalle = self.detalle.get(nombre, [])
+        for k, (f, t, _) in enumerate(detalle):
+            if f == fecha and t == tipo:
+                del detalle[k]
+                break
+
+        por_tipo = self.ultima_tipo.get(nombre, {})
+        if por_tipo.get(tipo) == fecha:
+            candidatas = [f for f, t, _ in detalle if t == tipo]
+            if tipo in self.archivo_tipo.get(nombre, {}):
+                candidatas.append(self.archivo_tipo[nombre][tipo])
+            if candidatas:
+                por_tipo[tipo] = max(candidatas)
+            else:
+                del por_tipo[tipo]
+        if self.sala.get(nombre, (None,))[0] == fecha:
+            candidatas = [(f, s) for f, _, s in detalle]
+            if nombre in self.archivo_sala:
+                candidatas.append(self.archivo_sala[nombre])
+            if candidatas:
+                self.sala[nombre] = max(candidatas, key=lambda c: c[0])
+            else:
+                del self.sala[nombre]
+        return True
+
+    def registrar_no_realizada(self, nombre):
+        """Suma una participación no realizada a 'nombre'."""
+        self.fallos[nombre] += 1
+
+    # === Consultas (O(1) por participante salvo recuento por ventana) ===
+    def ultima(self, nombre, tipo=None):
+        """Fecha de la última participación (de un tipo concreto si se indica) o NaT."""
+        if tipo is not None:
+            return self.ultima_tipo.get(nombre, {}).get(tipo, pd.NaT)
+        fechas = self.fechas.get(nombre)
+        archivada = self.archivadas.get(nombre, (0, pd.NaT))[1]
+        if not fechas:
+            return archivada
+        return fechas[-1] if pd.isna(archivada) or fechas[-1] >= archivada else archivada
+
+    def ultima_sala(self, nombre):
+        """Sala de la última participación o None."""
+        return self.sala.get(nombre, (None, None))[1]
+
+    def no_realizadas(self, nombre):
+        """Número de participaciones marcadas como no realizadas."""
+        return self.fallos.get(nombre, 0)
+
+    def recuento(self, nombre, dias=None, hasta=None):
+        """Participaciones de 'nombre', en total o en los 'dias' anteriores a 'hasta' (hoy por defecto).
+
+        Las participaciones archivadas solo cuentan en el total.
+        """
+        fechas = self.fechas.get(nombre, [])
+        if dias is None:
+            return len(fechas) + self.archivadas.get(nombre, (0, pd.NaT))[0]
+        hasta = pd.Timestamp(hasta) if hasta is not None else pd.Timestamp.today().normalize()
+        return bisect_right(fechas, hasta) - bisect_right(fechas, hasta - pd.Timedelta(days=dias))
+
+    # === Consultas vectoriales para los motores de asignación ===
+    def penalizados(self, nombres):
+        """Máscara de los participantes con alguna participación no realizada."""
+        return np.array([self.fallos.get(n, 0) > 0 for n in nombres], dtype=bool)
+
+    def ultimas(self, nombres):
+        """Array datetime64 con la última participación de cada nombre."""
+        return pd.DatetimeIndex([self.ultima(n) for n in nombres]).to_numpy(dtype="datetime64[ns]")
+
+    def ultimas_salas(self, nombres):
+        """Array con la última sala de cada nombre (None si nunca participó)."""
+        return np.array([self.ultima_sala(n) for n in nombres], dtype=object)
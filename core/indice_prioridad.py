@@ -0,0 +1,69 @@
+import heapq
+import numpy as np
+
+def dias_desde(ultimas, fecha):
+    """Días transcurridos desde cada última participación hasta 'fecha' (9999 si nunca participó)."""
+    dias = (fecha - ultimas) / np.timedelta64(1, "D")
+    return np.where(np.isnan(dias), 9999.0, np.floor(dias))
+
+class IndicePrioridad:
+    """Índice persistente con un montículo de mínimos por tipo, ordenado por última participación.
+
+    La penalización divide a la mitad los días sin participar, así que su orden relativo
+    frente a los no penalizados depende de la fecha del hueco. Por eso cada tipo tiene dos
+    montículos (normales y penalizados): dentro de cada uno el orden es fijo y solo hay que
+    comparar las dos cimas al elegir.
+    """
+
+    def __init__(self, elegibles, ultimas, penalizados):
+        """Construye los montículos a partir de la máscara participantes × tipos."""
+        self.ultimas = ultimas
+        self.factor = np.where(penalizados, 0.5, 1.0)
+        self.version = np.zeros(len(ultimas), dtype=np.int64)
+        self.grupo = penalizados.astype(int)
+        self.tipos_de = [np.flatnonzero(fila) for fila in elegibles]
+
+        # Las fechas vacías (NaT) se codifican como el entero mínimo y quedan en la cima
+        claves = ultimas.view("i8")
+        self.monticulos = []
+        for k in range(elegibles.shape[1]):
+            grupos = ([], [])
+            for j in np.flatnonzero(elegibles[:, k]):
+                grupos[self.grupo[j]].append((int(claves[j]), int(j), 0))
+            for monticulo in grupos:
+                heapq.heapify(monticulo)
+            self.monticulos.append(grupos)
+
+    def _cima_valida(self, monticulo, valido):
+        """Devuelve el primer participante vigente del montículo que cumple 'valido'."""
+        apartados = []
+        elegido = None
+        while monticulo:
+            _, j, version = monticulo[0]
+            if version != self.version[j]:
+                heapq.heappop(monticulo)  # entrada obsoleta tras una asignación
+                continue
+            if valido(j):
+                elegido = j
+                break
+            apartados.append(heapq.heappop(monticulo))
+        for entrada in apartados:
+            heapq.heappush(monticulo, entrada)
+        return elegido
+
+    def seleccionar(self, k, fecha, valido):
+        """Devuelve el participante de mayor prioridad para el tipo k que cumple 'valido', o None."""
+        cimas = [j for j in (self._cima_valida(m, valido) for m in self.monticulos[k]) if j is not None]
+        if not cimas:
+            return None
+        cimas = np.array(sorted(cimas))
+        prioridad = dias_desde(self.ultimas[cimas], fecha) * self.factor[cimas]
+        return int(cimas[np.argmax(prioridad)])
+
+    def actualizar(self, j, fecha):
+        """Registra una nueva participación de j y lo reubica en los montículos de sus tipos."""
+        self.ultimas[j] = fecha
+        self.version[j] += 1
+        entrada = (int(self.ultimas[j:j + 1].view("i8")[0]), j, int(self.version[j]))
+        for k in self.tipos_de[j]:
+            heapq.heappush(self.monticulos[k][self.grupo[j]], entrada)
@@ -0,0 +1,57 @@
+"""Instantáneas binarias de los CSV para arrancar sin volver a analizarlos.
+
+Por cada CSV leído se guarda un pickle con el DataFrame ya tipado y el tamaño y la fecha de
+modificación del CSV. Si el CSV no ha cambiado, se carga la instantánea; si ha cambiado (o
+la instantánea no se puede leer), se vuelve al CSV. El CSV sigue siendo el formato de
+intercambio.
+
+Leer un pickle puede ejecutar código, así que las instantáneas no van en la carpeta de datos,
+que se puede compartir entre equipos, sino en la caché local de cada usuario (carpeta()).
+"""
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+FORMATO = 1
+
+def carpeta():
+    """Carpeta de caché local del usuario: %LOCALAPPDATA% en Windows, $XDG_CACHE_HOME o ~/.cache."""
+    base = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "GestorParticipantes", "instantaneas")
+
+def _ruta_instantanea(ruta_csv):
+    # Cada carpeta de datos tiene sus instantáneas: la ruta completa del CSV forma parte del nombre
+    clave = hashlib.sha1(os.path.abspath(ruta_csv).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(carpeta(), f"{os.path.basename(ruta_csv)}.{clave}.pkl")
+
+def _firma(ruta_csv):
+    estado = os.stat(ruta_csv)
+    return {"formato": FORMATO, "pandas": pd.__version__, "mtime_ns": estado.st_mtime_ns, "tamaño": estado.st_size}
+
+def cargar(ruta_csv):
+    """Devuelve el DataFrame de la instantánea si corresponde al CSV actual; si no, None."""
+    ruta = _ruta_instantanea(ruta_csv)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, "rb") as f:
+            firma, df = pickle.load(f)
+    except Exception:
+        # Instantánea dañada o de otra versión de pandas: se vuelve a leer el CSV
+        return None
+    return df if firma == _firma(ruta_csv) else None
+
+def guardar(ruta_csv, df):
+    """Guarda la instantánea de un CSV recién leído. Un fallo aquí no impide seguir con el CSV."""
+    ruta = _ruta_instantanea(ruta_csv)
+    try:
+        os.makedirs(os.path.dirname(ruta), mode=0o700, exist_ok=True)
+        temporal = ruta + ".tmp"
+        with open(temporal, "wb") as f:
+            pickle.dump((_firma(ruta_csv), df), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta)
+    except OSError as e:
+        print(f"[AVISO] No se pudo guardar la instantánea de {os.path.basename(ruta_csv)}: {e}")
@@ -0,0 +1,342 @@
+"""Tablas CSV particionadas por fecha.
+
+'participaciones' se guarda en la carpeta 'data/participaciones/' con un CSV por año (o por
+mes, según config.PARTICIONES) y un manifiesto pequeño, 'manifiesto.json', con el periodo,
+las columnas y el número de filas de cada partición. Cada CSV lleva una columna 'id' con el
+índice de la fila, que se conserva entre particiones. El manifiesto guarda también el mayor
+id emitido ('ultimo_id'), archivadas incluidas, para que las filas nuevas no reutilicen el
+de una fila archivada.
+
+Al guardar filas sueltas solo se reescriben las particiones que cambian, sin diario: una
+partición es pequeña y reescribirla cuesta poco más que anotar el cambio. Las consultas por
+rango de fechas solo leen las particiones que lo cubren. La primera vez que se abre, el
+'participaciones.csv' único (con su diario) se reparte en particiones.
+
+Las particiones anteriores al horizonte de config.HORIZONTE_ARCHIVO se pueden archivar:
+pasan comprimidas a 'archivo/<clave>.csv.gz' y 'archivo/resumen.json' guarda el resumen
+por participante de cada una (ver IndiceHistorial.resumen()). cargar() solo devuelve las
+particiones sin archivar; consultar() también lee las archivadas que cubre el rango.
+"""
+import gzip
+import json
+import os
+import threading
+
+import pandas as pd
+
+import config
+from core import diario, esquema, gestor_datos
+from core.indice_historial import IndiceHistorial
+
+# Tablas que se guardan particionadas por fecha
+TABLAS_PARTICIONADAS = {"participaciones"}
+
+COLUMNA_FECHA = "Fecha"
+COLUMNA_ID = "id"
+MANIFIESTO = "manifiesto.json"
+CARPETA_ARCHIVO = "archivo"
+RESUMEN = "resumen.json"
+SIN_FECHA = "sin_fecha"
+FORMATO = 1
+
+# Las particiones y el manifiesto se escriben desde el hilo del escritor y se leen desde la interfaz
+_cerrojo = threading.RLock()
+
+def periodo():
+    """Periodo de partición configurado: "año", "mes" o None (sin particiones)."""
+    return getattr(config, "PARTICIONES", "año")
+
+def particionada(tabla):
+    return tabla in TABLAS_PARTICIONADAS and periodo() in ("año", "mes")
+
+def _ruta_manifiesto(tabla):
+    return gestor_datos.ruta_archivo(os.path.join(tabla, MANIFIESTO))
+
+def _archivo(tabla, clave):
+    return os.path.join(tabla, clave + ".csv")
+
+def _ruta_archivada(tabla, clave):
+    return gestor_datos.ruta_archivo(os.path.join(tabla, CARPETA_ARCHIVO, clave + ".csv.gz"))
+
+def _ruta_resumen(tabla):
+    return gestor_datos.ruta_archivo(os.path.join(tabla, CARPETA_ARCHIVO, RESUMEN))
+
+def _ruta_unica(tabla):
+    return gestor_datos.ruta_archivo(tabla + ".csv")
+
+def _claves(df):
+    """Partición de cada fila de 'df' según su fecha."""
+    if COLUMNA_FECHA not in df.columns:
+        return pd.Series(SIN_FECHA, index=df.index)
+    formato = "%Y" if periodo() == "año" else "%Y-%m"
+    fechas = pd.to_datetime(df[COLUMNA_FECHA], errors="coerce")
+    return fechas.dt.strftime(formato).fillna(SIN_FECHA)
+
+def _intervalo(clave):
+    """Días [inicio, fin) que cubre una partición, o None si es la de filas sin fecha."""
+    if clave == SIN_FECHA:
+        return None
+    inicio = pd.Timestamp(clave)
+    return inicio, inicio + (pd.DateOffset(years=1) if len(clave) == 4 else pd.DateOffset(months=1))
+
+def _solapa(clave, desde, hasta):
+    intervalo = _intervalo(clave)
+    if intervalo is None:
+        return desde is None and hasta is None
+    inicio, fin = intervalo
+    if desde is not None and fin <= pd.Timestamp(desde).normalize():
+        return False
+    if hasta is not None and inicio > pd.Timestamp(hasta).normalize():
+        return False
+    return True
+
+# === Manifiesto ===
+def _leer_manifiesto(tabla):
+    ruta = _ruta_manifiesto(tabla)
+    if not os.path.exists(ruta):
+        return {"formato": FORMATO, "periodo": periodo(), "columnas": [], "particiones": {}, "archivadas": {}}
+    with open(ruta, encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    manifiesto.setdefault("archivadas", {})
+    return manifiesto
+
+def _escribir_json(ruta, contenido):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+def _escribir_manifiesto(tabla, manifiesto):
+    _escribir_json(_ruta_manifiesto(tabla), manifiesto)
+
+def _ultimo_id(tabla, manifiesto):
+    """Mayor id emitido en la tabla, en particiones activas o archivadas (-1 si no hay filas)."""
+    if "ultimo_id" in manifiesto:
+        return manifiesto["ultimo_id"]
+    # Manifiesto anterior a 'ultimo_id': se calcula con las filas que haya en disco
+    partes = [_leer_archivada(tabla, c) for c in manifiesto["archivadas"]]
+    partes += [_leer_particion(tabla, c) for c in _en_disco(tabla)]
+    return max((int(p.index.max()) for p in partes if not p.empty), default=-1)
+
+def siguiente_id(tabla):
+    """Primer id que no ha usado ninguna fila de la tabla, tampoco las archivadas."""
+    with _cerrojo:
+        if not os.path.exists(_ruta_manifiesto(tabla)):
+            return 0
+        return _ultimo_id(tabla, _leer_manifiesto(tabla)) + 1
+
+def _en_disco(tabla):
+    """Particiones sin archivar con archivo.
+
+    Se mira la carpeta además del manifiesto por si un corte lo dejó atrasado. Se omiten las
+    que el manifiesto da por archivadas y no por activas: son restos de un archivado cortado.
+    """
+    manifiesto = _leer_manifiesto(tabla)
+    restos = set(manifiesto["archivadas"]) - set(manifiesto["particiones"])
+    carpeta = os.path.dirname(_ruta_manifiesto(tabla))
+    claves = (os.path.splitext(f)[0] for f in os.listdir(carpeta) if f.endswith(".csv"))
+    return sorted(c for c in claves if c not in restos)
+
+# === Lectura ===
+def _leer_particion(tabla, clave):
+    df = gestor_datos.cargar_csv(_archivo(tabla, clave), tabla)
+    if COLUMNA_ID in df.columns:
+        df = df.set_index(COLUMNA_ID)
+        df.index.name = None
+    return df
+
+def _leer_archivada(tabla, clave):
+    ruta = _ruta_archivada(tabla, clave)
+    if not os.path.exists(ruta):
+        return pd.DataFrame()
+    df = esquema.aplicar(tabla, pd.read_csv(ruta, compression="gzip"))
+    if COLUMNA_ID in df.columns:
+        df = df.set_index(COLUMNA_ID)
+        df.index.name = None
+    return df
+
+def _unir(partes, columnas):
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    if len(partes) == 1:
+        return partes[0]
+    # El índice conserva el orden de inserción de la tabla sin particionar
+    return pd.concat(partes).sort_index(kind="stable")
+
+def existe(tabla):
+    return os.path.exists(_ruta_manifiesto(tabla)) or os.path.exists(_ruta_unica(tabla))
+
+def cargar(tabla):
+    """Devuelve la tabla sin las filas archivadas, uniendo sus particiones."""
+    return _leer(tabla, None, None, archivadas=False)
+
+def consultar(tabla, desde=None, hasta=None, archivadas=True):
+    """Filas de las particiones (también las archivadas, salvo con archivadas=False) que cubren
+    el rango [desde, hasta].
+
+    Sin rango, toda la tabla. Las filas de las particiones leídas que quedan fuera del
+    rango no se quitan.
+    """
+    return _leer(tabla, desde, hasta, archivadas=archivadas)
+
+def consultar_archivo(tabla, desde=None, hasta=None):
+    """Como consultar(), pero solo las particiones archivadas."""
+    return _leer(tabla, desde, hasta, activas=False)
+
+def _leer(tabla, desde, hasta, activas=True, archivadas=True):
+    with _cerrojo:
+        _migrar(tabla)
+        if not os.path.exists(_ruta_manifiesto(tabla)):
+            return pd.DataFrame()
+        manifiesto = _leer_manifiesto(tabla)
+        partes = []
+        if archivadas:
+            partes += [_leer_archivada(tabla, c) for c in sorted(manifiesto["archivadas"]) if _solapa(c, desde, hasta)]
+        if activas:
+            partes += [_leer_particion(tabla, c) for c in _en_disco(tabla) if _solapa(c, desde, hasta)]
+    return _unir(partes, manifiesto["columnas"])
+
+def archivos(tabla):
+    """Manifiesto y particiones activas de la tabla (el archivo no cambia al editar)."""
+    with _cerrojo:
+        claves = _en_disco(tabla) if os.path.exists(_ruta_manifiesto(tabla)) else []
+    return [_ruta_manifiesto(tabla)] + [gestor_datos.ruta_archivo(_archivo(tabla, c)) for c in claves]
+
+def resumenes(tabla):
+    """Resúmenes por participante de las particiones archivadas (ver IndiceHistorial.resumen())."""
+    with _cerrojo:
+        if not os.path.exists(_ruta_resumen(tabla)):
+            return []
+        archivadas = _leer_manifiesto(tabla)["archivadas"]
+        with open(_ruta_resumen(tabla), encoding="utf-8") as f:
+            resumen = json.load(f)
+    return [resumen[c] for c in sorted(resumen) if c in archivadas]
+
+# === Escritura ===
+def asegurar(tabla, columnas):
+    """Crea la tabla vacía (solo el manifiesto) si no existe. Devuelve True si se ha creado."""
+    with _cerrojo:
+        if existe(tabla):
+            return False
+        manifiesto = _leer_manifiesto(tabla)
+        manifiesto["columnas"] = list(columnas)
+        _escribir_manifiesto(tabla, manifiesto)
+        return True
+
+def _escribir(tabla, df, claves, tocadas):
+    """Reescribe las particiones 'tocadas' con las filas de 'df' y actualiza el manifiesto."""
+    manifiesto = _leer_manifiesto(tabla)
+    manifiesto["ultimo_id"] = max(_ultimo_id(tabla, manifiesto), int(df.index.max()) if len(df) else -1)
+    particiones = manifiesto["particiones"]
+    mascara = claves.isin(tocadas)
+    grupos = dict(tuple(df[mascara].groupby(claves[mascara], sort=False)))
+    for clave in sorted(tocadas):
+        filas = grupos.get(clave)
+        if filas is None or filas.empty:
+            ruta = gestor_datos.ruta_archivo(_archivo(tabla, clave))
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            particiones.pop(clave, None)
+        else:
+            gestor_datos.guardar_csv(_archivo(tabla, clave), filas.rename_axis(COLUMNA_ID).reset_index())
+            particiones[clave] = {"filas": len(filas)}
+    manifiesto.update(formato=FORMATO, periodo=periodo(), columnas=list(df.columns))
+    _escribir_manifiesto(tabla, manifiesto)
+
+def guardar(tabla, df):
+    """Reescribe todas las particiones de la tabla."""
+    claves = _claves(df)
+    with _cerrojo:
+        _escribir(tabla, df, claves, set(claves) | set(_en_disco(tabla)))
+
+def guardar_filas(tabla, df, filas):
+    """Guarda las filas 'filas' de la tabla completa 'df' reescribiendo solo sus particiones.
+
+    Además de las particiones a las que van las filas, se reescriben aquellas cuyo número de
+    filas ya no coincide con el manifiesto: son las que han perdido alguna fila (borrada o
+    con la fecha cambiada de partición).
+    """
+    claves = _claves(df)
+    with _cerrojo:
+        manifiesto = _leer_manifiesto(tabla)
+        en_disco = set(_en_disco(tabla))
+        if manifiesto["periodo"] != periodo() or manifiesto["columnas"] != list(df.columns):
+            _escribir(tabla, df, claves, set(claves) | en_disco)
+            return
+        tocadas = set(claves[df.index.intersection(filas)])
+        recuento = claves.value_counts()
+        for clave in en_disco | set(manifiesto["particiones"]):
+            if int(recuento.get(clave, 0)) != manifiesto["particiones"].get(clave, {}).get("filas"):
+                tocadas.add(clave)
+        if tocadas:
+            _escribir(tabla, df, claves, tocadas)
+
+def _migrar(tabla):
+    """Reparte en particiones el CSV único de la tabla (con su diario) si aún no se ha hecho."""
+    if os.path.exists(_ruta_manifiesto(tabla)) or not os.path.exists(_ruta_unica(tabla)):
+        return
+    df = diario.reproducir(tabla, gestor_datos.cargar_csv(tabla + ".csv"))
+    guardar(tabla, df)
+    for ruta in (_ruta_unica(tabla), diario.ruta_diario(tabla)):
+        if os.path.exists(ruta):
+            os.replace(ruta, ruta + ".migrado")
+    print(f"[AVISO] {tabla}.csv se ha repartido en particiones en la carpeta '{tabla}'.")
+
+# === Archivo ===
+def archivar(tabla, meses):
+    """Archiva las particiones que terminan antes de hoy menos 'meses'. Devuelve sus claves.
+
+    Se archivan particiones completas: con particiones por año, un año pasa al archivo
+    cuando termina su último día dentro del horizonte.
+    """
+    limite = pd.Timestamp.today().normalize() - pd.DateOffset(months=meses)
+    archivadas = []
+    with _cerrojo:
+        _migrar(tabla)
+        if not os.path.exists(_ruta_manifiesto(tabla)):
+            return archivadas
+        for clave in _en_disco(tabla):
+            intervalo = _intervalo(clave)
+            if intervalo is None or intervalo[1] > limite:
+                continue
+            _archivar_particion(tabla, clave)
+            archivadas.append(clave)
+    return archivadas
+
+def _archivar_particion(tabla, clave):
+    """Comprime la partición, guarda su resumen y la quita de las activas, en ese orden.
+
+    Un corte antes de actualizar el manifiesto deja la partición activa como estaba; uno
+    posterior deja un CSV sobrante que _en_disco() omite.
+    """
+    manifiesto = _leer_manifiesto(tabla)
+    df = _leer_particion(tabla, clave)
+    if clave in manifiesto["archivadas"]:
+        # Filas nuevas con fecha de una partición ya archivada: se juntan con las archivadas
+        df = _unir([_leer_archivada(tabla, clave), df], manifiesto["columnas"])
+
+    ruta = _ruta_archivada(tabla, clave)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta + ".tmp", "wb") as f:
+        with gzip.GzipFile(fileobj=f, mode="wb") as comprimido:
+            texto = esquema.a_texto(df.rename_axis(COLUMNA_ID).reset_index()).to_csv(index=False)
+            comprimido.write(texto.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta + ".tmp", ruta)
+
+    resumen = {}
+    if os.path.exists(_ruta_resumen(tabla)):
+        with open(_ruta_resumen(tabla), encoding="utf-8") as f:
+            resumen = json.load(f)
+    resumen[clave] = IndiceHistorial(df).resumen()
+    _escribir_json(_ruta_resumen(tabla), resumen)
+
+    manifiesto["ultimo_id"] = max(_ultimo_id(tabla, manifiesto), int(df.index.max()) if len(df) else -1)
+    manifiesto["archivadas"][clave] = {"filas": len(df)}
+    manifiesto["particiones"].pop(clave, None)
+    _escribir_manifiesto(tabla, manifiesto)
+    os.remove(gestor_datos.ruta_archivo(_archivo(tabla, clave)))
@@ -0,0 +1,57 @@
+"""Plantillas semanales de reuniones para generar participaciones en bloque.
+
+Una plantilla es un conjunto de filas de la tabla 'plantillas' con el mismo nombre: cada fila
+es una participación (Número, Tipo, Sala, Género) que se repite cada semana el día 'Día'.
+generar() crea de una vez todas las participaciones de un rango de fechas y descarta las
+que ya existen con la misma clave (Fecha, Número, Sala).
+"""
+import pandas as pd
+
+from core import esquema
+
+COLUMNAS = ["Plantilla", "Día", "Número", "Tipo", "Sala", "Género"]
+
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+# Clave natural de una participación
+CLAVE = ["Fecha", "Número", "Sala"]
+
+def nombres(plantillas_df):
+    """Nombres de las plantillas definidas, ordenados."""
+    if plantillas_df is None or plantillas_df.empty:
+        return []
+    return sorted(plantillas_df["Plantilla"].dropna().astype(str).unique())
+
+def filas(plantillas_df, nombre):
+    """Filas de la plantilla 'nombre' ordenadas por día, número y sala."""
+    if plantillas_df is None or plantillas_df.empty:
+        return pd.DataFrame(columns=COLUMNAS)
+    seleccion = plantillas_df[plantillas_df["Plantilla"] == nombre]
+    dias = seleccion["Día"].map({d: i for i, d in enumerate(DIAS)})
+    return seleccion.assign(_dia=dias).sort_values(["_dia", "Número", "Sala"], kind="stable").drop(columns="_dia")
+
+def _claves(df):
+    return pd.MultiIndex.from_arrays([
+        pd.to_datetime(df["Fecha"], errors="coerce").dt.normalize(),
+        pd.to_numeric(df["Número"], errors="coerce"),
+        df["Sala"].astype(object).where(df["Sala"].notna(), "").astype(str)
+    ])
+
+def generar(plantilla_df, desde, hasta, existentes=None):
+    """Participaciones de la plantilla para cada fecha entre 'desde' y 'hasta' (incluidas).
+
+    'plantilla_df' son las filas de una plantilla (ver filas()). Se quitan las que coinciden
+    en (Fecha, Número, Sala) con 'existentes' o entre sí. Devuelve (nuevas, repetidas).
+    """
+    fechas = pd.DataFrame({"Fecha": pd.date_range(pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize())})
+    fechas["Día"] = fechas["Fecha"].dt.weekday.map(dict(enumerate(DIAS)))
+    plantilla = plantilla_df.drop(columns=["Plantilla"], errors="ignore").astype({"Día": object})
+    nuevas = fechas.merge(plantilla, on="Día").drop(columns="Día")
+    nuevas = nuevas.sort_values(CLAVE, kind="stable").reset_index(drop=True)
+    nuevas["Asignado"] = None
+
+    repetidas = _claves(nuevas).duplicated()
+    if existentes is not None and not existentes.empty:
+        repetidas |= _claves(nuevas).isin(_claves(existentes))
+    columnas = ["Fecha", "Número", "Tipo", "Género", "Sala", "Asignado"]
+    return esquema.aplicar("participaciones", nuevas.loc[~repetidas, columnas]), int(repetidas.sum())
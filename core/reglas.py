@@ -0,0 +1,108 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+# === Reglas de asignación ===
+# Cada regla se compila una vez por ejecución sobre los arrays de DatosAsignacion y después
+# evalúa de golpe todos los huecos de una fecha: cumple() devuelve una matriz booleana
+# huecos × participantes. Las reglas duras excluyen candidatos; las blandas suman 'peso'
+# al coste de los candidatos que no la cumplen (solo las usa el motor óptimo).
+
+class Regla(ABC):
+    """Restricción declarativa evaluada en bloque sobre todos los participantes."""
+
+    def __init__(self, dura=True, peso=0):
+        self.dura = dura
+        self.peso = peso
+
+    def compilar(self, datos):
+        """Precalcula lo que la regla necesite de los participantes. Se llama una vez por ejecución."""
+
+    @abstractmethod
+    def cumple(self, datos, filas):
+        """Matriz booleana len(filas) × participantes con los candidatos que cumplen la regla."""
+
+class GeneroCoincide(Regla):
+    """Si la participación indica un género, solo pueden hacerla participantes de ese género.
+
+    No está entre las reglas por defecto: los valores de las dos tablas deben coincidir
+    (sin distinguir mayúsculas ni espacios), o se quedan sin candidatos los huecos con género.
+    """
+
+    def compilar(self, datos):
+        generos_slot = datos.participaciones.get("Género", pd.Series(index=datos.participaciones.index, dtype=object))
+        generos_slot = generos_slot.astype(object).fillna("").astype(str).str.strip().str.casefold()
+        generos_part = datos.participantes.get("Género", pd.Series(index=datos.participantes.index, dtype=object))
+        generos_part = generos_part.astype(object).fillna("").astype(str).str.strip().str.casefold()
+        codigos, _ = pd.factorize(pd.concat([generos_slot, generos_part], ignore_index=True))
+        self.slot = np.where(generos_slot.to_numpy() == "", -1, codigos[:len(generos_slot)])
+        self.participante = codigos[len(generos_slot):]
+
+    def cumple(self, datos, filas):
+        slot = self.slot[filas][:, None]
+        return (slot < 0) | (slot == self.participante[None, :])
+
+class SalaAlterna(Regla):
+    """No repetir la última sala del participante."""
+
+    def cumple(self, datos, filas):
+        return datos.ultima_sala_cod[None, :] != datos.salas_slot_cod[filas][:, None]
+
+class HuecoMinimoTipo(Regla):
+    """Deja al menos 'dias' entre dos participaciones del mismo tipo."""
+
+    def __init__(self, dias, dura=True, peso=0):
+        super().__init__(dura, peso)
+        self.dias = np.timedelta64(int(dias), "D")
+
+    def cumple(self, datos, filas):
+        columnas = [datos.columna_tipo[t] for t in datos.tipos_slot[filas]]
+        ultimas = datos.ultimas_tipo[:, columnas].T
+        return np.isnat(ultimas) | (datos.fechas[filas][:, None] - ultimas >= self.dias)
+
+class UnaPorDia(Regla):
+    """Cada participante hace como mucho una participación por día."""
+
+    def cumple(self, datos, filas):
+        resultado = np.ones((len(filas), len(datos.nombres)), dtype=bool)
+        for r, i in enumerate(filas):
+            ocupados = datos.ocupados_dia.get(datos.fechas[i].astype("datetime64[D]"))
+            if ocupados:
+                resultado[r, list(ocupados)] = False
+        return resultado
+
+class Disponible(Regla):
+    """Excluye a los participantes ausentes según el calendario de disponibilidad."""
+
+    def __init__(self, ausencias, dura=True, peso=0):
+        super().__init__(dura, peso)
+        self.ausencias = ausencias
+
+    def cumple(self, datos, filas):
+        dias = datos.fechas[filas].astype("datetime64[D]")
+        resultado = np.ones((len(filas), len(datos.nombres)), dtype=bool)
+        for dia in np.unique(dias):
+            resultado[dias == dia] = self.ausencias.disponibles(datos.nombres, dia)
+        return resultado
+
+def reglas_por_defecto(genero=False):
+    """Reglas que aplica el asignador si no se indican otras; con 'genero', también GeneroCoincide."""
+    return ([GeneroCoincide()] if genero else []) + [SalaAlterna(), UnaPorDia()]
+
+def compilar_reglas(reglas, datos):
+    """Compila todas las reglas para una ejecución."""
+    for regla in reglas:
+        regla.compilar(datos)
+
+def evaluar_reglas(reglas, datos, filas):
+    """Evalúa las reglas para los huecos 'filas'. Devuelve (máscara de candidatos, coste extra)."""
+    mascara = np.ones((len(filas), len(datos.nombres)), dtype=bool)
+    coste = np.zeros(mascara.shape)
+    for regla in reglas:
+        cumple = regla.cumple(datos, filas)
+        if regla.dura:
+            mascara &= cumple
+        else:
+            coste += np.where(cumple, 0, regla.peso)
+    return mascara, coste
@@ -0,0 +1,39 @@
+"""Vigilancia de los archivos de las tablas para detectar cambios hechos fuera de la aplicación.
+
+Cada vez que la aplicación carga o guarda una tabla anota su firma: ruta, fecha de
+modificación y tamaño de cada uno de sus archivos. Si la firma deja de coincidir, alguien
+ha modificado la tabla en disco (una hoja de cálculo, la línea de comandos u otro equipo).
+Solo se consulta el sistema de archivos (os.stat), así que se puede revisar a menudo.
+
+datos_cache.vigilar() revisa las tablas en memoria y concurrencia.recargar() incorpora los cambios.
+"""
+import os
+import threading
+
+from core import gestor_datos
+
+_cerrojo = threading.Lock()
+_firmas = {}  # tabla -> firma de sus archivos la última vez que se cargó o guardó
+
+def firma(tabla):
+    """Firma actual de los archivos de 'tabla'. Los que no existen cuentan como tamaño -1."""
+    partes = []
+    for ruta in gestor_datos.archivos_tabla(tabla):
+        try:
+            estado = os.stat(ruta)
+            partes.append((ruta, estado.st_mtime_ns, estado.st_size))
+        except FileNotFoundError:
+            partes.append((ruta, 0, -1))
+    return tuple(partes)
+
+def anotar(tabla, valor=None):
+    """Anota la firma de 'tabla' (la actual si no se indica) como la que tiene la aplicación."""
+    valor = firma(tabla) if valor is None else valor
+    with _cerrojo:
+        _firmas[tabla] = valor
+
+def cambiada(tabla):
+    """Indica si los archivos de 'tabla' han cambiado desde la última firma anotada."""
+    with _cerrojo:
+        anotada = _firmas.get(tabla)
+    return anotada is not None and firma(tabla) != anotada
@@ -2,8 +2,10 @@ import os
 from datetime import datetime
 import atexit
 import tkinter as tk
+from tkinter import messagebox
 from core import gestor_datos
 from core import datos_cache
+from core import escritor
 from ui.menu_principal import lanzar_menu
 from estilos import aplicar_estilos
 from actualizador import verificar_actualizacion
@@ -13,11 +15,16 @@ DATA_DIR = "data"
 LOGS_DIR = os.path.join(DATA_DIR, "logs")
 LOG_FILE = os.path.join(LOGS_DIR, "log.txt")
 
+# Cada cuánto se buscan e incorporan a la memoria los cambios de otros equipos o programas (ms)
+INTERVALO_REVISION = 2000
+
 # Archivos y columnas requeridas
 TABLAS_REQUERIDAS = {
     "participantes.csv": ["Nombre", "Género", "Tipos", "Última participación", "Último tipo", "Última sala"],
     "participaciones.csv": ["Fecha", "Número", "Tipo", "Género", "Sala", "Asignado"],
-    "opciones_tipos.csv": ["Tipos"]
+    "opciones_tipos.csv": ["Tipos"],
+    "ausencias.csv": ["Nombre", "Desde", "Hasta", "Motivo"],
+    "plantillas.csv": ["Plantilla", "Día", "Número", "Tipo", "Sala", "Género"]
 }
 
 def registrar_log(mensaje):
@@ -28,17 +35,54 @@ def registrar_log(mensaje):
         f.write(f"[{timestamp}] {mensaje}\n")
 
 def al_cerrar():
+    if not escritor.volcar():
+        registrar_log("No se pudieron guardar todos los cambios pendientes.")
     registrar_log("Programa finalizado.")
 
+def cerrar(root):
+    """Cierra la ventana cuando todo está escrito; si algún guardado ha fallado, pregunta antes."""
+    if not escritor.volcar():
+        registrar_log("No se pudieron guardar todos los cambios pendientes.")
+        if not messagebox.askyesno(
+            "Cambios sin guardar",
+            "No se han podido guardar todos los cambios (la carpeta de datos puede estar ocupada "
+            "por otro equipo o sin permisos de escritura).\n\n¿Salir de todos modos y perderlos?",
+            icon="warning"
+        ):
+            return
+    root.destroy()
+
+def revisar_cambios(root):
+    """Incorpora los cambios guardados desde otros equipos o programas y avisa de los conflictos.
+
+    La relectura de las tablas se hace en segundo plano (datos_cache.vigilar()); aquí solo se
+    aplican en memoria los cambios que ya ha dejado en cola una revisión anterior.
+    """
+    try:
+        datos_cache.vigilar()
+        for tabla, conflictos in datos_cache.recibir_cambios():
+            registrar_log(f"Cambios externos incorporados en {tabla}.")
+            if conflictos:
+                registrar_log(f"Conflictos en {tabla}, filas {conflictos}: se conserva la versión guardada.")
+                messagebox.showwarning(
+                    "Cambios simultáneos",
+                    f"{len(conflictos)} fila(s) de {tabla} se han modificado a la vez aquí y en otro equipo o programa.\n"
+                    "Se ha conservado la versión guardada; revisa esas filas."
+                )
+    except Exception as e:
+        registrar_log(f"Error al incorporar cambios externos: {e}")
+    finally:
+        # La revisión sigue programada aunque esta haya fallado
+        root.after(INTERVALO_REVISION, revisar_cambios, root)
+
 def preparar_tablas():
-    registrar_log("Comprobando existencia de archivos CSV requeridos...")
+    registrar_log("Comprobando existencia de las tablas requeridas...")
     for archivo, columnas in TABLAS_REQUERIDAS.items():
-        ruta = os.path.join(DATA_DIR, archivo)
-        if not os.path.exists(ruta):
-            gestor_datos.asegurarse_archivo(archivo, columnas)
-            registrar_log(f"Archivo creado: {archivo} con columnas {columnas}")
+        tabla = os.path.splitext(archivo)[0]
+        if gestor_datos.asegurarse_tabla(tabla, columnas):
+            registrar_log(f"Tabla creada: {tabla} con columnas {columnas}")
         else:
-            registrar_log(f"Archivo ya existe: {archivo}")
+            registrar_log(f"Tabla ya existe: {tabla}")
 
 def main():
     atexit.register(al_cerrar)
@@ -49,14 +93,16 @@ def main():
 
     preparar_tablas()
 
+    archivadas = gestor_datos.archivar("participaciones")
+    if archivadas:
+        registrar_log(f"Participaciones archivadas: {archivadas}")
+
     bases = gestor_datos.listar_csv()
     if bases:
         registrar_log(f"Bases de datos encontradas: {bases}")
     else:
         registrar_log("No se encontraron bases de datos CSV.")
 
-    datos_cache.cargar_datos_en_memoria()
-
     root = tk.Tk()
     aplicar_estilos(root)
 
@@ -65,6 +111,10 @@ def main():
         exit()
 
     lanzar_menu(root)
+    root.protocol("WM_DELETE_WINDOW", lambda: cerrar(root))
+    # Las tablas se cargan al abrir cada vista; las más usadas se adelantan en segundo plano
+    root.after_idle(datos_cache.precargar)
+    root.after(INTERVALO_REVISION, revisar_cambios, root)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+import config
+from core import gestor_datos, instantaneas
+
+@pytest.fixture
+def carpeta_datos(tmp_path, monkeypatch):
+    """Carpeta de datos (y caché de instantáneas) vacía en un directorio temporal."""
+    datos = tmp_path / "data"
+
+    def ruta_datos_local(relativa=""):
+        ruta = os.path.join(datos, relativa)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        return ruta
+
+    monkeypatch.setattr(gestor_datos, "ruta_datos_local", ruta_datos_local)
+    monkeypatch.setattr(instantaneas, "carpeta", lambda: str(tmp_path / "instantaneas"))
+    monkeypatch.setattr(config, "PARTICIONES", "año")
+    return datos
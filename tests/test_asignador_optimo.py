@@ -0,0 +1,67 @@
+"""Asignación por ventanas como flujo de coste mínimo (core/asignador_optimo.py)."""
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.asignador_optimo import COSTE_ROTACION, TOPE_DIAS, asignar_participantes_optimo
+
+NOMBRES = ["Ana", "Luis", "Eva", "Juan"]
+
+def instancia(semilla):
+    """Seis huecos en tres días de una misma semana y cuatro participantes con tipos al azar."""
+    azar = np.random.default_rng(semilla)
+    participaciones = pd.DataFrame({
+        "Fecha": pd.to_datetime(["2026-03-02", "2026-03-02", "2026-03-04", "2026-03-04", "2026-03-06", "2026-03-06"]),
+        "Número": [1, 2, 1, 2, 1, 2],
+        "Tipo": azar.choice(["Lectura", "Discurso"], size=6),
+        "Sala": ["A", "B"] * 3,
+        "Asignado": [""] * 6
+    })
+    tipos = [",".join(t for t in ("Lectura", "Discurso") if azar.random() < 0.7) or "Lectura" for _ in NOMBRES]
+    participantes = pd.DataFrame({
+        "Nombre": NOMBRES,
+        "Tipos": tipos,
+        "Última participación": [pd.Timestamp("2026-03-01") - pd.Timedelta(days=int(d))
+                                 for d in azar.integers(1, 500, size=len(NOMBRES))],
+        "Último tipo": [""] * len(NOMBRES),
+        "Última sala": [""] * len(NOMBRES)
+    })
+    return participaciones, participantes
+
+def coste(participaciones, participantes, asignados):
+    """Coste de una asignación (un nombre o None por hueco) con el mismo modelo que el motor."""
+    ultimas = dict(zip(participantes["Nombre"], participantes["Última participación"]))
+    total = 0
+    for fecha, nombre in zip(participaciones["Fecha"], asignados):
+        if nombre is not None:
+            total += TOPE_DIAS - min((fecha - ultimas[nombre]).days, TOPE_DIAS)
+    for nombre in set(asignados) - {None}:
+        veces = asignados.count(nombre)
+        total += veces * (veces - 1) // 2 * COSTE_ROTACION
+    return total
+
+def fuerza_bruta(participaciones, participantes):
+    """(huecos cubiertos, coste mínimo) probando todas las asignaciones válidas."""
+    opciones = []
+    for tipo in participaciones["Tipo"]:
+        validos = [n for n, t in zip(participantes["Nombre"], participantes["Tipos"]) if tipo in t.split(",")]
+        opciones.append(validos + [None])
+    mejor = None
+    for asignados in product(*opciones):
+        dias = [(f, n) for f, n in zip(participaciones["Fecha"], asignados) if n is not None]
+        if len(set(dias)) < len(dias):
+            continue  # una participación por día
+        clave = (-len(dias), coste(participaciones, participantes, list(asignados)))
+        mejor = clave if mejor is None else min(mejor, clave)
+    return -mejor[0], mejor[1]
+
+@pytest.mark.parametrize("semilla", range(8))
+def test_la_semana_se_resuelve_con_coste_minimo(semilla):
+    participaciones, participantes = instancia(semilla)
+    resultado, _ = asignar_participantes_optimo(participaciones, participantes, reglas=[])
+
+    asignados = [n or None for n in resultado.sort_index()["Asignado"]]
+    cubiertos = sum(n is not None for n in asignados)
+    assert (cubiertos, coste(participaciones, participantes, asignados)) == fuerza_bruta(participaciones, participantes)
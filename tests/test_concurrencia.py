@@ -0,0 +1,160 @@
+"""Combinación por filas de los guardados simultáneos (core/concurrencia.py)."""
+import pandas as pd
+import pytest
+
+from core import concurrencia, esquema
+
+@pytest.fixture(autouse=True)
+def cola_vacia(monkeypatch):
+    # Cada prueba empieza sin cambios de otras instancias en cola
+    monkeypatch.setattr(concurrencia, "_cambios", [])
+    monkeypatch.setattr(concurrencia, "_secuencia", 0)
+
+def participaciones(asignados):
+    df = pd.DataFrame({
+        "Fecha": ["2024-01-0%d" % (i + 1) for i in range(len(asignados))],
+        "Número": list(range(1, len(asignados) + 1)),
+        "Tipo": ["Lectura"] * len(asignados),
+        "Sala": ["A"] * len(asignados),
+        "Asignado": asignados
+    })
+    return esquema.aplicar("participaciones", df)
+
+def combinar(base, nuestra, suya, filas=None):
+    recuerdo = (1, concurrencia.huellas("participaciones", base))
+    return concurrencia._combinar("participaciones", nuestra, filas, recuerdo, suya)
+
+def test_cambios_en_filas_distintas_se_conservan_los_dos():
+    base = participaciones(["Ana", "Luis", "Eva"])
+    nuestra, suya = base.copy(), base.copy()
+    nuestra.loc[0, "Asignado"] = "Marta"
+    suya.loc[2, "Asignado"] = "Pablo"
+
+    combinada, filas, conflictos = combinar(base, nuestra, suya, {0})
+
+    assert combinada["Asignado"].tolist() == ["Marta", "Luis", "Pablo"]
+    assert filas == {0}
+    assert conflictos == []
+    # La fila de la otra instancia queda en cola para aplicarla en memoria
+    cambio, = concurrencia.cambios()
+    assert cambio["filas"]["Asignado"].tolist() == ["Pablo"]
+
+def test_misma_fila_cambiada_en_los_dos_conserva_la_guardada():
+    base = participaciones(["Ana", "Luis"])
+    nuestra, suya = base.copy(), base.copy()
+    nuestra.loc[1, "Asignado"] = "Marta"
+    suya.loc[1, "Asignado"] = "Pablo"
+
+    combinada, filas, conflictos = combinar(base, nuestra, suya, {1})
+
+    assert combinada["Asignado"].tolist() == ["Ana", "Pablo"]
+    assert filas == set()
+    assert len(conflictos) == 1
+    assert concurrencia.cambios()[0]["conflictos"] == conflictos
+
+def test_mismo_cambio_en_los_dos_no_es_conflicto():
+    base = participaciones(["Ana", "Luis"])
+    nuestra, suya = base.copy(), base.copy()
+    nuestra.loc[1, "Asignado"] = "Marta"
+    suya.loc[1, "Asignado"] = "Marta"
+
+    combinada, _, conflictos = combinar(base, nuestra, suya, {1})
+
+    assert combinada["Asignado"].tolist() == ["Ana", "Marta"]
+    assert conflictos == []
+
+def test_filas_nuevas_en_los_dos_con_el_mismo_indice():
+    base = participaciones(["Ana", "Luis"])
+    nuestra = pd.concat([base, participaciones(["x", "y", "Marta"]).iloc[[2]]])
+    suya = pd.concat([base, participaciones(["x", "y", "Pablo"]).iloc[[2]]])
+
+    combinada, filas, conflictos = combinar(base, nuestra, suya, {2})
+
+    # La nuestra pasa al primer índice libre; la suya conserva el 2
+    assert combinada.loc[2, "Asignado"] == "Pablo"
+    assert combinada.loc[3, "Asignado"] == "Marta"
+    assert filas == {3}
+    assert conflictos == []
+    assert concurrencia.cambios()[0]["renombradas"] == {2: 3}
+
+def test_borrado_contra_edicion_de_la_misma_fila_es_conflicto():
+    base = participaciones(["Ana", "Luis", "Eva"])
+    nuestra = base.drop(index=[1])
+    suya = base.copy()
+    suya.loc[1, "Asignado"] = "Pablo"
+
+    combinada, filas, conflictos = combinar(base, nuestra, suya, {1})
+
+    # Se conserva la fila editada y guardada; nuestro borrado no se escribe
+    assert combinada["Asignado"].tolist() == ["Ana", "Pablo", "Eva"]
+    assert filas == set()
+    assert len(conflictos) == 1
+
+def test_borrado_de_una_fila_que_la_otra_no_ha_tocado():
+    base = participaciones(["Ana", "Luis", "Eva"])
+    nuestra = base.drop(index=[1])
+    suya = base.copy()
+    suya.loc[0, "Asignado"] = "Pablo"
+
+    combinada, filas, conflictos = combinar(base, nuestra, suya, {1})
+
+    assert combinada["Asignado"].tolist() == ["Pablo", "Eva"]
+    assert filas == {1}
+    assert conflictos == []
+
+def test_tablas_con_clave_se_combinan_por_nombre():
+    base = esquema.aplicar("participantes", pd.DataFrame({"Nombre": ["Ana", "Luis"], "Tipos": ["Lectura", "Lectura"]}))
+    # La otra instancia ha borrado a Ana: Luis pasa al índice 0 en su CSV
+    suya = base.drop(index=[0]).reset_index(drop=True)
+    nuestra = base.copy()
+    nuestra.loc[1, "Tipos"] = "Lectura;Discurso"
+
+    recuerdo = (1, concurrencia.huellas("participantes", base))
+    combinada, filas, conflictos = concurrencia._combinar("participantes", nuestra, {1}, recuerdo, suya)
+
+    assert combinada.to_dict("records") == [{"Nombre": "Luis", "Tipos": "Lectura;Discurso"}]
+    assert filas is None
+    assert conflictos == []
+
+# === Cerrojo ===
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    monkeypatch.setattr(concurrencia, "_ruta", lambda tabla, extension: str(tmp_path / (tabla + extension)))
+    return tmp_path
+
+def test_al_soltar_no_se_borra_el_cerrojo_de_otra_instancia(carpeta):
+    ruta = carpeta / "participaciones.bloqueo"
+    with concurrencia.bloqueo("participaciones"):
+        # Otra instancia lo ha tomado por abandonado y ha creado el suyo
+        ruta.write_text('{"marca": "otra"}', encoding="utf-8")
+    assert ruta.read_text(encoding="utf-8") == '{"marca": "otra"}'
+
+def test_un_cerrojo_caducado_se_sustituye(carpeta, monkeypatch):
+    ruta = carpeta / "participaciones.bloqueo"
+    ruta.write_text('{"marca": "abandonado"}', encoding="utf-8")
+    monkeypatch.setattr(concurrencia, "CADUCIDAD_BLOQUEO", -1)
+    with concurrencia.bloqueo("participaciones", espera=0):
+        assert concurrencia._dueño(str(ruta)) != "abandonado"
+    assert not ruta.exists()
+    assert list(carpeta.iterdir()) == []
+
+def test_un_cerrojo_vigente_no_se_toma(carpeta):
+    (carpeta / "participaciones.bloqueo").write_text('{"marca": "otra"}', encoding="utf-8")
+    with pytest.raises(TimeoutError):
+        with concurrencia.bloqueo("participaciones", espera=0):
+            pass
+
+# === Cola de cambios ===
+def test_descartar_quita_los_cambios_aplicados_en_todas_las_tablas(monkeypatch):
+    for secuencia, tabla in enumerate(["participantes", "participaciones", "participantes", "ausencias"], 1):
+        concurrencia._cambios.append({"tabla": tabla, "secuencia": secuencia})
+    monkeypatch.setattr(concurrencia, "_secuencia", 4)
+    monkeypatch.setattr(concurrencia, "CAMBIOS_RETENIDOS", 0)
+
+    # La 2 aún no está aplicada en participaciones; la 4 es de una tabla sin cargar
+    concurrencia.descartar({"participantes": 3, "participaciones": 1})
+    assert [c["secuencia"] for c in concurrencia.cambios()] == [2, 3, 4]
+
+    monkeypatch.setattr(concurrencia, "CAMBIOS_RETENIDOS", 1)
+    concurrencia.descartar({"participantes": 3, "participaciones": 2})
+    assert [c["secuencia"] for c in concurrencia.cambios()] == [4]
@@ -0,0 +1,55 @@
+"""Índice de intervalos de ausencia (core/disponibilidad.py)."""
+import pandas as pd
+import pytest
+
+from core.disponibilidad import IndiceAusencias
+
+def indice(*ausencias):
+    """Índice a partir de tuplas (nombre, desde, hasta)."""
+    return IndiceAusencias(pd.DataFrame(ausencias, columns=["Nombre", "Desde", "Hasta"]).assign(Motivo=""))
+
+@pytest.mark.parametrize("fecha, ausente", [
+    ("2026-03-09", False),  # día anterior
+    ("2026-03-10", True),   # primer día
+    ("2026-03-12", True),
+    ("2026-03-15", True),   # último día
+    ("2026-03-16", False),  # día siguiente
+])
+def test_los_extremos_del_intervalo_se_incluyen(fecha, ausente):
+    ausencias = indice(("Ana", "2026-03-10", "2026-03-15"))
+    assert (ausencias.ausentes(fecha) == {"Ana"}) is ausente
+
+def test_la_hora_de_la_fecha_no_cuenta():
+    ausencias = indice(("Ana", "2026-03-10", "2026-03-15"))
+    assert ausencias.ausentes(pd.Timestamp("2026-03-15 19:30")) == {"Ana"}
+    assert ausencias.ausentes(pd.Timestamp("2026-03-09 23:59")) == set()
+
+def test_un_intervalo_largo_cubre_a_los_posteriores():
+    # El segundo intervalo empieza más tarde pero acaba antes: el primero sigue contando
+    ausencias = indice(("Ana", "2026-03-01", "2026-03-31"), ("Ana", "2026-03-05", "2026-03-06"))
+    assert ausencias.ausentes("2026-03-20") == {"Ana"}
+    assert ausencias.ausentes("2026-03-31") == {"Ana"}
+    assert ausencias.ausentes("2026-04-01") == set()
+
+def test_intervalos_contiguos_y_huecos_entre_ellos():
+    ausencias = indice(("Ana", "2026-03-01", "2026-03-03"), ("Ana", "2026-03-04", "2026-03-05"),
+                       ("Ana", "2026-03-08", "2026-03-08"))
+    assert [d for d in pd.date_range("2026-02-28", "2026-03-09") if ausencias.ausentes(d)] == \
+        list(pd.to_datetime(["2026-03-01", "2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05", "2026-03-08"]))
+
+def test_fechas_fuera_del_rango_de_todos_los_intervalos():
+    ausencias = indice(("Ana", "2026-03-10", "2026-03-15"), ("Luis", "2026-05-01", "2026-05-02"))
+    assert ausencias.ausentes("2025-01-01") == set()
+    assert ausencias.ausentes("2027-01-01") == set()
+    # Luis empieza después que Ana: sus claves no se mezclan con las de ella
+    assert ausencias.ausentes("2026-05-01") == {"Luis"}
+
+def test_sin_fin_es_un_solo_dia_y_los_invalidos_se_descartan():
+    ausencias = indice(("Ana", "2026-03-10", None), ("Luis", "2026-03-10", "2026-03-01"), ("Eva", None, "2026-03-10"))
+    assert ausencias.ausentes("2026-03-10") == {"Ana"}
+    assert ausencias.ausentes("2026-03-11") == set()
+
+def test_disponibles_es_una_mascara_por_nombre():
+    ausencias = indice(("Ana", "2026-03-10", "2026-03-15"))
+    assert list(ausencias.disponibles(["Luis", "Ana", "Eva"], "2026-03-15")) == [True, False, True]
+    assert list(ausencias.disponibles(["Luis", "Ana", "Eva"], "2026-03-16")) == [True, True, True]
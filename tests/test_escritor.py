@@ -0,0 +1,52 @@
+"""Guardado en segundo plano (core/escritor.py)."""
+import threading
+
+import pandas as pd
+import pytest
+
+from core import concurrencia, escritor
+
+@pytest.fixture
+def escrituras(monkeypatch):
+    """Sustituye el guardado real: la primera escritura espera a 'soltar' y falla."""
+    monkeypatch.setattr(escritor, "_pendientes", {})
+    monkeypatch.setattr(escritor, "_fallidas", {})
+    escritas = []
+    empezada, soltar = threading.Event(), threading.Event()
+
+    def guardar(tabla, df, filas):
+        if not empezada.is_set():
+            empezada.set()
+            soltar.wait(5)
+            raise OSError("carpeta ocupada")
+        escritas.append((df["Asignado"].tolist(), sorted(filas)))
+
+    monkeypatch.setattr(concurrencia, "guardar", guardar)
+    return escritas, empezada, soltar
+
+def test_un_guardado_fallido_no_pisa_al_siguiente(escrituras):
+    escritas, empezada, soltar = escrituras
+    escritor.programar("participaciones", pd.DataFrame({"Asignado": ["A", "x"]}), [0])
+    assert empezada.wait(5)
+    # Mientras A se escribe, se programa B con otra fila
+    escritor.programar("participaciones", pd.DataFrame({"Asignado": ["B", "y"]}), [1])
+    soltar.set()
+
+    assert escritor.volcar(5)
+    # B se escribe una sola vez, con las filas de A que no llegaron a guardarse
+    assert escritas == [(["B", "y"], [0, 1])]
+    assert not escritor.fallida("participaciones")
+    assert not escritor.hay_pendientes()
+
+def test_un_guardado_fallido_se_reintenta_al_volcar(escrituras):
+    escritas, empezada, soltar = escrituras
+    soltar.set()
+    escritor.programar("participaciones", pd.DataFrame({"Asignado": ["A"]}), [0])
+    assert empezada.wait(5)
+    with escritor._condicion:
+        escritor._condicion.wait_for(lambda: not escritor._escribiendo and not escritor._pendientes, 5)
+    assert escritor.fallida("participaciones")
+
+    assert escritor.volcar(5)
+    assert escritas == [(["A"], [0])]
+    assert not escritor.fallida("participaciones")
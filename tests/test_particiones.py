@@ -0,0 +1,59 @@
+"""Participaciones en un CSV por año (core/particiones.py)."""
+import pandas as pd
+
+from core import esquema, particiones
+
+# Un año que nunca se archiva con un horizonte de 24 meses
+AÑO = pd.Timestamp.today().year
+
+def participaciones(filas):
+    """Tabla de participaciones con índice 'id' a partir de {id: (fecha, asignado)}."""
+    df = pd.DataFrame(
+        [{"Fecha": f, "Número": 1, "Tipo": "Lectura", "Sala": "A", "Asignado": a} for f, a in filas.values()],
+        index=list(filas)
+    )
+    return esquema.aplicar("participaciones", df)
+
+def test_los_ids_archivados_no_se_reutilizan(carpeta_datos):
+    # La fila 2 es de 2019 pero se añadió la última: al archivar 2019 el mayor id activo es 1
+    df = participaciones({0: (f"{AÑO}-01-05", "Ana"), 1: (f"{AÑO}-01-12", "Luis"), 2: ("2019-05-01", "Eva")})
+    particiones.guardar("participaciones", df)
+    assert particiones.archivar("participaciones", 24) == ["2019"]
+
+    assert list(particiones.cargar("participaciones").index) == [0, 1]
+    assert particiones.siguiente_id("participaciones") == 3
+
+def test_siguiente_id_con_un_manifiesto_sin_ultimo_id(carpeta_datos):
+    df = participaciones({0: (f"{AÑO}-01-05", "Ana"), 5: ("2019-05-01", "Eva")})
+    particiones.guardar("participaciones", df)
+    particiones.archivar("participaciones", 24)
+    manifiesto = particiones._leer_manifiesto("participaciones")
+    del manifiesto["ultimo_id"]
+    particiones._escribir_manifiesto("participaciones", manifiesto)
+
+    # Se calcula con las filas activas y archivadas que hay en disco
+    assert particiones.siguiente_id("participaciones") == 6
+
+def test_una_fila_que_cambia_de_año_sale_de_su_particion(carpeta_datos):
+    anterior, actual = str(AÑO - 1), str(AÑO)
+    df = participaciones({0: (f"{anterior}-03-01", "Ana"), 1: (f"{anterior}-12-30", "Luis"), 2: (f"{actual}-01-05", "Eva")})
+    particiones.guardar("participaciones", df)
+
+    # Solo se indica la fila movida: su partición anterior se detecta por el recuento del manifiesto
+    df.loc[1, "Fecha"] = pd.Timestamp(f"{actual}-01-02")
+    particiones.guardar_filas("participaciones", df, [1])
+
+    assert list(particiones._leer_particion("participaciones", anterior).index) == [0]
+    assert sorted(particiones._leer_particion("participaciones", actual).index) == [1, 2]
+    manifiesto = particiones._leer_manifiesto("participaciones")
+    assert {c: p["filas"] for c, p in manifiesto["particiones"].items()} == {anterior: 1, actual: 2}
+    assert list(particiones.cargar("participaciones").sort_index()["Fecha"]) == list(df["Fecha"])
+
+def test_una_fila_borrada_sale_de_su_particion(carpeta_datos):
+    df = participaciones({0: (f"{AÑO}-01-05", "Ana"), 1: (f"{AÑO}-01-12", "Luis")})
+    particiones.guardar("participaciones", df)
+
+    particiones.guardar_filas("participaciones", df.drop(index=[0]), [0])
+
+    assert list(particiones.cargar("participaciones").index) == [1]
+    assert particiones._leer_manifiesto("participaciones")["particiones"][str(AÑO)]["filas"] == 1
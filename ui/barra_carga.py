@@ -0,0 +1,56 @@
+import tkinter as tk
+from tkinter import ttk
+
+# === Barra de progreso visual para el proceso de asignación ===
+def mostrar_barra_carga(master, pasos, al_cancelar=None, titulo="Asignando participantes"):
+    """Muestra una ventana emergente con barra de progreso centrada en pantalla.
+
+    Si se indica 'al_cancelar', añade un botón Cancelar que lo invoca.
+    """
+    ventana = tk.Toplevel(master)
+    ventana.title(titulo)
+    ventana.geometry("420x150")
+    ventana.resizable(False, False)
+    ventana.configure(bg="#f0f2f5")
+    ventana.transient(master)
+    ventana.grab_set()
+
+    # Centrar ventana en pantalla
+    ventana.update_idletasks()
+    ancho = 420
+    alto = 150
+    x = (ventana.winfo_screenwidth() // 2) - (ancho // 2)
+    y = (ventana.winfo_screenheight() // 2) - (alto // 2)
+    ventana.geometry(f"{ancho}x{alto}+{x}+{y}")
+
+    contenedor = tk.Frame(ventana, bg="#f0f2f5", padx=15, pady=15)
+    contenedor.pack(fill=tk.BOTH, expand=True)
+
+    label = tk.Label(contenedor, text="Inicializando...", font=("Segoe UI", 11), bg="#f0f2f5")
+    label.pack(pady=(10, 5))
+
+    progress = ttk.Progressbar(contenedor, orient=tk.HORIZONTAL, length=350, mode="determinate")
+    progress.pack(fill=tk.X, expand=True, pady=(5, 15))
+    progress["maximum"] = len(pasos)
+
+    if al_cancelar:
+        boton = ttk.Button(contenedor, text="Cancelar")
+
+        def cancelar():
+            boton.config(state="disabled")
+            label.config(text="Cancelando...")
+            al_cancelar()
+
+        boton.config(command=cancelar)
+        boton.pack()
+        ventana.geometry(f"{ancho}x{alto + 40}+{x}+{y}")
+        ventana.protocol("WM_DELETE_WINDOW", cancelar)
+
+    def avanzar(etapa, i, total=None):
+        """Muestra la etapa actual; compatible con el callback 'progreso' de los motores."""
+        label.config(text=etapa)
+        progress["maximum"] = total or len(pasos)
+        progress["value"] = i + 1
+        ventana.update_idletasks()
+
+    return ventana, avanzar
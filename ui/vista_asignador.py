@@ -1,11 +1,35 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
+from tkinter.filedialog import asksaveasfilename
 from tkcalendar import DateEntry
-from datetime import datetime
 import pandas as pd
 
-from core.datos_cache import obtener, actualizar, guardar_todos
-from core.asignador import asignar_participantes
+from core.esquema import texto
+from core.datos_cache import (
+    obtener, consultar, actualizar, guardar_todos, hay_cambios, indice_historial, indice_ausencias,
+    suscribir, desuscribir
+)
+from core.asignador import (
+    PASOS, AsignacionCancelada, asignar_participantes, aplicar_asignaciones, reasignar_afectados
+)
+from core.asignador_optimo import asignar_participantes_optimo
+from core import exportador
+from ui.barra_carga import mostrar_barra_carga
+
+# Motores de asignación disponibles
+MOTORES = {
+    "Voraz (por fecha)": asignar_participantes,
+    "Óptimo (por semanas)": asignar_participantes_optimo
+}
+
+# Hojas del libro exportado
+HOJAS = {
+    "Una sola hoja": None,
+    "Una hoja por fecha": exportador.POR_FECHA,
+    "Una hoja por sala": exportador.POR_SALA
+}
 
 class VistaAsignador:
     def __init__(self, master):
@@ -14,11 +38,41 @@ class VistaAsignador:
         self.frame = ttk.Frame(master)
         self.frame.pack(fill=tk.BOTH, expand=True)
 
-        self.participaciones_df = obtener("participaciones")
+        # La tabla completa de participaciones se carga al asignar o guardar; para mostrar
+        # un rango basta con las particiones que lo cubren
+        self._participaciones_df = None
         self.participantes_df = obtener("participantes")
 
+        # Estado de la asignación en segundo plano
+        self.cola = queue.Queue()
+        self.cancelar = None
+        self.ventana_progreso = None
+
+        # Estado de la exportación en segundo plano
+        self.cola_exportacion = queue.Queue()
+        self.cancelar_exportacion = None
+        self.ventana_exportacion = None
+
+        # Filas editadas a mano: la reasignación incremental no las toca
+        self.manuales = set()
+
         self._crear_widgets()
 
+        # Cambios hechos fuera de la aplicación (otro equipo, una hoja de cálculo)
+        suscribir(self._al_cambiar_datos)
+        self.frame.bind("<Destroy>", lambda e: desuscribir(self._al_cambiar_datos) if e.widget is self.frame else None)
+
+    @property
+    def participaciones_df(self):
+        """Tabla completa de participaciones, cargada en el primer uso."""
+        if self._participaciones_df is None:
+            self._participaciones_df = obtener("participaciones")
+        return self._participaciones_df
+
+    @participaciones_df.setter
+    def participaciones_df(self, df):
+        self._participaciones_df = df
+
     def _crear_widgets(self):
         """Crea los controles para filtrado, asignación y edición."""
         filtro_frame = ttk.LabelFrame(self.frame, text="Rango de fechas")
@@ -37,7 +91,20 @@ class VistaAsignador:
         ttk.Button(filtro_frame, text="Mostrar participaciones", command=self._mostrar_participaciones).grid(row=0, column=4, padx=5, pady=5)
         ttk.Button(filtro_frame, text="Asignar participantes", command=self._asignar_participantes).grid(row=0, column=5, padx=5, pady=5)
         ttk.Button(filtro_frame, text="Guardar cambios", command=self._guardar_cambios).grid(row=0, column=6, padx=5, pady=5)
-        ttk.Button(filtro_frame, text="Exportar Archivo", command=self._exportar_csv).grid(row=0, column=7, padx=5, pady=5)
+        ttk.Button(filtro_frame, text="Exportar Archivo", command=self._exportar).grid(row=0, column=7, padx=5, pady=5)
+        ttk.Button(filtro_frame, text="Reasignar afectados", command=self._reasignar_afectados).grid(row=1, column=5, padx=5, pady=5)
+
+        # Selección del motor de asignación
+        ttk.Label(filtro_frame, text="Motor:").grid(row=1, column=0, padx=5, pady=5)
+        self.motor = ttk.Combobox(filtro_frame, values=list(MOTORES), state="readonly", width=24)
+        self.motor.set(next(iter(MOTORES)))
+        self.motor.grid(row=1, column=1, columnspan=3, sticky="w", padx=5, pady=5)
+
+        # Hojas del archivo exportado
+        ttk.Label(filtro_frame, text="Exportar:").grid(row=1, column=6, padx=5, pady=5)
+        self.hojas = ttk.Combobox(filtro_frame, values=list(HOJAS), state="readonly", width=18)
+        self.hojas.set(next(iter(HOJAS)))
+        self.hojas.grid(row=1, column=7, padx=5, pady=5)
 
         # Tabla de participaciones
         self.tree = ttk.Treeview(self.frame, columns=["Fecha", "Número", "Sala", "Tipo", "Asignado"], show="headings")
@@ -52,54 +119,216 @@ class VistaAsignador:
         """Filtra y muestra participaciones dentro del rango de fechas."""
         self.tree.delete(*self.tree.get_children())
 
-        inicio = self.fecha_inicio.get_date()
-        fin = self.fecha_fin.get_date()
+        self.rango_mostrado = (self.fecha_inicio.get_date(), self.fecha_fin.get_date())
+        self.filtradas = consultar("participaciones", *self.rango_mostrado)
 
-        fecha_dt = pd.to_datetime(self.participaciones_df["Fecha"], errors='coerce')
-        self.filtradas = self.participaciones_df[
-            (fecha_dt >= pd.to_datetime(inicio)) & (fecha_dt <= pd.to_datetime(fin))
-        ].copy()
+        for idx, row in self.filtradas.iterrows():
+            self.tree.insert("", tk.END, iid=str(idx), values=self._valores(row))
 
-        for _, row in self.filtradas.iterrows():
-            self.tree.insert("", tk.END, values=[row["Fecha"], row["Número"], row["Sala"], row["Tipo"], row["Asignado"]])
+    def _valores(self, row):
+        return [texto(row[c]) for c in ("Fecha", "Número", "Sala", "Tipo", "Asignado")]
+
+    def _al_cambiar_datos(self, tabla, cambiadas, eliminadas, secuencia):
+        """Redibuja solo las filas del rango mostrado que han cambiado fuera de la aplicación."""
+        if tabla == "participantes":
+            self.participantes_df = obtener("participantes")
+            return
+        if tabla != "participaciones" or self.cancelar is not None or not hasattr(self, "filtradas"):
+            # Durante una asignación la tabla se redibuja entera al terminar
+            return
+        self.filtradas = consultar("participaciones", *self.rango_mostrado)
+        for idx in eliminadas:
+            if self.tree.exists(str(idx)):
+                self.tree.delete(str(idx))
+        for idx in cambiadas:
+            item = str(idx)
+            if idx not in self.filtradas.index:
+                # Ha pasado a una fecha fuera del rango
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+                continue
+            valores = self._valores(self.filtradas.loc[idx])
+            if not self.tree.exists(item):
+                self.tree.insert("", tk.END, iid=item, values=valores)
+                continue
+            if item in self.manuales:
+                # La edición a mano sin guardar se mantiene
+                valores[4] = self.tree.item(item, "values")[4]
+            self.tree.item(item, values=valores)
 
     def _asignar_participantes(self):
-        """Llama al algoritmo de asignación y actualiza los datos mostrados."""
+        """Lanza el algoritmo de asignación en segundo plano y va mostrando los resultados."""
+        if self.cancelar is not None:
+            return  # ya hay una asignación en curso
+
         inicio = self.fecha_inicio.get_date()
         fin = self.fecha_fin.get_date()
 
-        filtradas = self.participaciones_df.copy()
-        filtradas["Fecha_dt"] = pd.to_datetime(filtradas["Fecha"])
-        rango_df = filtradas[
-            (filtradas["Fecha_dt"] >= pd.to_datetime(inicio)) & 
-            (filtradas["Fecha_dt"] <= pd.to_datetime(fin))
-        ].copy()
+        rango_df = consultar("participaciones", inicio, fin).copy()
 
         if rango_df.empty:
             messagebox.showinfo("Sin datos", "No hay participaciones en el rango seleccionado.")
             return
 
-        # Asignación automática
-        df_actualizado, participantes_actualizados = asignar_participantes(
-            rango_df, self.participantes_df.copy(), master=self.master
+        # La tabla muestra el rango y se rellena a medida que llegan los huecos asignados
+        self._mostrar_participaciones()
+        for item in self.tree.get_children():
+            valores = list(self.tree.item(item, "values"))
+            valores[4] = ""
+            self.tree.item(item, values=valores)
+
+        motor = MOTORES[self.motor.get()]
+        self.cancelar = threading.Event()
+        self.ventana_progreso, self.avanzar = mostrar_barra_carga(self.master, PASOS, al_cancelar=self.cancelar.set)
+
+        # El hilo trabaja sobre copias: las tablas de datos_cache solo se tocan al terminar
+        hilo = threading.Thread(
+            target=self._trabajo_asignacion,
+            args=(motor, rango_df, self.participantes_df.copy(), self.cancelar, indice_historial(), indice_ausencias()),
+            daemon=True
         )
+        hilo.start()
+        self.frame.after(50, self._procesar_cola)
+
+    def _trabajo_asignacion(self, motor, rango_df, participantes_df, cancelar, historial, ausencias):
+        """Ejecuta el motor en el hilo de trabajo y envía cada resultado por la cola."""
+        try:
+            resultado = motor(
+                rango_df, participantes_df,
+                progreso=lambda etapa, paso, total: self.cola.put(("progreso", etapa, paso, total)),
+                al_asignar=lambda idx, nombre: self.cola.put(("hueco", idx, nombre)),
+                cancelar=cancelar,
+                historial=historial,
+                ausencias=ausencias
+            )
+            self.cola.put(("fin", resultado))
+        except AsignacionCancelada:
+            self.cola.put(("cancelada",))
+        except Exception as e:
+            self.cola.put(("error", e))
+
+    def _procesar_cola(self):
+        """Aplica en el hilo de Tk los mensajes pendientes del hilo de asignación."""
+        try:
+            while True:
+                mensaje = self.cola.get_nowait()
+                tipo = mensaje[0]
+                if tipo == "progreso":
+                    self.avanzar(*mensaje[1:])
+                elif tipo == "hueco":
+                    _, idx, nombre = mensaje
+                    if self.tree.exists(str(idx)):
+                        valores = list(self.tree.item(str(idx), "values"))
+                        valores[4] = nombre
+                        self.tree.item(str(idx), values=valores)
+                else:
+                    self._terminar_asignacion(mensaje)
+                    return
+        except queue.Empty:
+            pass
+        self.frame.after(50, self._procesar_cola)
+
+    def _terminar_asignacion(self, mensaje):
+        """Cierra la ventana de progreso y guarda el resultado si la asignación terminó bien."""
+        self.ventana_progreso.destroy()
+        self.ventana_progreso = None
+        self.manuales = set()
+        self.cancelar = None
+
+        if mensaje[0] == "cancelada":
+            self._mostrar_participaciones()
+            messagebox.showinfo("Asignación cancelada", "No se ha modificado ninguna participación.")
+            return
+        if mensaje[0] == "error":
+            self._mostrar_participaciones()
+            messagebox.showerror("Error", f"No se pudo completar la asignación:\n{mensaje[1]}")
+            return
+
+        df_actualizado, participantes_actualizados = mensaje[1]
+
+        # El índice de historial se corrige solo con las filas que cambian de participante
+        anteriores = self.participaciones_df.loc[df_actualizado.index, "Asignado"].fillna("").astype(str)
+        cambiados = df_actualizado[anteriores != df_actualizado["Asignado"].fillna("").astype(str)]
+
+        def cambios_historial(historial):
+            for idx, row in cambiados.iterrows():
+                if anteriores[idx] and not historial.quitar(anteriores[idx], row["Fecha"], row["Tipo"]):
+                    return False  # el índice no coincide con la tabla: se reconstruye
+                if row["Asignado"]:
+                    historial.registrar(row["Asignado"], row["Fecha"], row["Tipo"], row["Sala"])
+            return True
 
         # Actualiza la base de datos con los asignados
-        for idx, row in df_actualizado.iterrows():
-            original_idx = self.participaciones_df[
-                (self.participaciones_df["Fecha"] == row["Fecha"]) &
-                (self.participaciones_df["Número"] == row["Número"]) &
-                (self.participaciones_df["Sala"] == row["Sala"])
-            ].index
-            if not original_idx.empty:
-                self.participaciones_df.at[original_idx[0], "Asignado"] = row["Asignado"]
-
-        self.participaciones_df = df_actualizado  # datos actualizados
-        self._mostrar_participaciones()           # refresca vista con fechas ya seleccionadas
+        self.participaciones_df = aplicar_asignaciones(self.participaciones_df, df_actualizado)
+        self.participantes_df = participantes_actualizados
+        actualizar("participaciones", self.participaciones_df, cambios_historial, filas=df_actualizado.index)
+        actualizar("participantes", self.participantes_df)
+        guardar_todos()
 
+        self._mostrar_participaciones()           # refresca vista con fechas ya seleccionadas
 
         messagebox.showinfo("Asignación completa", "Participantes asignados correctamente. Puedes hacer cambios manuales antes de guardar.")
 
+    def _reasignar_afectados(self):
+        """Reasigna solo las participaciones del rango que han dejado de tener un asignado válido."""
+        if self.cancelar is not None:
+            return
+        self._mostrar_participaciones_si_vacia()
+        if self.filtradas.empty:
+            messagebox.showinfo("Sin datos", "No hay participaciones en el rango seleccionado.")
+            return
+
+        # Los cambios manuales de la tabla cuentan como asignaciones fijas
+        rango_df = self.filtradas.copy()
+        rango_df["Asignado"] = rango_df["Asignado"].astype(object)
+        fijos = []
+        for item in self.manuales:
+            if self.tree.exists(item):
+                idx = rango_df.index[rango_df.index.astype(str) == item][0]
+                rango_df.at[idx, "Asignado"] = self.tree.item(item, "values")[4]
+                fijos.append(idx)
+
+        reasignadas, participantes = reasignar_afectados(
+            rango_df, self.participantes_df, fijos=fijos, historial=indice_historial(), ausencias=indice_ausencias()
+        )
+        if reasignadas.empty:
+            messagebox.showinfo("Reasignar", "No hay participaciones afectadas en el rango.")
+            return
+
+        # El índice de historial se corrige solo con las filas que cambian de participante
+        anteriores = self.participaciones_df.loc[reasignadas.index, "Asignado"].fillna("").astype(str)
+        cambiados = reasignadas[anteriores != reasignadas["Asignado"].fillna("").astype(str)]
+
+        def cambios_historial(historial):
+            for idx, row in cambiados.iterrows():
+                if anteriores[idx] and not historial.quitar(anteriores[idx], row["Fecha"], row["Tipo"]):
+                    return False  # el índice no coincide con la tabla: se reconstruye
+                if row["Asignado"]:
+                    historial.registrar(row["Asignado"], row["Fecha"], row["Tipo"], row["Sala"])
+            return True
+
+        columnas = ("Asignado", "Notas", "Cancelado")
+        self.participaciones_df = aplicar_asignaciones(self.participaciones_df, reasignadas, columnas)
+        self.filtradas = aplicar_asignaciones(self.filtradas, reasignadas, columnas)
+        self.participantes_df = participantes
+        actualizar("participaciones", self.participaciones_df, cambios_historial, filas=reasignadas.index)
+        actualizar("participantes", self.participantes_df)
+        guardar_todos()
+
+        # Solo se refrescan las filas reasignadas para no perder ediciones manuales sin guardar
+        for idx, row in reasignadas.iterrows():
+            if self.tree.exists(str(idx)):
+                valores = list(self.tree.item(str(idx), "values"))
+                valores[4] = row["Asignado"]
+                self.tree.item(str(idx), values=valores)
+
+        messagebox.showinfo("Reasignar", f"Se han revisado {len(reasignadas)} participaciones afectadas.")
+
+    def _mostrar_participaciones_si_vacia(self):
+        """Carga el rango en la tabla si todavía no se ha mostrado."""
+        if not hasattr(self, "filtradas") or not self.tree.get_children():
+            self._mostrar_participaciones()
+
     def _editar_celda(self, event):
         """Permite editar manualmente el nombre del participante asignado."""
         item = self.tree.selection()[0]
@@ -124,95 +353,103 @@ class VistaAsignador:
                 valores = list(self.tree.item(item, "values"))
                 valores[4] = nuevo_nombre
                 self.tree.item(item, values=valores)
+                self.manuales.add(item)
                 ventana.destroy()
 
             ttk.Button(ventana, text="Guardar", command=guardar).pack(pady=5)
 
     def _guardar_cambios(self):
         """Guarda en el DataFrame y disco los cambios hechos en la tabla."""
-        for item in self.tree.get_children():
+        # Solo pueden diferir de la tabla las filas editadas a mano; cada fila lleva su índice
+        cambios = []
+        for item in self.manuales:
+            if not self.tree.exists(item):
+                continue
             valores = self.tree.item(item, "values")
-            idx = self.participaciones_df[
-                (self.participaciones_df["Fecha"] == valores[0]) &
-                (self.participaciones_df["Número"] == int(valores[1])) &
-                (self.participaciones_df["Sala"] == valores[2])
-            ].index
-            if not idx.empty:
-                self.participaciones_df.at[idx[0], "Asignado"] = valores[4]
-
-        actualizar("participaciones", self.participaciones_df)
-        guardar_todos()
+            idx = int(item)
+            if idx in self.participaciones_df.index:
+                anterior = self.participaciones_df.at[idx, "Asignado"]
+                if (anterior if pd.notna(anterior) else "") != valores[4]:
+                    self.participaciones_df.at[idx, "Asignado"] = valores[4]
+                    cambios.append(idx)
+
+        # Sin cambios en la tabla no hace falta marcar participaciones como modificada
+        if cambios:
+            actualizar("participaciones", self.participaciones_df, filas=cambios)
+        if hay_cambios():
+            guardar_todos()
         messagebox.showinfo("Guardado", "Cambios guardados en la base de datos.")
 
-    def _exportar_csv(self):
-        """Exporta las participaciones con los participantes asignados a un archivo CSV o Excel."""
-        import csv
-        import pandas as pd
-        from tkinter.filedialog import asksaveasfilename
+    def _exportar(self):
+        """Exporta las participaciones del rango a CSV, Excel u ODS en segundo plano.
+
+        Se escribe desde la tabla de participaciones, con las ediciones manuales aún sin guardar.
+        """
+        if self.cancelar is not None or self.cancelar_exportacion is not None:
+            return  # hay una asignación o una exportación en curso
 
         archivo = asksaveasfilename(defaultextension=".csv", filetypes=[
             ("CSV files", "*.csv"),
             ("Excel files", "*.xlsx"),
-            ("ODS files", "*.ods"),
-            ("All files", "*.*")
+            ("ODS files", "*.ods")
         ])
         if not archivo:
             return
-
-        # Verificar la extensión del archivo
-        extension = archivo.split(".")[-1].lower()
-
-        if extension == "csv":
-            with open(archivo, mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file)
-                # Escribir encabezados
-                writer.writerow(["Fecha", "Número", "Sala", "Tipo", "Asignado"])
-
-                # Escribir datos
-                for item in self.tree.get_children():
-                    writer.writerow(self.tree.item(item, "values"))
-
-        elif extension == "xlsx":
-            # Crear un DataFrame para exportar a Excel
-            data = [self.tree.item(item, "values") for item in self.tree.get_children()]
-            df = pd.DataFrame(data, columns=["Fecha", "Número", "Sala", "Tipo", "Asignado"])
-            df.to_excel(archivo, index=False, engine="openpyxl")
-
-        elif extension == "ods":
-            # Crear un DataFrame para exportar a ODS
-            data = [self.tree.item(item, "values") for item in self.tree.get_children()]
-            df = pd.DataFrame(data, columns=["Fecha", "Número", "Sala", "Tipo", "Asignado"])
-            df.to_excel(archivo, index=False, engine="odf")
-
-        else:
+        if not archivo.lower().endswith(exportador.FORMATOS):
             messagebox.showerror("Error de exportación", "Formato de archivo no compatible.")
             return
 
-        messagebox.showinfo("Exportación completada", f"Los datos se han exportado correctamente a {archivo}.")
-        if not archivo:
-            return
-
-        # Verificar la extensión del archivo
-        extension = archivo.split(".")[-1].lower()
-
-        if extension == "csv":
-            with open(archivo, mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file)
-                # Escribir encabezados
-                writer.writerow(["Fecha", "Número", "Sala", "Tipo", "Asignado"])
-
-                # Escribir datos
-                for item in self.tree.get_children():
-                    writer.writerow(self.tree.item(item, "values"))
-
-        elif extension == "xlsx":
-            # Crear un DataFrame para exportar a Excel
-            data = [self.tree.item(item, "values") for item in self.tree.get_children()]
-            df = pd.DataFrame(data, columns=["Fecha", "Número", "Sala", "Tipo", "Asignado"])
-            df.to_excel(archivo, index=False, engine="openpyxl")
-
-        else:
-            messagebox.showerror("Error de exportación", "Formato de archivo no compatible.")
-            return
-
-        messagebox.showinfo("Exportación completada", f"Los datos se han exportado correctamente a {archivo}.")
+        df = exportador.participaciones(self.fecha_inicio.get_date(), self.fecha_fin.get_date())
+        manuales = [item for item in self.manuales if self.tree.exists(item) and int(item) in df.index]
+        if manuales:
+            df = df.copy()
+            df["Asignado"] = df["Asignado"].astype(object)
+            for item in manuales:
+                df.at[int(item), "Asignado"] = self.tree.item(item, "values")[4]
+
+        self.cancelar_exportacion = threading.Event()
+        self.ventana_exportacion, self.avanzar_exportacion = mostrar_barra_carga(
+            self.master, ["Exportando"], al_cancelar=self.cancelar_exportacion.set, titulo="Exportando participaciones"
+        )
+        threading.Thread(
+            target=self._trabajo_exportacion,
+            args=(archivo, df, HOJAS[self.hojas.get()], self.cancelar_exportacion),
+            daemon=True
+        ).start()
+        self.frame.after(50, self._procesar_exportacion, archivo)
+
+    def _trabajo_exportacion(self, archivo, df, agrupar, cancelar):
+        """Escribe el archivo en el hilo de trabajo y envía el progreso y el resultado por la cola."""
+        try:
+            filas = exportador.exportar(
+                archivo, df, agrupar,
+                progreso=lambda etapa, paso, total: self.cola_exportacion.put(("progreso", etapa, paso, total)),
+                cancelar=cancelar
+            )
+            self.cola_exportacion.put(("fin", filas))
+        except exportador.ExportacionCancelada:
+            self.cola_exportacion.put(("cancelada",))
+        except ImportError as e:
+            self.cola_exportacion.put(("error", f"Falta el módulo requerido para este formato: {e}"))
+        except Exception as e:
+            self.cola_exportacion.put(("error", f"No se pudo exportar:\n{e}"))
+
+    def _procesar_exportacion(self, archivo):
+        """Aplica en el hilo de Tk los mensajes pendientes del hilo de exportación."""
+        try:
+            while True:
+                mensaje = self.cola_exportacion.get_nowait()
+                if mensaje[0] == "progreso":
+                    self.avanzar_exportacion(*mensaje[1:])
+                    continue
+                self.ventana_exportacion.destroy()
+                self.ventana_exportacion = None
+                self.cancelar_exportacion = None
+                if mensaje[0] == "fin":
+                    messagebox.showinfo("Exportación completada", f"Se han exportado {mensaje[1]} participaciones a {archivo}.")
+                elif mensaje[0] == "error":
+                    messagebox.showerror("Error de exportación", mensaje[1])
+                return
+        except queue.Empty:
+            pass
+        self.frame.after(50, self._procesar_exportacion, archivo)
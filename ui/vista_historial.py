@@ -3,7 +3,8 @@ from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 import pandas as pd
 
-from core.datos_cache import obtener, actualizar, guardar_todos
+from core.datos_cache import obtener, consultar, actualizar, guardar_todos, suscribir, desuscribir
+from core.esquema import texto
 
 class VistaHistorial:
     def __init__(self, master):
@@ -15,10 +16,16 @@ class VistaHistorial:
         self.participaciones_df = obtener("participaciones")
         self.participantes_df = obtener("participantes")
         self.nombres_participantes = sorted(self.participantes_df["Nombre"].dropna().unique().tolist())
+        # Filtros aplicados a la tabla: (participante o "", fecha o None)
+        self.filtros = ("", None)
 
         self._crear_widgets()
         self._cargar_tabla()
 
+        # Cambios hechos fuera de la aplicación (otro equipo, una hoja de cálculo)
+        suscribir(self._al_cambiar_datos)
+        self.frame.bind("<Destroy>", lambda e: desuscribir(self._al_cambiar_datos) if e.widget is self.frame else None)
+
     def _crear_widgets(self):
         """Crea los elementos de filtrado y tabla."""
         filtro_frame = ttk.LabelFrame(self.frame, text="Filtros")
@@ -75,34 +82,65 @@ class VistaHistorial:
         """Carga datos en la tabla (todos o filtrados). Limpia 'nan' en Notas."""
         self.tree.delete(*self.tree.get_children())
         df = datos if datos is not None else self.participaciones_df
-
-        for _, row in df.iterrows():
-            nota = row.get("Notas", "")
-            nota = "" if pd.isna(nota) or str(nota).strip().lower() == "nan" else str(nota)
-            self.tree.insert(
-                "", tk.END,
-                values=[
-                    row["Fecha"],
-                    row["Tipo"],
-                    row["Sala"],
-                    row["Asignado"],
-                    nota
-                ]
-            )
+        if datos is None:
+            self.filtros = ("", None)
+
+        for idx, row in df.iterrows():
+            self.tree.insert("", tk.END, iid=str(idx), values=self._valores(row))
+
+    def _valores(self, row):
+        nota = row.get("Notas", "")
+        nota = "" if pd.isna(nota) or str(nota).strip().lower() == "nan" else str(nota)
+        return [
+            texto(row["Fecha"]),
+            texto(row["Tipo"]),
+            texto(row["Sala"]),
+            texto(row["Asignado"]),
+            nota
+        ]
+
+    def _al_cambiar_datos(self, tabla, cambiadas, eliminadas, secuencia):
+        """Redibuja solo las filas que han cambiado fuera de la aplicación y cumplen los filtros aplicados."""
+        if tabla == "participantes":
+            self.participantes_df = obtener("participantes")
+            self.nombres_participantes = sorted(self.participantes_df["Nombre"].dropna().unique().tolist())
+            return
+        if tabla != "participaciones":
+            return
+        self.participaciones_df = obtener("participaciones")
+        participante, fecha = self.filtros
+        for idx in eliminadas:
+            if self.tree.exists(str(idx)):
+                self.tree.delete(str(idx))
+        for idx in cambiadas:
+            item = str(idx)
+            if idx not in self.participaciones_df.index:
+                continue
+            row = self.participaciones_df.loc[idx]
+            if (participante and row["Asignado"] != participante) or (fecha is not None and row["Fecha"] != fecha):
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+                continue
+            if self.tree.exists(item):
+                self.tree.item(item, values=self._valores(row))
+            else:
+                self.tree.insert("", tk.END, iid=item, values=self._valores(row))
 
     def _filtrar(self):
-        df = self.participaciones_df.copy()
+        df = self.participaciones_df
         participante = self.filtro_participante.get().strip()
         usar_fecha = self.usar_fecha.get()
+        fecha = None
 
         if usar_fecha:
-            fecha = self.filtro_fecha.get_date().strftime("%Y-%m-%d")
-            df["Fecha"] = pd.to_datetime(df["Fecha"], errors='coerce').dt.strftime("%Y-%m-%d")
-            df = df[df["Fecha"] == fecha]
+            # Solo lectura: también las participaciones archivadas de esa fecha
+            fecha = pd.Timestamp(self.filtro_fecha.get_date())
+            df = consultar("participaciones", fecha, fecha, incluir_archivo=True)
 
         if participante:
             df = df[df["Asignado"] == participante]
 
+        self.filtros = (participante, fecha)
         self._cargar_tabla(df)
 
     def _quitar_filtros(self):
@@ -117,20 +155,23 @@ class VistaHistorial:
             messagebox.showwarning("Seleccionar", "Selecciona una fila")
             return
 
-        item = self.tree.item(sel[0], "values")
-        fecha, tipo, sala, asignado = item[:4]
+        # Cada fila de la tabla lleva el índice de su participación
+        asignado = self.tree.item(sel[0], "values")[3]
+        idx = int(sel[0])
+
+        if idx in self.participaciones_df.index:
+            nota_anterior = str(self.participaciones_df.get("Notas", pd.Series(dtype=object)).get(idx, ""))
 
-        idx = self.participaciones_df[
-            (self.participaciones_df["Fecha"] == fecha) &
-            (self.participaciones_df["Tipo"] == tipo) &
-            (self.participaciones_df["Sala"] == sala) &
-            (self.participaciones_df["Asignado"] == asignado)
-        ].index
+            def cambios_historial(historial):
+                if "No realizada" not in nota_anterior:
+                    historial.registrar_no_realizada(asignado)
 
-        if not idx.empty:
             # Forzamos que la nota sea exactamente "No realizada"
-            self.participaciones_df.at[idx[0], "Notas"] = "No realizada"
-            actualizar("participaciones", self.participaciones_df)
+            self.participaciones_df.at[idx, "Notas"] = "No realizada"
+            actualizar("participaciones", self.participaciones_df, cambios_historial, filas=[idx])
             guardar_todos()
             self._cargar_tabla()
             messagebox.showinfo("Actualizado", "La participación ha sido marcada como no realizada.")
+        else:
+            # Las filas que solo están en el archivo de particiones antiguas no se modifican
+            messagebox.showinfo("Archivada", "Las participaciones archivadas no se pueden modificar.")
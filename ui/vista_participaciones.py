@@ -1,9 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import Calendar
+from tkcalendar import Calendar, DateEntry
 import pandas as pd
 
-from core.datos_cache import obtener, actualizar, guardar_todos
+from core.datos_cache import (
+    obtener, consultar, actualizar, guardar_todos, indice_claves, indices_nuevos, suscribir, desuscribir
+)
+from core.esquema import texto
+from core import plantillas
+
+# Columnas de la tabla de participaciones de una fecha
+COLUMNAS = ["Número", "Fecha", "Sala", "Tipo"]
 
 class VistaParticipaciones:
     def __init__(self, master):
@@ -15,9 +22,14 @@ class VistaParticipaciones:
         self.participaciones_df = obtener("participaciones")
         self.fecha_seleccionada = None
         self.tipos_validos = obtener("opciones_tipos")["Tipos"].dropna().tolist()
+        self.tree = None
 
         self._crear_widgets()
 
+        # Cambios hechos fuera de la aplicación (otro equipo, una hoja de cálculo)
+        suscribir(self._al_cambiar_datos)
+        self.frame.bind("<Destroy>", lambda e: desuscribir(self._al_cambiar_datos) if e.widget is self.frame else None)
+
     def _crear_widgets(self):
         """Crea el calendario y contenedor de tabla."""
         top_frame = ttk.Frame(self.frame)
@@ -29,6 +41,7 @@ class VistaParticipaciones:
         self.calendario.pack(pady=5)
 
         ttk.Button(top_frame, text="Ver Participaciones", command=self._mostrar_participaciones).pack()
+        ttk.Button(top_frame, text="Plantillas", command=self._abrir_plantillas).pack(pady=(5, 0))
 
         self.tabla_frame = ttk.Frame(self.frame)
         self.tabla_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -53,17 +66,44 @@ class VistaParticipaciones:
         ttk.Button(btns, text="Eliminar", command=self._eliminar_participacion).pack(side=tk.LEFT, padx=5)
 
         # Tabla
-        cols = ["Número", "Fecha", "Sala", "Tipo"]
-        self.tree = ttk.Treeview(self.tabla_frame, columns=cols, show="headings")
-        for col in cols:
+        self.tree = ttk.Treeview(self.tabla_frame, columns=COLUMNAS, show="headings")
+        for col in COLUMNAS:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=100, anchor="center")
         self.tree.pack(fill=tk.BOTH, expand=True, pady=10)
 
-        # Rellenar con datos filtrados por fecha
-        filtradas = self.participaciones_df[self.participaciones_df["Fecha"] == self.fecha_seleccionada]
-        for _, row in filtradas.iterrows():
-            self.tree.insert("", tk.END, values=[row["Número"], row["Fecha"], row["Sala"], row["Tipo"]])
+        # Rellenar con datos filtrados por fecha; cada fila lleva el índice de su participación
+        filtradas = self.participaciones_df[self.participaciones_df["Fecha"] == pd.Timestamp(self.fecha_seleccionada)]
+        for idx, row in filtradas.iterrows():
+            self.tree.insert("", tk.END, iid=str(idx), values=[texto(row[c]) for c in COLUMNAS])
+
+    def _al_cambiar_datos(self, tabla, cambiadas, eliminadas, secuencia):
+        """Redibuja solo las filas de la fecha mostrada que han cambiado fuera de la aplicación."""
+        if tabla == "opciones_tipos":
+            self.tipos_validos = obtener("opciones_tipos")["Tipos"].dropna().tolist()
+            return
+        if tabla != "participaciones" or self.tree is None or not self.tree.winfo_exists():
+            return
+        self.participaciones_df = obtener("participaciones")
+        fecha = pd.Timestamp(self.fecha_seleccionada)
+        for idx in eliminadas:
+            if self.tree.exists(str(idx)):
+                self.tree.delete(str(idx))
+        for idx in cambiadas:
+            item = str(idx)
+            if idx not in self.participaciones_df.index:
+                continue
+            row = self.participaciones_df.loc[idx]
+            if row["Fecha"] != fecha:
+                # Ha pasado a otra fecha
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+                continue
+            valores = [texto(row[c]) for c in COLUMNAS]
+            if self.tree.exists(item):
+                self.tree.item(item, values=valores)
+            else:
+                self.tree.insert("", tk.END, iid=item, values=valores)
 
     def _añadir_participacion(self):
         """Abre un formulario con estilo oscuro para agregar una nueva participación."""
@@ -111,7 +151,7 @@ class VistaParticipaciones:
 
             base = {
                 "Número": numero,
-                "Fecha": self.fecha_seleccionada,
+                "Fecha": pd.Timestamp(self.fecha_seleccionada),
                 "Tipo": campos["Tipo"].get(),
                 "Género": "",
                 "Asignado": ""
@@ -123,9 +163,17 @@ class VistaParticipaciones:
                     nuevas.append({**base, "Sala": sala})
             else:
                 nuevas.append({**base, "Sala": campos["Sala"].get()})
+            repetidas = [f"{numero} (sala {fila['Sala']})" for fila in nuevas
+                         if indice_claves().buscar(base["Fecha"], numero, fila["Sala"]) is not None]
+            if repetidas:
+                messagebox.showerror("Error", f"Ya existe la participación {', '.join(repetidas)} en esa fecha.", parent=vent)
+                return
 
-            self.participaciones_df = pd.concat([self.participaciones_df, pd.DataFrame(nuevas)], ignore_index=True)
-            actualizar("participaciones", self.participaciones_df)
+            # Las filas nuevas continúan la numeración para no cambiar el índice de las existentes
+            nuevas = pd.DataFrame(nuevas, index=indices_nuevos("participaciones", len(nuevas)))
+            self.participaciones_df = pd.concat([self.participaciones_df, nuevas])
+            actualizar("participaciones", self.participaciones_df, filas=nuevas.index)
+            self.participaciones_df = obtener("participaciones")
             guardar_todos()
             self._mostrar_participaciones()
             vent.destroy()
@@ -139,15 +187,133 @@ class VistaParticipaciones:
             messagebox.showwarning("Eliminar", "Selecciona una participación")
             return
 
-        item = self.tree.item(sel[0], "values")
-        numero = int(item[0])
-        fecha = item[1]
+        numero, fecha, sala = self.tree.item(sel[0], "values")[:3]
 
-        confirm = messagebox.askyesno("Eliminar", f"¿Eliminar participación {numero} de {fecha}?")
+        confirm = messagebox.askyesno("Eliminar", f"¿Eliminar participación {numero} de {fecha} (sala {sala})?")
         if confirm:
-            self.participaciones_df = self.participaciones_df[
-                ~((self.participaciones_df["Número"] == numero) & (self.participaciones_df["Fecha"] == fecha))
-            ]
-            actualizar("participaciones", self.participaciones_df)
+            # Cada fila de la tabla lleva el índice de su participación
+            idx = int(sel[0])
+            if idx not in self.participaciones_df.index:
+                return
+            self.participaciones_df = self.participaciones_df.drop(index=idx)
+            actualizar("participaciones", self.participaciones_df, filas=[idx])
             guardar_todos()
             self._mostrar_participaciones()
+
+    # === Plantillas semanales ===
+    def _abrir_plantillas(self):
+        """Edita plantillas semanales de reunión y genera con ellas las participaciones de un rango."""
+        vent = tk.Toplevel(self.master)
+        vent.title("Plantillas de reunión")
+        vent.configure(bg="#000000")
+        vent.resizable(False, False)
+        vent.grab_set()
+
+        marco = ttk.Frame(vent, padding=20, style="TFrame")
+        marco.pack(fill=tk.BOTH, expand=True)
+
+        # Plantilla en edición: sus filas viven en la tabla hasta guardarla
+        ttk.Label(marco, text="Plantilla:").grid(row=0, column=0, sticky="e", padx=5, pady=5)
+        nombre = ttk.Combobox(marco, values=plantillas.nombres(obtener("plantillas")))
+        nombre.grid(row=0, column=1, columnspan=3, sticky="ew", pady=5)
+
+        cols = ["Día", "Número", "Tipo", "Sala", "Género"]
+        tabla = ttk.Treeview(marco, columns=cols, show="headings", height=8)
+        for c in cols:
+            tabla.heading(c, text=c)
+            tabla.column(c, width=90, anchor="center")
+        tabla.grid(row=1, column=0, columnspan=6, pady=10)
+
+        def cargar(event=None):
+            tabla.delete(*tabla.get_children())
+            for _, row in plantillas.filas(obtener("plantillas"), nombre.get()).iterrows():
+                tabla.insert("", tk.END, values=[texto(row[c]) for c in cols])
+
+        nombre.bind("<<ComboboxSelected>>", cargar)
+
+        # Nueva fila de la plantilla
+        campos = {
+            "Día": ttk.Combobox(marco, values=plantillas.DIAS, state="readonly", width=10),
+            "Número": ttk.Entry(marco, width=6),
+            "Tipo": ttk.Combobox(marco, values=self.tipos_validos, state="readonly", width=12),
+            "Sala": ttk.Combobox(marco, values=["A", "B"], state="readonly", width=4),
+            "Género": ttk.Combobox(marco, values=["", "Hombre", "Mujer"], state="readonly", width=8)
+        }
+        for i, (campo, widget) in enumerate(campos.items()):
+            ttk.Label(marco, text=campo).grid(row=2, column=i, padx=2)
+            widget.grid(row=3, column=i, padx=2)
+        campos["Sala"].set("A")
+
+        def añadir_fila():
+            try:
+                int(campos["Número"].get())
+            except ValueError:
+                messagebox.showerror("Plantillas", "El número debe ser un entero.", parent=vent)
+                return
+            if not campos["Día"].get() or not campos["Tipo"].get():
+                messagebox.showerror("Plantillas", "Indica el día y el tipo.", parent=vent)
+                return
+            tabla.insert("", tk.END, values=[campos[c].get() for c in cols])
+
+        def quitar_fila():
+            for item in tabla.selection():
+                tabla.delete(item)
+
+        def filas_plantilla():
+            filas = [dict(zip(cols, tabla.item(item, "values"))) for item in tabla.get_children()]
+            return pd.DataFrame(filas, columns=cols).assign(Plantilla=nombre.get().strip())[plantillas.COLUMNAS]
+
+        def guardar_plantilla():
+            if not nombre.get().strip():
+                messagebox.showerror("Plantillas", "Indica un nombre para la plantilla.", parent=vent)
+                return
+            todas = obtener("plantillas")
+            otras = todas[todas["Plantilla"] != nombre.get().strip()] if not todas.empty else todas
+            actualizar("plantillas", pd.concat([otras, filas_plantilla()], ignore_index=True))
+            guardar_todos()
+            nombre["values"] = plantillas.nombres(obtener("plantillas"))
+            messagebox.showinfo("Plantillas", "Plantilla guardada.", parent=vent)
+
+        ttk.Button(marco, text="Añadir fila", command=añadir_fila).grid(row=3, column=5, padx=5)
+        ttk.Button(marco, text="Quitar fila", command=quitar_fila).grid(row=4, column=0, columnspan=2, pady=10)
+        ttk.Button(marco, text="Guardar plantilla", command=guardar_plantilla).grid(row=4, column=2, columnspan=2, pady=10)
+
+        # Generación de un rango
+        ttk.Label(marco, text="Desde:").grid(row=5, column=0, sticky="e", padx=5)
+        desde = DateEntry(marco, date_pattern="yyyy-mm-dd", background="#5b3c88", foreground="#e3e3e3")
+        desde.grid(row=5, column=1, sticky="ew", pady=5)
+        ttk.Label(marco, text="Hasta:").grid(row=5, column=2, sticky="e", padx=5)
+        hasta = DateEntry(marco, date_pattern="yyyy-mm-dd", background="#5b3c88", foreground="#e3e3e3")
+        hasta.grid(row=5, column=3, sticky="ew", pady=5)
+
+        def generar():
+            if hasta.get_date() < desde.get_date():
+                messagebox.showerror("Plantillas", "La fecha final no puede ser anterior a la inicial.", parent=vent)
+                return
+            if not tabla.get_children():
+                messagebox.showwarning("Plantillas", "La plantilla no tiene filas.", parent=vent)
+                return
+            # Solo hace falta comparar con las participaciones del rango
+            existentes = consultar("participaciones", desde.get_date(), hasta.get_date(), incluir_archivo=True)
+            nuevas, repetidas = plantillas.generar(filas_plantilla(), desde.get_date(), hasta.get_date(), existentes)
+            if nuevas.empty:
+                messagebox.showinfo("Plantillas", f"No hay participaciones nuevas ({repetidas} ya existían).", parent=vent)
+                return
+            if not messagebox.askyesno(
+                "Plantillas",
+                f"Se añadirán {len(nuevas)} participaciones ({repetidas} ya existían y se omiten). ¿Continuar?",
+                parent=vent
+            ):
+                return
+
+            # Un único añadido y un único guardado para todo el rango
+            nuevas = nuevas.set_axis(indices_nuevos("participaciones", len(nuevas)))
+            self.participaciones_df = pd.concat([self.participaciones_df, nuevas])
+            actualizar("participaciones", self.participaciones_df, filas=nuevas.index)
+            self.participaciones_df = obtener("participaciones")
+            guardar_todos()
+            if self.fecha_seleccionada:
+                self._mostrar_participaciones()
+            messagebox.showinfo("Plantillas", f"Se han añadido {len(nuevas)} participaciones.", parent=vent)
+
+        ttk.Button(marco, text="Generar participaciones", command=generar).grid(row=5, column=4, columnspan=2, padx=5)
@@ -1,10 +1,15 @@
 import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import pandas as pd
 from tkcalendar import DateEntry
 
-from core.datos_cache import obtener, actualizar, guardar_todos
+from core.datos_cache import obtener, actualizar, guardar_todos, suscribir, desuscribir, incorporar
+from core.esquema import admitir, texto
+from core import importador
+from ui.barra_carga import mostrar_barra_carga
 
 class VistaParticipantes:
     def __init__(self, master):
@@ -21,9 +26,18 @@ class VistaParticipantes:
         self.generos_lista = ["Hombre", "Mujer"]
         self.cambios_guardados = True
 
+        # Estado de la importación en segundo plano
+        self.cola = queue.Queue()
+        self.cancelar = None
+        self.ventana_progreso = None
+
         self._crear_widgets()
         self._cargar_tabla()
 
+        # Cambios hechos fuera de la aplicación (una hoja de cálculo, otro equipo)
+        suscribir(self._al_cambiar_datos)
+        self.frame.bind("<Destroy>", lambda e: desuscribir(self._al_cambiar_datos) if e.widget is self.frame else None)
+
     def _crear_widgets(self):
         """Crea los botones y la tabla de participantes."""
         btn_frame = ttk.Frame(self.frame, style="TFrame")
@@ -37,6 +51,7 @@ class VistaParticipantes:
         ttk.Button(btn_frame, text="Guardar", command=self._on_save, **estilo).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Cargar desde archivo", command=self._on_load, **estilo).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Exportar", command=self._on_export, **estilo).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Ausencias", command=self._on_ausencias, **estilo).pack(side=tk.LEFT, padx=5)
 
         # Tabla
         tabla_frame = ttk.Frame(self.frame, style="TFrame")
@@ -57,11 +72,35 @@ class VistaParticipantes:
     def _cargar_tabla(self):
         """Carga los datos del DataFrame en la tabla visual."""
         self.tree.delete(*self.tree.get_children())
-        for _, row in self.participantes_df.iterrows():
-            vals = [row.get(col, "") for col in self.tree["columns"]]
-            self.tree.insert("", tk.END, values=vals)
+        for idx, row in self.participantes_df.iterrows():
+            self.tree.insert("", tk.END, iid=str(idx), values=self._valores(row))
         self.cambios_guardados = True
 
+    def _valores(self, row):
+        return [texto(row.get(col, "")) for col in self.tree["columns"]]
+
+    def _al_cambiar_datos(self, tabla, cambiadas, eliminadas, secuencia):
+        """Redibuja solo las filas que han cambiado fuera de la aplicación."""
+        if tabla == "opciones_tipos":
+            self.tipos_lista = obtener("opciones_tipos")["Tipos"].dropna().tolist()
+            return
+        if tabla != "participantes":
+            return
+        if self.participantes_df is not obtener("participantes"):
+            # Con cambios sin guardar la vista tiene su propia copia: se le aplica el mismo cambio
+            cambiadas, eliminadas = incorporar("participantes", self.participantes_df, secuencia - 1)
+        for idx in eliminadas:
+            if self.tree.exists(str(idx)):
+                self.tree.delete(str(idx))
+        for idx in cambiadas:
+            if idx not in self.participantes_df.index:
+                continue
+            valores = self._valores(self.participantes_df.loc[idx])
+            if self.tree.exists(str(idx)):
+                self.tree.item(str(idx), values=valores)
+            else:
+                self.tree.insert("", tk.END, iid=str(idx), values=valores)
+
     def _abrir_formulario(self, data=None):
         """Abre una ventana para añadir o editar un participante."""
         top = tk.Toplevel(self.master)
@@ -129,9 +168,11 @@ class VistaParticipantes:
             if not nuevo["Nombre"]:
                 messagebox.showerror("Error", "El campo 'Nombre' es obligatorio.")
                 return
+            nuevo["Última participación"] = pd.to_datetime(nuevo["Última participación"], errors="coerce")
 
             if data:
-                self.participantes_df.loc[self.participantes_df["Nombre"] == data["Nombre"], nuevo.keys()] = nuevo.values()
+                nuevo = admitir(self.participantes_df, nuevo)
+                self.participantes_df.loc[self.participantes_df["Nombre"] == data["Nombre"], list(nuevo)] = list(nuevo.values())
             else:
                 if nuevo["Nombre"] in self.participantes_df["Nombre"].values:
                     messagebox.showerror("Error", "Ese nombre ya existe.")
@@ -171,46 +212,173 @@ class VistaParticipantes:
         self._cargar_tabla()
         self.cambios_guardados = False
 
+    def _on_ausencias(self):
+        """Abre el calendario de ausencias del participante seleccionado."""
+        sel = self.tree.selection()
+        if not sel:
+            messagebox.showwarning("Ausencias", "Selecciona un participante")
+            return
+        nombre = self.tree.item(sel[0], "values")[0]
+
+        top = tk.Toplevel(self.master)
+        top.title(f"Ausencias de {nombre}")
+        top.configure(bg="#000000")
+        top.resizable(False, False)
+        top.grab_set()
+
+        marco = ttk.Frame(top, padding=20, style="TFrame")
+        marco.pack(fill=tk.BOTH, expand=True)
+
+        cols = ["Desde", "Hasta", "Motivo"]
+        tabla = ttk.Treeview(marco, columns=cols, show="headings", height=6, style="Treeview")
+        for c in cols:
+            tabla.heading(c, text=c)
+            tabla.column(c, width=120, anchor="center")
+        tabla.grid(row=0, column=0, columnspan=4, pady=(0, 10))
+
+        def cargar():
+            tabla.delete(*tabla.get_children())
+            ausencias = obtener("ausencias")
+            if ausencias is None or ausencias.empty:
+                return
+            for idx, row in ausencias[ausencias["Nombre"] == nombre].sort_values("Desde").iterrows():
+                motivo = "" if pd.isna(row["Motivo"]) else row["Motivo"]
+                tabla.insert("", tk.END, iid=str(idx), values=[texto(row["Desde"]), texto(row["Hasta"]), motivo])
+
+        ttk.Label(marco, text="Desde:").grid(row=1, column=0, sticky="e", padx=5)
+        desde = DateEntry(marco, date_pattern="yyyy-mm-dd", background="#5b3c88", foreground="#e3e3e3")
+        desde.grid(row=1, column=1, sticky="ew", pady=5)
+        ttk.Label(marco, text="Hasta:").grid(row=1, column=2, sticky="e", padx=5)
+        hasta = DateEntry(marco, date_pattern="yyyy-mm-dd", background="#5b3c88", foreground="#e3e3e3")
+        hasta.grid(row=1, column=3, sticky="ew", pady=5)
+        ttk.Label(marco, text="Motivo:").grid(row=2, column=0, sticky="e", padx=5)
+        motivo = ttk.Entry(marco)
+        motivo.grid(row=2, column=1, columnspan=3, sticky="ew", pady=5)
+
+        def guardar(ausencias):
+            actualizar("ausencias", ausencias)
+            guardar_todos()
+            cargar()
+
+        def añadir():
+            if hasta.get_date() < desde.get_date():
+                messagebox.showerror("Ausencias", "La fecha final no puede ser anterior a la inicial.", parent=top)
+                return
+            nueva = pd.DataFrame([{
+                "Nombre": nombre,
+                "Desde": pd.Timestamp(desde.get_date()),
+                "Hasta": pd.Timestamp(hasta.get_date()),
+                "Motivo": motivo.get().strip()
+            }])
+            ausencias = obtener("ausencias")
+            if ausencias is None or ausencias.empty:
+                ausencias = pd.DataFrame(columns=nueva.columns)
+            guardar(pd.concat([ausencias, nueva], ignore_index=True))
+            motivo.delete(0, tk.END)
+
+        def eliminar():
+            seleccion = tabla.selection()
+            if not seleccion:
+                messagebox.showwarning("Ausencias", "Selecciona una ausencia", parent=top)
+                return
+            ausencias = obtener("ausencias")
+            guardar(ausencias.drop(index=[int(item) for item in seleccion]))
+
+        ttk.Button(marco, text="Añadir", command=añadir).grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Button(marco, text="Eliminar", command=eliminar).grid(row=3, column=2, columnspan=2, pady=10)
+        cargar()
+
     def _on_save(self):
         """Guarda los cambios en caché y en disco."""
         actualizar("participantes", self.participantes_df)
+        self.participantes_df = obtener("participantes")
         guardar_todos()
         self.cambios_guardados = True
         messagebox.showinfo("Guardado", "Cambios guardados correctamente.")
 
     def _on_load(self):
-        """Carga datos desde un archivo CSV/Excel/ODS."""
+        """Importa participantes desde un archivo CSV/Excel/ODS en segundo plano."""
+        if self.cancelar is not None:
+            return  # ya hay una importación en curso
         path = filedialog.askopenfilename(filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx"), ("ODS", "*.ods")])
         if not path:
             return
-        ext = os.path.splitext(path)[1].lower()
+        reemplazar = messagebox.askyesnocancel(
+            "Cargar",
+            "¿Reemplazar los datos actuales?\n\n"
+            "Sí: la lista pasa a ser la del archivo.\n"
+            "No: se actualizan por nombre los que ya están y se añaden los nuevos."
+        )
+        if reemplazar is None:
+            return
+        modo = importador.REEMPLAZAR if reemplazar else importador.COMBINAR
+
+        self.cancelar = threading.Event()
+        self.ventana_progreso, self.avanzar = mostrar_barra_carga(
+            self.master, ["Leyendo archivo"], al_cancelar=self.cancelar.set, titulo="Cargando participantes"
+        )
+        # El archivo se lee y valida por bloques en el hilo; la tabla solo se toca al terminar
+        threading.Thread(target=self._trabajo_importacion, args=(path, self.cancelar), daemon=True).start()
+        self.frame.after(50, self._procesar_cola, modo)
+
+    def _trabajo_importacion(self, path, cancelar):
+        """Lee el archivo en el hilo de trabajo y envía el progreso y el resultado por la cola."""
         try:
-            if ext == ".csv":
-                df = pd.read_csv(path)
-            elif ext == ".xlsx":
-                df = pd.read_excel(path)
-            elif ext == ".ods":
-                df = pd.read_excel(path, engine="odf")
-            else:
-                raise ValueError("Formato no soportado")
+            resultado = importador.leer(
+                path,
+                progreso=lambda etapa, paso, total: self.cola.put(("progreso", etapa, paso, total)),
+                cancelar=cancelar
+            )
+            self.cola.put(("fin", resultado))
+        except importador.ImportacionCancelada:
+            self.cola.put(("cancelada",))
         except ImportError as e:
-            messagebox.showerror("Cargar", f"Falta el módulo requerido para ODS: {e}")
-            return
+            self.cola.put(("error", f"Falta el módulo requerido para este formato: {e}"))
         except Exception as e:
-            messagebox.showerror("Cargar", f"No se pudo cargar el archivo:\n{e}")
-            return
+            self.cola.put(("error", f"No se pudo cargar el archivo:\n{e}"))
 
-        req = ["Nombre", "Género", "Tipos", "Última participación", "Último tipo", "Última sala"]
-        if not all(col in df.columns for col in req):
-            messagebox.showerror("Cargar", "El archivo no contiene las columnas requeridas")
+    def _procesar_cola(self, modo):
+        """Aplica en el hilo de Tk los mensajes pendientes del hilo de importación."""
+        try:
+            while True:
+                mensaje = self.cola.get_nowait()
+                if mensaje[0] == "progreso":
+                    self.avanzar(*mensaje[1:])
+                else:
+                    self._terminar_importacion(mensaje, modo)
+                    return
+        except queue.Empty:
+            pass
+        self.frame.after(50, self._procesar_cola, modo)
+
+    def _terminar_importacion(self, mensaje, modo):
+        """Cierra la ventana de progreso y pasa la tabla importada a datos_cache de una vez."""
+        self.ventana_progreso.destroy()
+        self.ventana_progreso = None
+        self.cancelar = None
+        if mensaje[0] == "cancelada":
+            messagebox.showinfo("Cargar", "Carga cancelada; no se ha modificado ningún participante.")
             return
-        if not messagebox.askyesno("Cargar", "¿Reemplazar datos actuales?"):
+        if mensaje[0] == "error":
+            messagebox.showerror("Cargar", mensaje[1])
             return
 
-        self.participantes_df = df[req].astype(str).copy()
+        importados, informe = mensaje[1]
+        resultado, añadidos, actualizados = importador.fusionar(self.participantes_df, importados, modo)
+        actualizar("participantes", resultado)
+        self.participantes_df = obtener("participantes")
         self._cargar_tabla()
         self.cambios_guardados = False
 
+        resumen = f"Filas leídas: {informe['filas']}\nAñadidos: {añadidos}\nActualizados: {actualizados}"
+        descartes = [
+            (informe["sin_nombre"], "sin nombre (descartadas)"),
+            (informe["repetidos"], "con el nombre repetido (descartadas)"),
+            (informe["fechas_no_validas"], "con la última participación no válida (fecha vacía)")
+        ]
+        resumen += "".join(f"\nFilas {motivo}: {n}" for n, motivo in descartes if n)
+        messagebox.showinfo("Cargar", resumen)
+
     def _on_export(self):
         """Exporta los datos actuales a un archivo CSV/Excel/ODS."""
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx"), ("ODS", "*.ods")])